@@ -0,0 +1,42 @@
+"""
+Role entry points, so each process loads only what its role needs:
+
+    python -m app bot        # long-polling bot (BOT_RUNTIME=async|polling)
+    python -m app webhook    # webhook server; gunicorn app.bot:app for several processes
+    python -m app ingest     # PDF ingestion and broadcasts
+    python -m app export     # payslip dumps and payroll totals
+    python -m app broadcast | reprocess | split | pdf-store
+
+Anything after the role is passed to that role's own arguments. Role modules are
+imported only once the role is known; main.py still runs bot and ingestion together.
+"""
+import sys
+import logging
+import importlib
+
+# Role -> module whose main(argv) runs it
+ROLES = {
+    "bot": "app.async_bot",
+    "webhook": "app.bot",
+    "ingest": "app.ingester",
+    "export": "app.export",
+    "broadcast": "app.broadcast",
+    "reprocess": "app.reprocess",
+    "split": "app.splitter",
+    "pdf-store": "app.pdf_store",
+}
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in ROLES:
+        print(f"usage: python -m app {{{','.join(ROLES)}}} [args...]", file=sys.stderr)
+        return 2
+    role, rest = argv[0], argv[1:]
+    sys.argv[0] = f"python -m app {role}"  # Shown in the role's --help
+    return importlib.import_module(ROLES[role]).main(rest)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
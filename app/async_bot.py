@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app import bale_api, handlers, metrics
+from app.db_export import init_db
+from app.dispatcher import DISPATCH_ENABLED, Dispatcher
+
+logger = logging.getLogger("AsyncBot")
+
+# Bot runtime: "async" handles updates concurrently, "polling" one at a time;
+# main.py also takes "webhook", which serves app.bot's /webhook instead of polling
+BOT_RUNTIME = os.getenv("BOT_RUNTIME", "async")
+
+# Updates handled at once; polling pauses while this many are in flight.
+BOT_MAX_IN_FLIGHT = int(os.getenv("BOT_MAX_IN_FLIGHT", "32"))
+# Long-poll timeout passed to getUpdates, in seconds.
+BOT_POLL_TIMEOUT = int(os.getenv("BOT_POLL_TIMEOUT", "20"))
+# Longest pause between getUpdates retries after a failure, in seconds.
+BOT_MAX_BACKOFF = float(os.getenv("BOT_MAX_BACKOFF", "30"))
+
+
+def chat_id_of(update: Dict[str, Any]) -> Optional[int]:
+    """Return the chat an update belongs to, or None for updates without one."""
+    message = update.get("message") or update.get("edited_message") or {}
+    return message.get("chat", {}).get("id")
+
+
+class AsyncBot:
+    """
+    Long-polling runtime that handles updates concurrently.
+
+    `handle_update` is the same synchronous handler the threaded runtime uses; it runs
+    on a thread pool so DB and HTTP calls don't block the loop. Updates from different
+    chats run in parallel, updates from the same chat run in arrival order. Once
+    `max_in_flight` updates are pending the poller stops fetching until one finishes.
+    """
+
+    def __init__(
+        self,
+        handle_update: Callable[[Dict[str, Any]], None],
+        max_in_flight: int = BOT_MAX_IN_FLIGHT,
+        poll_timeout: int = BOT_POLL_TIMEOUT,
+    ):
+        self.handle_update = handle_update
+        self.max_in_flight = max_in_flight
+        self.poll_timeout = poll_timeout
+        self.handled = 0
+        self.failed = 0
+        self._tails: Dict[Any, asyncio.Task] = {}
+        self._stopping = False
+
+    def stop(self):
+        """Stop polling after the current getUpdates call returns."""
+        self._stopping = True
+
+    async def _handle(self, update, previous: Optional[asyncio.Task]):
+        loop = asyncio.get_running_loop()
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            await loop.run_in_executor(self._executor, self.handle_update, update)
+            self.handled += 1
+        except Exception:
+            self.failed += 1
+            logger.exception(f"Error handling update {update.get('update_id')}")
+        finally:
+            self._slots.release()
+
+    def _dispatch(self, update):
+        chat_id = chat_id_of(update)
+        task = asyncio.create_task(self._handle(update, self._tails.get(chat_id)))
+        if chat_id is not None:
+            self._tails[chat_id] = task
+
+            def forget(done):
+                # Only the chat's last task may drop the entry; a newer one may already be queued.
+                if self._tails.get(chat_id) is done:
+                    del self._tails[chat_id]
+
+            task.add_done_callback(forget)
+        return task
+
+    async def run(self):
+        """Poll and dispatch until stop() is called, then wait for in-flight updates."""
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="bot")
+        # getUpdates gets its own thread so a full handler pool never delays polling.
+        poller = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bot-poll")
+        tasks = set()
+        offset, backoff = None, 1.0
+        logger.debug("Bot is polling for updates (async runtime)...")
+        try:
+            while not self._stopping:
+                try:
+                    updates = await loop.run_in_executor(poller, bale_api.get_updates, offset, self.poll_timeout)
+                    if not updates.get("ok"):
+                        # A bad token or throttling answers at once; polling again straight away would spin.
+                        raise RuntimeError(f"{updates.get('error_code')} {updates.get('description')}")
+                except Exception as e:
+                    logger.warning(f"getUpdates failed: {e}; retrying in {backoff:.0f}s")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, BOT_MAX_BACKOFF)
+                    continue
+                backoff = 1.0
+
+                for update in updates.get("result") or []:
+                    offset = update["update_id"] + 1
+                    await self._slots.acquire()
+                    task = self._dispatch(update)
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            poller.shutdown(wait=False)
+            self._executor.shutdown(wait=True)
+
+
+def run_async_bot(handle_update: Callable[[Dict[str, Any]], None], **kwargs):
+    """Run an AsyncBot with `handle_update` until the process exits."""
+    asyncio.run(AsyncBot(handle_update, **kwargs).run())
+
+
+def run_polling_bot(handle_update: Callable[[Dict[str, Any]], None], poll_timeout: int = BOT_POLL_TIMEOUT):
+    """Run the bot in a plain long-polling loop, one update at a time."""
+    offset = None
+    logger.debug("Bot is polling for updates...")
+    while True:
+        updates = bale_api.get_updates(offset=offset, timeout=poll_timeout)
+        if updates.get("ok") and updates.get("result"):
+            for update in updates["result"]:
+                handle_update(update)
+                offset = update["update_id"] + 1
+        time.sleep(1)
+
+
+def main(argv=None) -> int:
+    """Bot role: poll Bale and answer users, without the ingestion side."""
+    parser = argparse.ArgumentParser(description="Run the Bale bot with long polling.")
+    parser.add_argument("--runtime", choices=["async", "polling"], default=BOT_RUNTIME)
+    args = parser.parse_args(argv)
+    init_db()
+    metrics.start_log_reporter()
+    metrics.install_profiler_signal()
+    if DISPATCH_ENABLED:
+        handlers.dispatcher = Dispatcher().start()
+    if args.runtime == "async":
+        run_async_bot(handlers.handle_update)
+    else:
+        run_polling_bot(handlers.handle_update)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
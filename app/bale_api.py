@@ -0,0 +1,77 @@
+import os
+import time
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app import metrics
+
+logger = logging.getLogger("BaleAPI")
+
+# Bot configuration
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+BALE_API_URL = os.getenv("BALE_API_URL", "https://tapi.bale.ai")
+BASE_URL = f"{BALE_API_URL}/bot{BOT_TOKEN}/"
+
+# Keep-alive connections kept open to the Bale API; one per concurrent sender is enough.
+BALE_HTTP_POOL_SIZE = int(os.getenv("BALE_HTTP_POOL_SIZE", "32"))
+# Seconds to wait for Bale on top of any long-poll timeout.
+BALE_HTTP_TIMEOUT = float(os.getenv("BALE_HTTP_TIMEOUT", "30"))
+
+
+def _make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=BALE_HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# One pooled session for the process, so every call reuses a warm TLS connection.
+session = _make_session()
+
+
+def _request(http_method, method, **kwargs):
+    """Send one Bot API request, recording its round trip as bale_request_seconds{method}."""
+    started, status = time.perf_counter(), "error"
+    try:
+        response = session.request(http_method, BASE_URL + method, **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        metrics.observe("bale_request_seconds", time.perf_counter() - started, method=method)
+        metrics.inc("bale_requests_total", method=method, status=status)
+
+
+def call(method, timeout=BALE_HTTP_TIMEOUT, **kwargs):
+    """POST to a Bot API method and return the raw response."""
+    return _request("POST", method, timeout=timeout, **kwargs)
+
+
+def send_message(chat_id, text):
+    """Send a text message to the specified chat ID."""
+    return call("sendMessage", json={"chat_id": chat_id, "text": text})
+
+
+def send_document(chat_id, file_path, caption=None, file_name=None):
+    """Upload a document from `file_path` to the specified chat ID, named `file_name` if given."""
+    data = {"chat_id": chat_id, "caption": caption if caption else ""}
+    with open(file_path, "rb") as doc_file:
+        return call("sendDocument", data=data, files={"document": (file_name or os.path.basename(file_path), doc_file)})
+
+
+def send_document_id(chat_id, file_id, caption=None):
+    """Resend a document Bale already has, by its file_id, without uploading it."""
+    payload = {"chat_id": chat_id, "document": file_id, "caption": caption if caption else ""}
+    return call("sendDocument", json=payload)
+
+
+def get_updates(offset=None, timeout=20):
+    """Long-poll the Bale API for updates."""
+    params = {"timeout": timeout}
+    if offset is not None:
+        params["offset"] = offset
+    # Includes the long-poll wait, so an idle bot shows getUpdates near `timeout`.
+    response = _request("GET", "getUpdates", params=params, timeout=timeout + BALE_HTTP_TIMEOUT)
+    return response.json()
@@ -0,0 +1,195 @@
+"""
+Local stand-in for the Bale Bot API, for tests and benchmarks.
+
+    with BaleStubServer() as stub:
+        bale_api.BASE_URL = stub.base_url
+        stub.push_message(chat_id=1, text="/start")
+        ...
+        stub.calls("sendMessage")
+
+It serves getUpdates with long-poll semantics and records every other method call.
+`fail_next` injects 429/5xx/4xx answers to exercise retry paths.
+"""
+import json
+import time
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+
+def _parse_body(content_type: str, body: bytes) -> Dict[str, Any]:
+    """Decode a JSON, form or multipart request body into a dict of fields."""
+    if content_type.startswith("application/json"):
+        return json.loads(body or b"{}")
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True)
+            if part.get_filename():
+                fields[name] = {"filename": part.get_filename(), "size": len(payload)}
+            else:
+                fields[name] = payload.decode("utf-8")
+        return fields
+    return dict(parse_qsl(body.decode("utf-8")))
+
+
+class BaleStubServer:
+    """Threaded HTTP server that speaks enough of the Bot API for the bot's calls."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, token: str = "test-token", latency: float = 0.0):
+        self.token = token
+        self.latency = latency  # Seconds added to every non-polling call
+        self._updates: List[Dict[str, Any]] = []
+        self._calls: List[Dict[str, Any]] = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._failures: Dict[str, List[Dict[str, Any]]] = {}
+        self.rejected = 0  # Calls answered with an injected error
+        self.file_ids = set()  # file_ids this server handed out; others are rejected
+        self._cond = threading.Condition()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """Value for bale_api.BASE_URL pointing at this server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot{self.token}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def push_message(self, chat_id: int, text: str) -> int:
+        """Queue a text message update from `chat_id`; returns its update_id."""
+        with self._cond:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            self._updates.append({
+                "update_id": update_id,
+                "message": {"message_id": update_id, "chat": {"id": chat_id}, "text": text},
+            })
+            self._cond.notify_all()
+        return update_id
+
+    def fail_next(self, method: str, status: int, times: int = 1, retry_after: Optional[int] = None):
+        """Answer the next `times` calls of `method` with HTTP `status` (e.g. 429, 500, 400)."""
+        error = {"ok": False, "error_code": status, "description": f"Injected {status}"}
+        if retry_after is not None:
+            error["parameters"] = {"retry_after": retry_after}
+        with self._cond:
+            self._failures.setdefault(method, []).extend([error] * times)
+
+    def _take_failure(self, method: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            failures = self._failures.get(method)
+            if failures:
+                self.rejected += 1
+                return failures.pop(0)
+        return None
+
+    def calls(self, method: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Recorded calls as {"method", "params", "at"}, optionally filtered by method."""
+        with self._cond:
+            return [call for call in self._calls if method is None or call["method"] == method]
+
+    def wait_for_calls(self, method: str, count: int, timeout: float = 5.0) -> List[Dict[str, Any]]:
+        """Block until `count` calls of `method` were recorded, then return them."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                calls = [call for call in self._calls if call["method"] == method]
+                remaining = deadline - time.monotonic()
+                if len(calls) >= count or remaining <= 0:
+                    return calls
+                self._cond.wait(remaining)
+
+    def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        deadline = time.monotonic() + float(params.get("timeout") or 0)
+        with self._cond:
+            # Like the real API, asking for an offset confirms everything before it.
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            return list(self._updates)
+
+    def _record(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._cond:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+            self._calls.append({"method": method, "params": params, "at": time.monotonic()})
+            result = {"message_id": message_id, "chat": {"id": params.get("chat_id")}}
+            if method == "sendDocument":
+                file_id = params["document"] if isinstance(params.get("document"), str) else f"file-{message_id}"
+                self.file_ids.add(file_id)
+                result["document"] = {"file_id": file_id}
+            self._cond.notify_all()
+        return result
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+            # Headers and body go out in separate writes; without this, Nagle plus the
+            # client's delayed ACK adds ~40 ms to every response.
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, params):
+                prefix = f"/bot{stub.token}/"
+                path = urlsplit(self.path).path
+                if not path.startswith(prefix):
+                    return self._send(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+                method = path[len(prefix):]
+                if method == "getUpdates":
+                    return self._send(200, {"ok": True, "result": stub._get_updates(params)})
+                failure = stub._take_failure(method)
+                if failure:
+                    return self._send(failure["error_code"], failure)
+                document = params.get("document")
+                if method == "sendDocument" and isinstance(document, str) and document not in stub.file_ids:
+                    return self._send(400, {"ok": False, "error_code": 400, "description": "Bad Request: wrong file identifier"})
+                return self._send(200, {"ok": True, "result": stub._record(method, params)})
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond(dict(parse_qsl(urlsplit(self.path).query)))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                self._respond(_parse_body(self.headers.get("Content-Type", ""), body))
+
+        return Handler
@@ -1,55 +1,242 @@
 # bot.py
+"""
+Webhook runtime.
+
+/webhook only checks that the body looks like an update and queues it, so Bale gets
+its 200 straight away. A pool of worker threads then runs the same handlers as the
+polling runtimes (app.handlers). All updates of one chat go to the same worker, so
+they are handled in arrival order. Redelivered update_ids are dropped by a small
+in-process LRU and then by the ProcessedUpdate table, which every process shares.
+That lets several processes run behind a load balancer:
+
+    gunicorn -w 4 -b 0.0.0.0:5000 app.bot:app
+
+GET /metrics serves app.metrics in the Prometheus text format. With PROFILER_TOKEN
+set, POST /debug/profiler (header X-Profiler-Token, ?action=start|stop) switches the
+sampling profiler of the process that answers on and off.
+"""
 import os
-import requests
-from flask import Flask, request, jsonify
-from app.db_export import init_db, Payslip
+import sys
+import hmac
+import queue
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import Flask, Response, request, jsonify
+
+from app import handlers, metrics
+from app.async_bot import chat_id_of
+from app.db_export import ProcessedUpdate, claim_update, init_db, unit_of_work
+from app.dispatcher import DISPATCH_ENABLED, Dispatcher
 
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-BASE_URL = f"https://tapi.bale.ai/bot{BOT_TOKEN}/"
+logger = logging.getLogger("Webhook")
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))             # Handler threads per process
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))    # Queued updates before /webhook answers 503
+WEBHOOK_DEDUP_SIZE = int(os.getenv("WEBHOOK_DEDUP_SIZE", "10000"))   # Recent update_ids remembered in memory
+WEBHOOK_DEDUP_TTL = float(os.getenv("WEBHOOK_DEDUP_TTL", "86400"))   # Seconds a claimed update_id stays in the DB
+# Shared secret for /debug/profiler; the route answers 404 while it is unset.
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")
+
+# Claims between deletions of ProcessedUpdate rows older than the TTL.
+PRUNE_EVERY = 1000
 
 app = Flask(__name__)
 
-def send_message(chat_id, text):
-    """Send a text message via Bale Bot API."""
-    url = BASE_URL + "sendMessage"
-    payload = {"chat_id": chat_id, "text": text}
-    requests.post(url, json=payload)
+
+class UpdatePool:
+    """
+    Worker threads that handle queued updates.
+
+    Each worker has its own bounded queue and a chat always maps to the same one.
+    An update is claimed in the database just before it is handled, so a crash in
+    the handler loses that update rather than answering it twice.
+    """
+
+    def __init__(
+        self,
+        handle_update: Callable[[Dict[str, Any]], None] = handlers.handle_update,
+        workers: int = WEBHOOK_WORKERS,
+        queue_size: int = WEBHOOK_QUEUE_SIZE,
+        dedup_size: int = WEBHOOK_DEDUP_SIZE,
+        dedup_ttl: float = WEBHOOK_DEDUP_TTL,
+    ):
+        self.handle_update = handle_update
+        self.dedup_size = dedup_size
+        self.dedup_ttl = dedup_ttl
+        self.handled = 0
+        self.failed = 0
+        self.duplicates = 0
+        self._queues = [queue.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)]
+        self._threads: List[threading.Thread] = []
+        self._recent: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._claims = 0
+
+    def start(self):
+        for number, updates in enumerate(self._queues):
+            thread = threading.Thread(target=self._work, args=(updates,), name=f"webhook-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """Handle what is already queued, then stop the workers."""
+        for updates in self._queues:
+            updates.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def join(self):
+        """Wait until every queued update has been handled."""
+        for updates in self._queues:
+            updates.join()
+
+    def submit(self, update: Dict[str, Any]) -> bool:
+        """Queue an update; False when the chat's worker is full and Bale should retry later."""
+        update_id = update["update_id"]
+        with self._lock:
+            if update_id in self._recent:
+                self.duplicates += 1
+                return True
+            self._recent[update_id] = None
+            if len(self._recent) > self.dedup_size:
+                self._recent.popitem(last=False)
+        updates = self._queues[hash(chat_id_of(update)) % len(self._queues)]
+        try:
+            updates.put_nowait(update)
+        except queue.Full:
+            with self._lock:
+                self._recent.pop(update_id, None)
+            return False
+        return True
+
+    def _work(self, updates: queue.Queue):
+        while True:
+            update = updates.get()
+            try:
+                if update is None:
+                    return
+                self._process(update)
+            finally:
+                updates.task_done()
+
+    def _process(self, update: Dict[str, Any]):
+        try:
+            with unit_of_work():
+                if not claim_update(update["update_id"]):
+                    with self._lock:
+                        self.duplicates += 1
+                    return
+                self.handle_update(update)
+            with self._lock:
+                self.handled += 1
+                self._claims += 1
+                prune = self._claims % PRUNE_EVERY == 0
+            if prune:
+                self.prune()
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            logger.exception(f"Error handling update {update.get('update_id')}")
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "queued": sum(updates.qsize() for updates in self._queues),
+                "handled": self.handled,
+                "failed": self.failed,
+                "duplicates": self.duplicates,
+            }
+
+    def prune(self) -> int:
+        """Forget claimed update_ids older than the dedup TTL; Bale stops redelivering long before."""
+        cutoff = datetime.now() - timedelta(seconds=self.dedup_ttl)
+        with unit_of_work():
+            return ProcessedUpdate.delete().where(ProcessedUpdate.received_at < cutoff).execute()
+
+
+_pool: Optional[UpdatePool] = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def update_pool() -> UpdatePool:
+    """This process's pool, started on first use so each forked server worker gets its own threads."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if DISPATCH_ENABLED and handlers.dispatcher is None:
+                handlers.dispatcher = Dispatcher().start()
+            _pool, _pool_pid = UpdatePool().start(), os.getpid()
+            metrics.gauge("webhook", _pool.snapshot)
+            # Threads do not survive a fork, so each server worker starts its own reporter.
+            metrics.start_log_reporter()
+        return _pool
+
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
-    """Handle incoming webhook updates from Bale."""
-    update = request.get_json()
-    if not update:
+    """Queue an incoming webhook update from Bale and acknowledge it."""
+    update = request.get_json(silent=True)
+    if not isinstance(update, dict) or not isinstance(update.get("update_id"), int):
         return jsonify({"ok": False, "description": "No update found"}), 400
-
-    if "message" in update:
-        message = update["message"]
-        chat_id = message["chat"]["id"]
-        text = message.get("text", "").strip()
-
-        # When the user sends /start, ask for their national code in Persian.
-        if text.lower() == "/start":
-            send_message(chat_id, "سلام! لطفاً کد ملی خود را وارد کنید:")
-        else:
-            # Validate if the message is a valid 10-digit national code.
-            if len(text) == 10 and text.isdigit():
-                # Update all Payslip records with the matching national code to include this chat_id.
-                updated = (Payslip
-                           .update(chat_id=str(chat_id))
-                           .where(Payslip.national_code == text)
-                           .execute())
-                if updated:
-                    send_message(chat_id, f"کد ملی {text} ثبت شد. شناسه چت شما ذخیره گردید.")
-                else:
-                    # If no payslip record exists, you could choose to create a placeholder,
-                    # or simply inform the user that no payroll info is available.
-                    send_message(chat_id, "برای این کد ملی سابقه‌ای یافت نشد. لطفاً بعداً دوباره تلاش کنید.")
-            else:
-                send_message(chat_id, "لطفاً یک کد ملی ۱۰ رقمی معتبر ارسال کنید.")
+    if not update_pool().submit(update):
+        return jsonify({"ok": False, "description": "Too many pending updates"}), 503
     return jsonify({"ok": True})
 
-if __name__ == '__main__':
-    init_db()  # Ensure the database is initialized (Payslip table exists)
-    port = int(os.getenv("PORT", 5000))
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Counters, latency histograms and cache and queue gauges of this process."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/debug/profiler', methods=['POST'])
+def profiler_endpoint():
+    """Start or stop this process's sampling profiler without a restart."""
+    if not PROFILER_TOKEN:
+        return jsonify({"ok": False, "description": "Not found"}), 404
+    if not hmac.compare_digest(request.headers.get("X-Profiler-Token", ""), PROFILER_TOKEN):
+        return jsonify({"ok": False, "description": "Forbidden"}), 403
+    action = request.args.get("action", "toggle")
+    if action == "start":
+        metrics.profiler.start()
+        path = None
+    elif action == "stop":
+        path = metrics.profiler.stop()
+    elif action == "toggle":
+        path = metrics.profiler.toggle()
+    else:
+        return jsonify({"ok": False, "description": "action must be start, stop or toggle"}), 400
+    return jsonify({"ok": True, "running": metrics.profiler.running, "profile": path})
+
+
+def serve(host="0.0.0.0", port=None):
+    """Run the webhook on Flask's own server; use gunicorn for more than one process."""
+    port = port or int(os.getenv("PORT", 5000))
+    update_pool()
     # Run the Flask server (ensure your deployment provides HTTPS)
-    app.run(host='0.0.0.0', port=port)
+    app.run(host=host, port=port, threaded=True)
+
+
+def main(argv=None) -> int:
+    """Webhook role: `python -m app webhook [--port 5000]`."""
+    parser = argparse.ArgumentParser(description="Serve the Bale webhook.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=None, help="Defaults to $PORT or 5000")
+    args = parser.parse_args(argv)
+    init_db()  # Ensure the database is initialized (tables exist)
+    metrics.install_profiler_signal()
+    serve(args.host, args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, Optional
+
+from peewee import JOIN
+
+from app.db_export import DB_BATCH_SIZE, BroadcastDelivery, OutboundMessage, Payslip, init_db, unit_of_work
+from app.dispatcher import (
+    DISPATCH_MAX_ATTEMPTS, DISPATCH_RATE, PermanentError, RetryableError, backoff_delay, deliver,
+)
+from app.utils import TokenBucket, parse_month
+
+logger = logging.getLogger("Broadcast")
+
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "8"))                  # Recipients served at once
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "10"))  # Seconds between progress lines
+
+DOCUMENT_CAPTION = "فایل حقوقی شما"
+
+
+def format_summary(payslip) -> str:
+    """Text message sent ahead of the payslip PDF."""
+    return (
+        f"نام: {payslip.name}\n"
+        f"نام خانوادگی: {payslip.family_name}\n"
+        f"حقوق کل: {payslip.total_salary}\n"
+        f"پرداخت خالص: {payslip.net_payment}\n"
+    )
+
+
+@dataclass
+class BroadcastReport:
+    """Outcome of one broadcast run."""
+
+    year: int
+    month: int
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.failed
+
+    @property
+    def per_second(self) -> float:
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        rate = self.per_second
+        return (self.total - self.done) / rate if rate else None
+
+    def log(self, final: bool = False):
+        eta = f", ETA {self.eta:.0f}s" if self.eta is not None and not final else ""
+        logger.info(
+            f"Broadcast {self.year}/{self.month:02d}: {self.done}/{self.total} recipients "
+            f"({self.sent} sent, {self.failed} failed) in {self.elapsed:.1f}s, {self.per_second:.1f}/s{eta}"
+        )
+
+
+class Broadcast:
+    """
+    Sends one month's payslips to every registered employee.
+
+    Payslips with a chat_id are read in id order, one page per query, skipping those
+    already delivered. Each recipient gets the summary and then the PDF; up to
+    `concurrency` recipients are served at once under a shared `rate` limit, with the
+    dispatcher's retry and backoff rules. Progress is written to BroadcastDelivery
+    after every step, so running the same month again resumes where it stopped and
+    never repeats a delivered summary or PDF.
+    """
+
+    def __init__(
+        self,
+        year: int,
+        month: int,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        rate: float = DISPATCH_RATE,
+        max_attempts: int = DISPATCH_MAX_ATTEMPTS,
+        progress_interval: float = BROADCAST_PROGRESS_INTERVAL,
+        batch_size: int = DB_BATCH_SIZE,
+    ):
+        self.year = year
+        self.month = month
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate)
+        self.max_attempts = max_attempts
+        self.progress_interval = progress_interval
+        self.batch_size = batch_size
+
+    def _pending_query(self):
+        delivered = (BroadcastDelivery.payslip_id == Payslip.id) & (BroadcastDelivery.chat_id == Payslip.chat_id)
+        return (Payslip
+                .select(Payslip, BroadcastDelivery.status.alias("delivery_status"))
+                .join(BroadcastDelivery, JOIN.LEFT_OUTER, on=delivered)
+                .where(Payslip.year == self.year,
+                       Payslip.month == self.month,
+                       Payslip.chat_id.is_null(False),
+                       BroadcastDelivery.status.is_null() | (BroadcastDelivery.status != "sent")))
+
+    def pending_count(self) -> int:
+        with unit_of_work():
+            return self._pending_query().count()
+
+    def recipients(self) -> Iterator[Payslip]:
+        """Yield payslips still to deliver; each carries the `delivery_status` of an earlier run."""
+        last_id = 0
+        while True:
+            # Keyset pages keep no read transaction open while the senders write progress.
+            with unit_of_work():
+                page = list(self._pending_query()
+                            .where(Payslip.id > last_id)
+                            .order_by(Payslip.id)
+                            .limit(self.batch_size)
+                            .objects())
+            if not page:
+                return
+            yield from page
+            last_id = page[-1].id
+
+    def _record(self, payslip: Payslip, status: str, attempts: int, error: Optional[str] = None):
+        with unit_of_work():
+            (BroadcastDelivery
+             .insert(payslip_id=payslip.id, chat_id=payslip.chat_id, year=self.year, month=self.month,
+                     status=status, attempts=attempts, last_error=error, updated_at=datetime.now())
+             .on_conflict(conflict_target=[BroadcastDelivery.payslip_id, BroadcastDelivery.chat_id],
+                          update={BroadcastDelivery.status: status,
+                                  BroadcastDelivery.attempts: BroadcastDelivery.attempts + attempts,
+                                  BroadcastDelivery.last_error: error,
+                                  BroadcastDelivery.updated_at: datetime.now()})
+             .execute())
+
+    def _send(self, job: OutboundMessage) -> int:
+        """Deliver one message with retries; returns the attempts used or raises the last error."""
+        for attempt in range(1, self.max_attempts + 1):
+            self.bucket.acquire()
+            try:
+                deliver(job)
+                return attempt
+            except RetryableError as e:
+                if attempt == self.max_attempts:
+                    e.attempts = attempt
+                    raise
+                time.sleep(e.retry_after if e.retry_after is not None else backoff_delay(attempt))
+            except PermanentError as e:
+                e.attempts = attempt
+                raise
+
+    def deliver_to(self, payslip: Payslip) -> bool:
+        """Send the summary (unless an earlier run did) and the PDF to the payslip's chat."""
+        attempts = 0
+        summary_sent = payslip.delivery_status == "summary"
+        try:
+            if not summary_sent:
+                attempts += self._send(OutboundMessage(chat_id=payslip.chat_id, kind="message",
+                                                       text=format_summary(payslip)))
+                summary_sent = True
+                self._record(payslip, "summary", attempts)
+                attempts = 0
+            if not payslip.pdf_path or not os.path.exists(payslip.pdf_path):
+                raise PermanentError(f"File not found: {payslip.pdf_path}")
+            attempts += self._send(OutboundMessage(chat_id=payslip.chat_id, kind="document",
+                                                   file_path=payslip.pdf_path, text=DOCUMENT_CAPTION))
+        except (RetryableError, PermanentError) as e:
+            attempts += getattr(e, "attempts", 0)
+            logger.warning(f"Broadcast to {payslip.chat_id} (payslip {payslip.id}) failed: {e}")
+            # A failed PDF keeps the "summary" status so a rerun doesn't repeat the text.
+            self._record(payslip, "summary" if summary_sent else "failed", attempts, str(e))
+            return False
+        self._record(payslip, "sent", attempts)
+        return True
+
+    def run(self) -> BroadcastReport:
+        """Deliver every pending payslip of the month and return the totals."""
+        report = BroadcastReport(self.year, self.month, total=self.pending_count())
+        if not report.total:
+            logger.info(f"Broadcast {self.year}/{self.month:02d}: nothing to send")
+            return report
+
+        lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.concurrency * 2)
+        started = time.perf_counter()
+        logged_at = started
+
+        def done(future):
+            nonlocal logged_at
+            slots.release()
+            ok = not future.exception() and future.result()
+            with lock:
+                if ok:
+                    report.sent += 1
+                else:
+                    report.failed += 1
+                now = time.perf_counter()
+                report.elapsed = now - started
+                if now - logged_at >= self.progress_interval:
+                    logged_at = now
+                    report.log()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="broadcast") as pool:
+            for payslip in self.recipients():
+                slots.acquire()
+                pool.submit(self.deliver_to, payslip).add_done_callback(done)
+        report.elapsed = time.perf_counter() - started
+        report.log(final=True)
+        return report
+
+
+def broadcast_month(year: int, month: int, **kwargs) -> BroadcastReport:
+    return Broadcast(year, month, **kwargs).run()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Send a month's payslips to every registered employee.")
+    parser.add_argument("year", type=int, help="Payslip year, e.g. 1403")
+    parser.add_argument("month", help="Month number (1-12) or Persian month name")
+    parser.add_argument("--concurrency", type=int, default=BROADCAST_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=DISPATCH_RATE, help="Sends per second")
+    parser.add_argument("--progress-interval", type=float, default=BROADCAST_PROGRESS_INTERVAL)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    month = parse_month(args.month)
+    if month is None:
+        parser.error(f"not a month: {args.month}")
+    init_db()
+    report = broadcast_month(args.year, month, concurrency=args.concurrency, rate=args.rate,
+                             progress_interval=args.progress_interval)
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, NamedTuple, Optional, Set
+
+# Registered chats kept in memory before the least recently used is dropped.
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "50000"))
+# Seconds an entry is trusted; bounds how stale it gets when another process writes.
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "300"))
+
+
+class CachedChat(NamedTuple):
+    """What /getpayslip needs to know about a registered chat."""
+
+    national_code: str
+    payslip_id: Optional[int]           # The latest payslip of the national code
+    cooldown_until: Optional[datetime]  # No new request is served before this
+
+
+class ChatCache:
+    """
+    LRU map of chat_id to CachedChat, so cooldown checks and repeat /getpayslip
+    requests are answered without a query. Ingestion drops the entries of the
+    national codes it stored; registration drops the entries it changes.
+    """
+
+    def __init__(self, max_entries: int = CHAT_CACHE_SIZE, ttl: float = CHAT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # chat_id -> (expires, CachedChat)
+        self._chats_by_code: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, chat_id) -> Optional[CachedChat]:
+        key = str(chat_id)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] <= time.monotonic():
+                self._drop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, chat_id, entry: CachedChat):
+        key = str(chat_id)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._chats_by_code.setdefault(entry.national_code, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_chat(self, chat_id):
+        with self._lock:
+            self._drop(str(chat_id))
+
+    def invalidate_national_codes(self, national_codes: Iterable[str]):
+        """Forget every chat registered to one of these national codes."""
+        with self._lock:
+            for code in set(national_codes):
+                for key in self._chats_by_code.pop(code, ()):
+                    self._entries.pop(key, None)
+
+    def _drop(self, key: str):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            chats = self._chats_by_code.get(item[1].national_code)
+            if chats is not None:
+                chats.discard(key)
+                if not chats:
+                    del self._chats_by_code[item[1].national_code]
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -1,13 +1,26 @@
 import os
 import logging
+from contextlib import contextmanager
+from datetime import datetime
 
 from dotenv import load_dotenv
 from peewee import (
     Model,
+    BigIntegerField,
     CharField,
     DateTimeField,
-    PostgresqlDatabase
+    DecimalField,
+    IntegerField,
+    IntegrityError,
+    SqliteDatabase,
+    TextField,
+    chunked
 )
+from playhouse.pool import PooledPostgresqlDatabase
+from playhouse.shortcuts import ReconnectMixin
+
+from app import metrics
+from app.utils import parse_decimal, parse_int, parse_month
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,29 +31,73 @@ logger.setLevel(logging.INFO)
 handler = logging.StreamHandler()
 logger.addHandler(handler)
 
+# "postgres" (default) or "sqlite" for tests and small deployments
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "payslips.db")
+
 # Database credentials from .env
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT", "5432")  # Default to 5432 if not specified
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "500"))  # Rows per bulk INSERT / transaction
 
-# Validate environment variables (optional but recommended)
-missing_vars = [var for var in ["DB_NAME", "DB_USER", "DB_PASSWORD", "DB_HOST"] 
-                if not globals().get(var)]
-if missing_vars:
-    msg = f"Missing required environment variables: {', '.join(missing_vars)}"
-    logger.error(msg)
-    raise EnvironmentError(msg)
-
-# Set up the PostgreSQL database connection with Peewee
-database = PostgresqlDatabase(
-    DB_NAME,
-    user=DB_USER,
-    password=DB_PASSWORD,
-    host=DB_HOST,
-    port=DB_PORT
-)
+# Connection pool settings (Postgres only)
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "10"))
+DB_STALE_TIMEOUT = int(os.getenv("DB_STALE_TIMEOUT", "300"))  # Seconds before an idle connection is recycled
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))   # Seconds to wait for a free connection
+
+# peewee-migrate migrations that bring an existing table up to the current schema
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+
+class ReconnectingPooledPostgresqlDatabase(ReconnectMixin, PooledPostgresqlDatabase):
+    """Pooled Postgres connections that reconnect and retry a query once if the server dropped them."""
+
+
+def make_database():
+    """Build the database for DB_BACKEND: a reconnecting Postgres pool, or a local SQLite file."""
+    if DB_BACKEND == "sqlite":
+        # WAL lets the bot thread read while ingestion writes.
+        return SqliteDatabase(SQLITE_PATH, pragmas={"journal_mode": "wal", "busy_timeout": 5000})
+
+    # Validate environment variables (optional but recommended)
+    missing_vars = [var for var in ["DB_NAME", "DB_USER", "DB_PASSWORD", "DB_HOST"]
+                    if not globals().get(var)]
+    if missing_vars:
+        msg = f"Missing required environment variables: {', '.join(missing_vars)}"
+        logger.error(msg)
+        raise EnvironmentError(msg)
+
+    # Set up the pooled PostgreSQL database connection with Peewee
+    return ReconnectingPooledPostgresqlDatabase(
+        DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT,
+        max_connections=DB_MAX_CONNECTIONS,
+        stale_timeout=DB_STALE_TIMEOUT,
+        timeout=DB_POOL_TIMEOUT,
+    )
+
+
+database = make_database()
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Hold a connection for one unit of work (a bot update, an ingestion batch) and
+    return it to the pool afterwards. Nested units reuse the outer connection.
+    """
+    opened = database.connect(reuse_if_open=True)
+    try:
+        yield database
+    finally:
+        if opened:
+            database.close()
 
 class Payslip(Model):
     """
@@ -49,38 +106,159 @@ class Payslip(Model):
     """
     name = CharField(null=True)
     family_name = CharField(null=True)
-    national_code = CharField(null=True)
+    national_code = CharField(null=True, index=True)
     personnel_number = CharField(null=True)
     insurance_number = CharField(null=True)
     company_name = CharField(null=True)
-    year = CharField(null=True)
-    month = CharField(null=True)
-    standard_working_days = CharField(null=True)
-    base_salary = CharField(null=True)
-    housing_allowance = CharField(null=True)
-    food_allowance = CharField(null=True)
-    total_salary = CharField(null=True)
-    employee_insurance = CharField(null=True)
-    food_expense = CharField(null=True)
-    total_deductions = CharField(null=True)
-    net_payment = CharField(null=True)
+    year = IntegerField(null=True)
+    month = IntegerField(null=True)      # 1 (Farvardin) .. 12 (Esfand)
+    standard_working_days = DecimalField(max_digits=6, decimal_places=2, null=True)
+    # Amounts are whole Rials
+    base_salary = BigIntegerField(null=True)
+    housing_allowance = BigIntegerField(null=True)
+    food_allowance = BigIntegerField(null=True)
+    total_salary = BigIntegerField(null=True)
+    employee_insurance = BigIntegerField(null=True)
+    food_expense = BigIntegerField(null=True)
+    total_deductions = BigIntegerField(null=True)
+    net_payment = BigIntegerField(null=True)
     net_payment_text = CharField(null=True)
 
     # New fields for bot usage
-    chat_id = CharField(null=True)       # store user’s chat ID
+    chat_id = CharField(null=True, index=True)       # store user’s chat ID
     last_request_at = DateTimeField(null=True)
     pdf_path = CharField(null=True)
 
+    class Meta:
+        database = database
+        indexes = (
+            # One payslip per person per month; bulk writes upsert on this key.
+            (("national_code", "year", "month"), True),
+        )
+
+# "Latest payslip for a national code" is answered straight from this index.
+Payslip.add_index(Payslip.index(Payslip.national_code, Payslip.id.desc(), name="payslip_national_code_id_desc"))
+
+# Typed columns and the parser that turns the extractor's strings into them.
+FIELD_PARSERS = {
+    "year": parse_int,
+    "month": parse_month,
+    "standard_working_days": parse_decimal,
+    "base_salary": parse_int,
+    "housing_allowance": parse_int,
+    "food_allowance": parse_int,
+    "total_salary": parse_int,
+    "employee_insurance": parse_int,
+    "food_expense": parse_int,
+    "total_deductions": parse_int,
+    "net_payment": parse_int,
+}
+
+class OutboundMessage(Model):
+    """
+    Durable queue of messages and documents waiting to be sent to Bale.
+    Rows move pending -> sending -> sent, or back to pending with a later
+    next_attempt_at on a retryable error, or to failed.
+    """
+    chat_id = CharField()
+    kind = CharField()                   # "message" or "document"
+    text = TextField(null=True)          # message text, or document caption
+    file_path = CharField(null=True)
+    status = CharField(default="pending")
+    attempts = IntegerField(default=0)
+    next_attempt_at = DateTimeField(default=datetime.now)
+    last_error = TextField(null=True)
+    created_at = DateTimeField(default=datetime.now)
+    sent_at = DateTimeField(null=True)
+
+    class Meta:
+        database = database
+        indexes = (
+            (("status", "next_attempt_at"), False),
+            (("chat_id", "id"), False),
+        )
+
+class UploadedFile(Model):
+    """Bale file_id of an uploaded PDF, keyed by content hash so edited files are re-uploaded."""
+    sha256 = CharField(primary_key=True)
+    file_id = CharField()
+    uploaded_at = DateTimeField(default=datetime.now)
+
     class Meta:
         database = database
 
+class BroadcastDelivery(Model):
+    """
+    Progress of the monthly broadcast, one row per payslip and chat.
+    status is "summary" once the text is delivered, "sent" once the PDF is too, and
+    "failed" if not even the text got through; a rerun resumes from these rows.
+    """
+    payslip_id = IntegerField()
+    chat_id = CharField()
+    year = IntegerField()
+    month = IntegerField()
+    status = CharField()
+    attempts = IntegerField(default=0)
+    last_error = TextField(null=True)
+    updated_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        database = database
+        indexes = (
+            (("payslip_id", "chat_id"), True),
+            (("year", "month", "status"), False),
+        )
+
+class ConversationState(Model):
+    """Where a chat is in the registration conversation, shared by every bot process."""
+    chat_id = CharField(primary_key=True)
+    state = TextField()                  # JSON object
+    expires_at = DateTimeField(index=True)
+
+    class Meta:
+        database = database
+
+class ProcessedUpdate(Model):
+    """Bale update_ids already taken by a webhook worker; absorbs redeliveries across processes."""
+    update_id = BigIntegerField(primary_key=True)
+    received_at = DateTimeField(default=datetime.now, index=True)
+
+    class Meta:
+        database = database
+
+# Every model, in creation order
+MODELS = [Payslip, OutboundMessage, UploadedFile, BroadcastDelivery, ConversationState, ProcessedUpdate]
+
+# Natural key of a payslip and the columns a re-ingested payslip may overwrite.
+# chat_id and last_request_at belong to the bot and are never touched by ingestion.
+NATURAL_KEY = (Payslip.national_code, Payslip.year, Payslip.month)
+PAYSLIP_DATA_FIELDS = [
+    field for field in Payslip._meta.sorted_fields
+    if field.name not in ("id", "chat_id", "last_request_at")
+]
+
+def to_db_row(data_dict):
+    """Return a copy of an extracted payslip dictionary with typed values for the typed columns."""
+    return {
+        key: FIELD_PARSERS[key](value) if key in FIELD_PARSERS else value
+        for key, value in data_dict.items()
+    }
+
+def migrate_db():
+    """Apply pending peewee-migrate migrations, creating or upgrading the payslip table."""
+    from peewee_migrate import Router
+
+    applied = Router(database, migrate_dir=MIGRATIONS_DIR, logger=logger).run()
+    if applied:
+        logger.info(f"Applied migrations: {', '.join(applied)}")
+
 def init_db():
     """
-    Initialize the database connection and create the table if it doesn’t exist.
+    Initialize the database connection and create or migrate the table.
     """
     try:
-        database.connect(reuse_if_open=True)
-        database.create_tables([Payslip], safe=True)
+        with unit_of_work():
+            migrate_db()
         logger.info("Database initialized successfully.")
     except Exception as e:
         logger.error(f"Failed to initialize database: {str(e)}")
@@ -99,8 +277,81 @@ def save_to_db(data_dict):
         }
     """
     try:
-        Payslip.create(**data_dict)
+        Payslip.create(**to_db_row(data_dict))
         logger.info("Data saved to database successfully.")
     except Exception as e:
         logger.error(f"Error saving data to database: {str(e)}")
         raise
+
+
+def save_many(rows, batch_size=DB_BATCH_SIZE):
+    """
+    Bulk upsert payslip dictionaries, `batch_size` rows per INSERT and per transaction.
+    A row whose (national_code, year, month) already exists updates that payslip in place.
+    New payslips of an employee who registered a chat on an earlier one get that chat_id,
+    so broadcasts and /getpayslip reach them. Returns the number of rows written.
+    """
+    # Later rows win, and a single INSERT ... ON CONFLICT may not touch the same key twice.
+    keyed, unkeyed = {}, []
+    for row in map(to_db_row, rows):
+        key = tuple(row.get(field.name) for field in NATURAL_KEY)
+        if None in key:
+            unkeyed.append(row)
+        else:
+            keyed[key] = row
+    rows = [
+        {field.name: row.get(field.name) for field in PAYSLIP_DATA_FIELDS}
+        for row in unkeyed + list(keyed.values())
+    ]
+
+    for batch in chunked(rows, batch_size):
+        with metrics.timer("db_write_seconds", op="save_many"), database.atomic():
+            (Payslip
+             .insert_many(batch)
+             .on_conflict(
+                 conflict_target=list(NATURAL_KEY),
+                 preserve=[field for field in PAYSLIP_DATA_FIELDS
+                           if field.name not in {key.name for key in NATURAL_KEY}])
+             .execute())
+            inherit_chat_ids({row["national_code"] for row in batch if row.get("national_code")})
+    logger.info(f"Saved {len(rows)} payslips to database.")
+    return len(rows)
+
+def registered_chat_ids(national_codes, batch_size=DB_BATCH_SIZE):
+    """Return {national_code: chat_id} for the given national codes that have registered a chat."""
+    codes = sorted({code for code in national_codes if code})
+    chat_ids = {}
+    for batch in chunked(codes, batch_size):
+        query = (Payslip
+                 .select(Payslip.national_code, Payslip.chat_id)
+                 .where(Payslip.national_code.in_(batch), Payslip.chat_id.is_null(False))
+                 .distinct()
+                 .tuples())
+        chat_ids.update(query)
+    return chat_ids
+
+def inherit_chat_ids(national_codes):
+    """Give payslips without a chat the chat_id their employee registered on another payslip."""
+    if not national_codes:
+        return 0
+    Known = Payslip.alias()
+    known_chat = (Known
+                  .select(Known.chat_id)
+                  .where(Known.national_code == Payslip.national_code, Known.chat_id.is_null(False))
+                  .limit(1))
+    registered = (Known
+                  .select(Known.national_code)
+                  .where(Known.national_code.in_(list(national_codes)), Known.chat_id.is_null(False)))
+    return (Payslip
+            .update(chat_id=known_chat)
+            .where(Payslip.chat_id.is_null(), Payslip.national_code.in_(registered))
+            .execute())
+
+def claim_update(update_id):
+    """Record `update_id` as processed; False if some process already claimed it."""
+    try:
+        with metrics.timer("db_write_seconds", op="claim_update"), database.atomic():
+            ProcessedUpdate.create(update_id=update_id)
+        return True
+    except IntegrityError:
+        return False
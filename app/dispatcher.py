@@ -0,0 +1,289 @@
+import os
+import time
+import queue
+import random
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict
+
+import requests
+from peewee import fn
+
+from app import bale_api, metrics, uploads
+from app.db_export import OutboundMessage, unit_of_work
+from app.utils import TokenBucket
+
+logger = logging.getLogger("Dispatcher")
+
+# Route the bot's outgoing messages through this durable, rate-limited queue
+DISPATCH_ENABLED = os.getenv("DISPATCH_ENABLED", "1") == "1"
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "8"))
+DISPATCH_RATE = float(os.getenv("DISPATCH_RATE", "20"))            # Sends per second for the bot
+DISPATCH_CHAT_RATE = float(os.getenv("DISPATCH_CHAT_RATE", "1"))   # Sends per second to one chat
+DISPATCH_CHAT_BURST = float(os.getenv("DISPATCH_CHAT_BURST", "3"))
+DISPATCH_MAX_ATTEMPTS = int(os.getenv("DISPATCH_MAX_ATTEMPTS", "8"))
+DISPATCH_BACKOFF_BASE = float(os.getenv("DISPATCH_BACKOFF_BASE", "1"))    # Seconds before the first retry
+DISPATCH_BACKOFF_MAX = float(os.getenv("DISPATCH_BACKOFF_MAX", "300"))
+DISPATCH_POLL_INTERVAL = float(os.getenv("DISPATCH_POLL_INTERVAL", "0.5"))  # Seconds between queue scans
+
+
+class RetryableError(Exception):
+    """A send that may succeed later (429, 5xx, network error)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PermanentError(Exception):
+    """A send that will never succeed as-is (other 4xx, missing file)."""
+
+
+@dataclass
+class DispatcherMetrics:
+    """Counters and send latency of a Dispatcher."""
+
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def observe(self, outcome: str, latency: float):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            attempts = self.sent + self.failed + self.retried
+            return {
+                "queue_depth": queue_depth(),
+                "sent": self.sent,
+                "failed": self.failed,
+                "retried": self.retried,
+                "latency_avg": self.latency_total / attempts if attempts else 0.0,
+                "latency_max": self.latency_max,
+            }
+
+
+def queue_depth() -> int:
+    """Number of messages waiting to be sent."""
+    with unit_of_work():
+        return OutboundMessage.select().where(OutboundMessage.status.in_(["pending", "sending"])).count()
+
+
+def enqueue_message(chat_id, text) -> int:
+    """Persist a text message for delivery; returns the queue row id."""
+    with metrics.timer("db_write_seconds", op="enqueue"), unit_of_work():
+        return OutboundMessage.create(chat_id=str(chat_id), kind="message", text=text).id
+
+
+def enqueue_document(chat_id, file_path, caption=None) -> int:
+    """Persist a document for delivery; returns the queue row id."""
+    with metrics.timer("db_write_seconds", op="enqueue"), unit_of_work():
+        return OutboundMessage.create(chat_id=str(chat_id), kind="document", file_path=file_path, text=caption).id
+
+
+def deliver(job: OutboundMessage):
+    """Send one queued job to Bale, raising RetryableError or PermanentError on failure."""
+    try:
+        if job.kind == "document":
+            if not os.path.exists(job.file_path):
+                raise PermanentError(f"File not found: {job.file_path}")
+            response = uploads.send_document(job.chat_id, job.file_path, caption=job.text)
+        else:
+            response = bale_api.send_message(job.chat_id, job.text)
+    except requests.RequestException as e:
+        raise RetryableError(f"{type(e).__name__}: {e}")
+
+    if response.status_code == 429 or response.status_code >= 500:
+        retry_after = None
+        try:
+            retry_after = response.json().get("parameters", {}).get("retry_after")
+        except ValueError:
+            pass
+        raise RetryableError(f"HTTP {response.status_code}", retry_after=retry_after)
+    try:
+        body = response.json()
+    except ValueError:
+        raise RetryableError(f"HTTP {response.status_code}: invalid JSON")
+    if response.status_code >= 400 or not body.get("ok"):
+        raise PermanentError(f"HTTP {response.status_code}: {body.get('description')}")
+    return body
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with full jitter for the given number of failed attempts."""
+    return random.uniform(0, min(DISPATCH_BACKOFF_MAX, DISPATCH_BACKOFF_BASE * 2 ** (attempts - 1)))
+
+
+class Dispatcher:
+    """
+    Delivers the OutboundMessage queue with a pool of sender threads.
+
+    A feeder thread claims due rows in id order and hands them to the workers. Only one
+    message per chat is in flight at a time, so a summary and its PDF arrive in order,
+    and each chat has its own token bucket on top of the bot-wide one. 429 and 5xx
+    answers are retried with exponential backoff (or the server's retry_after); other
+    errors fail the row. Rows left "sending" by a crash are picked up again on start.
+    """
+
+    def __init__(
+        self,
+        workers: int = DISPATCH_WORKERS,
+        rate: float = DISPATCH_RATE,
+        chat_rate: float = DISPATCH_CHAT_RATE,
+        chat_burst: float = DISPATCH_CHAT_BURST,
+        max_attempts: int = DISPATCH_MAX_ATTEMPTS,
+        poll_interval: float = DISPATCH_POLL_INTERVAL,
+    ):
+        self.workers = workers
+        self.bucket = TokenBucket(rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.metrics = DispatcherMetrics()
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=workers * 2)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def enqueue_message(self, chat_id, text) -> int:
+        job_id = enqueue_message(chat_id, text)
+        self._wakeup.set()
+        return job_id
+
+    def enqueue_document(self, chat_id, file_path, caption=None) -> int:
+        job_id = enqueue_document(chat_id, file_path, caption)
+        self._wakeup.set()
+        return job_id
+
+    def start(self):
+        """Recover interrupted sends and start the feeder and worker threads."""
+        with unit_of_work():
+            recovered = (OutboundMessage
+                         .update(status="pending")
+                         .where(OutboundMessage.status == "sending")
+                         .execute())
+        if recovered:
+            logger.info(f"Re-queued {recovered} messages interrupted by a restart")
+        self._stopping.clear()
+        self._threads = [threading.Thread(target=self._feed, name="dispatch-feeder", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._work, name=f"dispatch-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        metrics.gauge("dispatcher", self.metrics.snapshot)
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """Stop claiming new rows and wait for in-flight sends to finish."""
+        self._stopping.set()
+        self._wakeup.set()
+        for _ in range(self.workers):
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                # Idle chats have full buckets; forgetting them changes nothing.
+                self._chat_buckets = {k: b for k, b in self._chat_buckets.items() if not b.full}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _claim(self, job: OutboundMessage) -> bool:
+        # The status guard keeps two dispatcher processes from sending the same row.
+        return bool(OutboundMessage
+                    .update(status="sending")
+                    .where(OutboundMessage.id == job.id, OutboundMessage.status == "pending")
+                    .execute())
+
+    def _feed(self):
+        Older = OutboundMessage.alias()
+        # A chat's row waits while an older one is unsent, even one rescheduled by a retry,
+        # so a summary held back by a 429 is never overtaken by its PDF.
+        blocked = fn.EXISTS(Older
+                            .select(Older.id)
+                            .where(Older.chat_id == OutboundMessage.chat_id,
+                                   Older.id < OutboundMessage.id,
+                                   Older.status.in_(["pending", "sending"])))
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            with unit_of_work():
+                due = list(OutboundMessage
+                           .select()
+                           .where(OutboundMessage.status == "pending",
+                                  OutboundMessage.next_attempt_at <= datetime.now(),
+                                  ~blocked)
+                           .order_by(OutboundMessage.id)
+                           .limit(self.workers * 16))
+                for job in due:
+                    if self._stopping.is_set():
+                        break
+                    with self._lock:
+                        if job.chat_id in self._in_flight:
+                            continue
+                    bucket = self._chat_bucket(job.chat_id)
+                    # Only the feeder takes from chat buckets, so the token is still there after the claim.
+                    if bucket.wait_time() or not self._claim(job):
+                        continue
+                    bucket.try_acquire()
+                    with self._lock:
+                        self._in_flight.add(job.chat_id)
+                    self._queue.put(job)
+            self._wakeup.wait(self.poll_interval)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._send(job)
+            finally:
+                with self._lock:
+                    self._in_flight.discard(job.chat_id)
+                self._wakeup.set()
+
+    def _send(self, job: OutboundMessage):
+        self.bucket.acquire()
+        started = time.perf_counter()
+        update = {"attempts": job.attempts + 1}
+        try:
+            deliver(job)
+            update.update(status="sent", sent_at=datetime.now(), last_error=None)
+            outcome = "sent"
+        except RetryableError as e:
+            update["last_error"] = str(e)
+            if update["attempts"] >= self.max_attempts:
+                update["status"], outcome = "failed", "failed"
+            else:
+                delay = e.retry_after if e.retry_after is not None else backoff_delay(update["attempts"])
+                update.update(status="pending", next_attempt_at=datetime.now() + timedelta(seconds=delay))
+                outcome = "retried"
+        except PermanentError as e:
+            update.update(status="failed", last_error=str(e))
+            outcome = "failed"
+        except Exception as e:
+            update.update(status="failed", last_error=f"{type(e).__name__}: {e}")
+            outcome = "failed"
+        latency = time.perf_counter() - started
+        self.metrics.observe(outcome, latency)
+        if outcome != "sent":
+            logger.warning(f"Send {job.id} to {job.chat_id} {outcome}: {update['last_error']}")
+        with unit_of_work():
+            OutboundMessage.update(**update).where(OutboundMessage.id == job.id).execute()
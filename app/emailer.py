@@ -1,17 +1,31 @@
 import smtplib
+import time
+import queue
+import logging
+import threading
+from dataclasses import dataclass, field
 from email.message import EmailMessage
+from typing import Iterable, List, Optional, Tuple
 from dotenv import load_dotenv
 import os
 
+from app.pdf_store import attachment_name
+from app.utils import TokenBucket
+
 load_dotenv()
 
+logger = logging.getLogger("Emailer")
 
-def send_email(receiver_email, pdf_path):
-    sender_email = os.getenv("EMAIL_ADDRESS")
-    password = os.getenv("EMAIL_PASSWORD")
-    smtp_server = os.getenv("SMTP_SERVER")
-    smtp_port = int(os.getenv("SMTP_PORT"))
+# Bulk delivery settings
+SMTP_CONNECTIONS = int(os.getenv("SMTP_CONNECTIONS", "4"))        # Parallel authenticated sessions
+SMTP_RATE = float(os.getenv("SMTP_RATE", "10"))                    # Messages per second, all sessions together
+SMTP_MAX_ATTEMPTS = int(os.getenv("SMTP_MAX_ATTEMPTS", "3"))       # Tries per recipient
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
 
+
+def build_message(sender_email, receiver_email, pdf_path):
+    """Build the payslip email with `pdf_path` attached."""
     msg = EmailMessage()
     msg["From"] = sender_email
     msg["To"] = receiver_email
@@ -20,10 +34,169 @@ def send_email(receiver_email, pdf_path):
 
     with open(pdf_path, "rb") as file:
         file_data = file.read()
-        file_name = os.path.basename(pdf_path)
+        file_name = attachment_name(pdf_path)
         msg.add_attachment(file_data, maintype="application", subtype="pdf", filename=file_name)
+    return msg
+
+
+def send_email(receiver_email, pdf_path):
+    sender_email = os.getenv("EMAIL_ADDRESS")
+    password = os.getenv("EMAIL_PASSWORD")
+    smtp_server = os.getenv("SMTP_SERVER")
+    smtp_port = int(os.getenv("SMTP_PORT"))
+
+    msg = build_message(sender_email, receiver_email, pdf_path)
 
     with smtplib.SMTP(smtp_server, smtp_port) as smtp:
         smtp.starttls()
         smtp.login(sender_email, password)
         smtp.send_message(msg)
+
+
+@dataclass
+class DeliveryReport:
+    """Outcome of a bulk send."""
+
+    sent: List[str] = field(default_factory=list)
+    failed: List[Tuple[str, str, str]] = field(default_factory=list)  # (recipient, pdf_path, error)
+    attempts: int = 0
+    connections: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def messages_per_second(self) -> float:
+        return len(self.sent) / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class BulkMailer:
+    """
+    Sends many payslip emails over a small pool of long-lived SMTP sessions.
+
+    Each of `connections` threads connects, runs STARTTLS and logs in once, then sends
+    job after job on that session. A dropped session (disconnect, 421) is reopened and
+    the message retried; other 4xx replies are retried after a short pause; 5xx replies
+    and refused recipients fail that recipient only. A token bucket keeps the whole pool
+    under the provider's `rate` limit.
+    """
+
+    def __init__(
+        self,
+        smtp_server: Optional[str] = None,
+        smtp_port: Optional[int] = None,
+        sender_email: Optional[str] = None,
+        password: Optional[str] = None,
+        connections: int = SMTP_CONNECTIONS,
+        rate: float = SMTP_RATE,
+        max_attempts: int = SMTP_MAX_ATTEMPTS,
+        starttls: bool = SMTP_STARTTLS,
+        timeout: float = SMTP_TIMEOUT,
+    ):
+        self.smtp_server = smtp_server or os.getenv("SMTP_SERVER")
+        self.smtp_port = int(smtp_port or os.getenv("SMTP_PORT"))
+        self.sender_email = sender_email or os.getenv("EMAIL_ADDRESS")
+        self.password = password if password is not None else os.getenv("EMAIL_PASSWORD")
+        self.connections = connections
+        self.bucket = TokenBucket(rate)
+        self.max_attempts = max_attempts
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def _connect(self, report: DeliveryReport, lock: threading.Lock) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        if self.starttls:
+            smtp.starttls()
+        if self.password:
+            smtp.login(self.sender_email, self.password)
+        with lock:
+            report.connections += 1
+        return smtp
+
+    def _deliver(self, smtp, receiver_email, pdf_path, report, lock):
+        """Send one job, reconnecting as needed; returns the session to keep using."""
+        try:
+            msg = build_message(self.sender_email, receiver_email, pdf_path)
+        except Exception as e:
+            # A missing or unreadable PDF fails this recipient, not the worker.
+            self._fail(receiver_email, pdf_path, f"{type(e).__name__}: {e}", report, lock)
+            return smtp
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            with lock:
+                report.attempts += 1
+            try:
+                if smtp is None:
+                    smtp = self._connect(report, lock)
+                self.bucket.acquire()
+                smtp.send_message(msg)
+                with lock:
+                    report.sent.append(receiver_email)
+                return smtp
+            except smtplib.SMTPRecipientsRefused as e:
+                error = f"Recipient refused: {e.recipients}"
+                break
+            except smtplib.SMTPResponseException as e:
+                error = f"{e.smtp_code} {e.smtp_error!r}"
+                if e.smtp_code == 421:
+                    smtp = self._close(smtp)
+                elif 400 <= e.smtp_code < 500:
+                    time.sleep(min(2 ** attempt * 0.1, 5))
+                else:
+                    break
+            except (smtplib.SMTPServerDisconnected, OSError) as e:
+                error = f"{type(e).__name__}: {e}"
+                smtp = self._close(smtp)
+        self._fail(receiver_email, pdf_path, error, report, lock)
+        return smtp
+
+    @staticmethod
+    def _fail(receiver_email, pdf_path, error, report, lock):
+        with lock:
+            report.failed.append((receiver_email, pdf_path, error))
+        logger.warning(f"Failed to email {receiver_email}: {error}")
+
+    @staticmethod
+    def _close(smtp) -> None:
+        """Drop a session the server gave up on; returns None for the caller to keep."""
+        if smtp is not None:
+            smtp.close()
+        return None
+
+    def _worker(self, jobs: queue.Queue, report: DeliveryReport, lock: threading.Lock):
+        smtp = None
+        try:
+            while True:
+                job = jobs.get()
+                if job is None:
+                    return
+                smtp = self._deliver(smtp, *job, report, lock)
+        finally:
+            if smtp is not None:
+                try:
+                    smtp.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+
+    def send_all(self, jobs: Iterable[Tuple[str, str]]) -> DeliveryReport:
+        """Email every (recipient, pdf_path) in `jobs`, which is consumed lazily."""
+        report = DeliveryReport()
+        lock = threading.Lock()
+        work: queue.Queue = queue.Queue(maxsize=self.connections * 2)
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._worker, args=(work, report, lock), name=f"smtp-{i}", daemon=True)
+            for i in range(self.connections)
+        ]
+        for thread in threads:
+            thread.start()
+        for job in jobs:
+            work.put(job)
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+        report.elapsed = time.perf_counter() - started
+        logger.info(
+            f"Emailed {len(report.sent)} recipients, {len(report.failed)} failed, "
+            f"over {report.connections} SMTP sessions in {report.elapsed:.1f}s"
+        )
+        return report
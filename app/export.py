@@ -0,0 +1,238 @@
+"""
+Bulk export of the Payslip table and payroll totals for finance.
+
+    python -m app.export rows payslips-1403-11.xlsx --year 1403 --month 11
+    python -m app.export totals totals.csv --year 1403 --company "..."
+
+Rows are read in keyset pages of `batch_size` and written as they arrive, so memory
+stays flat however long the history is. The format follows the output's extension
+(.csv, .jsonl, .xlsx, .parquet) unless --format is given; "-" writes CSV to stdout.
+"""
+import os
+import sys
+import csv
+import json
+import logging
+import argparse
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from peewee import fn
+
+from app.db_export import DB_BATCH_SIZE, Payslip, unit_of_work
+from app.utils import parse_month
+
+logger = logging.getLogger("Export")
+
+# Exported columns; the bot's chat_id and request times stay out of finance dumps.
+EXPORT_FIELDS = [field for field in Payslip._meta.sorted_fields if field.name not in ("chat_id", "last_request_at")]
+EXPORT_COLUMNS = [field.name for field in EXPORT_FIELDS]
+
+FORMATS = ("csv", "jsonl", "xlsx", "parquet")
+
+
+@dataclass
+class PayrollTotals:
+    """Sums over the payslips of one month and company."""
+
+    year: int
+    month: int
+    company_name: Optional[str]
+    payslips: int
+    total_salary: int
+    total_deductions: int
+    net_payment: int
+
+
+def _filters(year=None, month=None, company=None):
+    conditions = []
+    if year is not None:
+        conditions.append(Payslip.year == year)
+    if month is not None:
+        conditions.append(Payslip.month == month)
+    if company is not None:
+        conditions.append(Payslip.company_name == company)
+    return conditions
+
+
+def iter_rows(year=None, month=None, company=None, batch_size=DB_BATCH_SIZE) -> Iterator[Tuple[Any, ...]]:
+    """Yield payslips as tuples in EXPORT_COLUMNS order, by id, one page of `batch_size` per query."""
+    conditions = _filters(year, month, company)
+    last_id = 0
+    while True:
+        # A short query per page keeps no cursor or transaction open while the caller writes.
+        with unit_of_work():
+            page = list(Payslip
+                        .select(*EXPORT_FIELDS)
+                        .where(Payslip.id > last_id, *conditions)
+                        .order_by(Payslip.id)
+                        .limit(batch_size)
+                        .tuples()
+                        .iterator())
+        if not page:
+            return
+        yield from page
+        last_id = page[-1][0]
+
+
+def _plain(value):
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def write_csv(rows, file, columns: Sequence[str] = EXPORT_COLUMNS) -> int:
+    writer = csv.writer(file)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(rows, file, columns: Sequence[str] = EXPORT_COLUMNS) -> int:
+    count = 0
+    for row in rows:
+        file.write(json.dumps(dict(zip(columns, map(_plain, row))), ensure_ascii=False))
+        file.write("\n")
+        count += 1
+    return count
+
+
+def write_xlsx(rows, path: str, columns: Sequence[str] = EXPORT_COLUMNS) -> int:
+    """Write with openpyxl's write-only mode, which streams rows to disk instead of building the sheet."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("payslips")
+    sheet.append(list(columns))
+    count = 0
+    for row in rows:
+        sheet.append([float(value) if isinstance(value, Decimal) else value for value in row])
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def write_parquet(rows, path: str, columns: Sequence[str] = EXPORT_COLUMNS, batch_size=DB_BATCH_SIZE) -> int:
+    """Write `batch_size` rows per row group; needs pyarrow, which is not a hard dependency."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from None
+
+    writer, count, batch = None, 0, []
+
+    def flush():
+        nonlocal writer
+        table = pa.Table.from_pylist([dict(zip(columns, map(_plain, row))) for row in batch])
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table.cast(writer.schema))
+        batch.clear()
+
+    try:
+        for row in rows:
+            batch.append(row)
+            count += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch or writer is None:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def write_rows(rows, output: str, fmt: Optional[str] = None, columns: Sequence[str] = EXPORT_COLUMNS) -> int:
+    """Write `rows` to `output` ("-" for stdout) in `fmt`, or the format named by the extension."""
+    fmt = fmt or ("csv" if output == "-" else os.path.splitext(output)[1].lstrip(".").lower())
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(FORMATS)}")
+    if output == "-":
+        if fmt not in ("csv", "jsonl"):
+            raise ValueError(f"{fmt} cannot be written to stdout")
+        return (write_csv if fmt == "csv" else write_jsonl)(rows, sys.stdout, columns)
+
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Written beside the target and renamed, so a failed export never leaves half a file.
+    tmp_path = f"{output}.{os.getpid()}.tmp"
+    try:
+        if fmt in ("csv", "jsonl"):
+            with open(tmp_path, "w", encoding="utf-8", newline="") as file:
+                count = (write_csv if fmt == "csv" else write_jsonl)(rows, file, columns)
+        elif fmt == "xlsx":
+            count = write_xlsx(rows, tmp_path, columns)
+        else:
+            count = write_parquet(rows, tmp_path, columns)
+        os.replace(tmp_path, output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+def export_payslips(output: str, year=None, month=None, company=None, fmt=None, batch_size=DB_BATCH_SIZE) -> int:
+    """Export the matching payslips to `output`; returns the number of rows written."""
+    count = write_rows(iter_rows(year, month, company, batch_size), output, fmt)
+    logger.info(f"Exported {count} payslips to {output}")
+    return count
+
+
+def payroll_totals(year=None, month=None, company=None) -> List[PayrollTotals]:
+    """Per-month, per-company sums, computed by the database in one GROUP BY."""
+    query = (Payslip
+             .select(Payslip.year, Payslip.month, Payslip.company_name,
+                     fn.COUNT(Payslip.id),
+                     fn.COALESCE(fn.SUM(Payslip.total_salary), 0),
+                     fn.COALESCE(fn.SUM(Payslip.total_deductions), 0),
+                     fn.COALESCE(fn.SUM(Payslip.net_payment), 0))
+             .where(Payslip.year.is_null(False), Payslip.month.is_null(False), *_filters(year, month, company))
+             .group_by(Payslip.year, Payslip.month, Payslip.company_name)
+             .order_by(Payslip.year, Payslip.month, Payslip.company_name)
+             .tuples())
+    with unit_of_work():
+        # Postgres returns SUM over bigint as numeric.
+        return [
+            PayrollTotals(year, month, company_name, count, int(salary), int(deductions), int(net))
+            for year, month, company_name, count, salary, deductions, net in query
+        ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export payslips or payroll totals for finance.")
+    parser.add_argument("what", choices=["rows", "totals"], help="Payslip rows, or per-month and per-company totals")
+    parser.add_argument("output", help="Output file, or - for stdout")
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to the output's extension")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--month", help="Number or Persian month name")
+    parser.add_argument("--company", help="Exact company name")
+    parser.add_argument("--batch-size", type=int, default=DB_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    month = None
+    if args.month is not None:
+        month = parse_month(args.month)
+        if month is None:
+            parser.error(f"not a month: {args.month}")
+
+    try:
+        if args.what == "rows":
+            export_payslips(args.output, args.year, month, args.company, args.format, args.batch_size)
+        else:
+            totals = payroll_totals(args.year, month, args.company)
+            columns = list(PayrollTotals.__dataclass_fields__)
+            write_rows((tuple(asdict(total).values()) for total in totals), args.output, args.format, columns)
+    except (ValueError, RuntimeError) as e:
+        logger.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -1,12 +1,16 @@
 import fitz
 import re
+import sqlite3
 import logging
 import unicodedata
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
 from dataclasses import dataclass
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+from app import metrics
+from app.text_cache import TextCache, default_text_cache
+from app.utils import file_sha256
+
+# Logging is configured by whichever entry point runs the extractor
 logger = logging.getLogger("PayslipExtractor")
 
 
@@ -38,43 +42,198 @@ class PayslipData:
         return {k: v for k, v in self.__dict__.items() if v is not None}
 
 
+# Field -> (keywords that must appear on the line, pattern whose group 1 is the value).
+# Keywords are the presentation-form glyphs PyMuPDF emits for these payslips.
+EXTRACTION_RULES = {
+    "national_code": (["ﮐﺪ ﻣﻠﯽ"], r"(\d{10})"),
+    "personnel_number": (["ﭘﺮﺳﻨﻠﯽ"], r"(\d+)"),
+    "insurance_number": (["ﺑﯿﻤﻪ"], r"(\d+)"),
+    "company_name": (["ﺷﺮﮐﺖ"], r"ﺷﺮﮐﺖ\s+([\u0600-\u06FF\s]+)"),
+    "year": ([], r"^(\d{4})$"),  # First line if 4 digits
+    "month": (["ﺑﻬﻤﻦ"], r"(ﺑﻬﻤﻦ)"),
+    "standard_working_days": (["ﮐﺎﺭﮐﺮﺩ ﻋﺎﺩﯼ"], r"(\d+[\/\.]\d+|\d+)"),
+    "base_salary": (["ﺣﻘﻮﻕ ﭘﺎﯾﻪ"], r"([\d,]+)"),
+    "housing_allowance": (["ﺣﻖ ﻣﺴﮑﻦ"], r"([\d,]+)"),
+    "food_allowance": (["ﺧﻮﺍﺭﻭﺑﺎﺭ"], r"([\d,]+)"),
+    "total_salary": (["ﺣﻘﻮﻕ ﻭ ﻣﺰﺍﯾﺎ"], r"([\d,]+)"),
+    "employee_insurance": (["ﺑﯿﻤﻪ ﺳﻬﻢ ﮐﺎﺭﻣﻨﺪ"], r"([\d,]+)"),
+    "food_expense": (["ﻫﺰﯾﻨﻪ ﻏﺬﺍ"], r"([\d,]+)"),
+    "total_deductions": (["ﺟﻤﻊ ﮐﺴﻮﺭ"], r"([\d,]+)"),
+    "net_payment": (["ﺧﺎﻟﺺ ﭘﺮﺩﺍﺧﺘﯽ"], r"([\d,]+)"),
+    "net_payment_text": (["ﺧﺎﻟﺺ ﭘﺮﺩﺍﺧﺘﯽ"], r"[\d,]+([^\n\r]+)"),
+}
+
+# Fields whose thousands separators are stripped.
+NUMERIC_FIELDS = {
+    "base_salary",
+    "housing_allowance",
+    "food_allowance",
+    "total_salary",
+    "employee_insurance",
+    "food_expense",
+    "total_deductions",
+    "net_payment",
+}
+
+YEAR_LINE = re.compile(r"^\d{4}$")
+
+
+def is_payslip_start(text: str) -> bool:
+    """True if a page's text opens a new payslip, i.e. its first line is a 4-digit year."""
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            return bool(YEAR_LINE.match(unicodedata.normalize("NFC", line)))
+    return False
+
+
+def iter_page_groups(doc, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, int, str]]:
+    """
+    Yield (first_page, last_page, text) for every payslip that starts in pages [start, stop).
+
+    Pages are loaded one at a time and only the current payslip's text is held. A payslip
+    runs from a page whose first line is a year up to the page before the next such page,
+    so a group starting near `stop` is read past it to its end, and leading pages that
+    continue a payslip from before `start` are skipped. Page 0 always starts a payslip.
+    """
+    stop = doc.page_count if stop is None else min(stop, doc.page_count)
+    first, texts = None, []
+    for number in range(start, doc.page_count):
+        if number >= stop and first is None:
+            return
+        text = doc.load_page(number).get_text()
+        if number == 0 or is_payslip_start(text):
+            if first is not None:
+                yield first, number - 1, "".join(texts)
+            if number >= stop:
+                return
+            first, texts = number, [text]
+        elif first is not None:
+            texts.append(text)
+    if first is not None:
+        yield first, doc.page_count - 1, "".join(texts)
+
+
+class RuleEngine:
+    """
+    Extraction rules compiled once into a single keyword scanner.
+
+    Each line is scanned once for every keyword, and only the rules whose keywords
+    occur on it run their pattern. A field takes the first line, in document order,
+    that contains one of its keywords and matches its pattern.
+    """
+
+    def __init__(self, rules: Dict[str, Tuple[List[str], str]] = EXTRACTION_RULES):
+        self.patterns = {field: re.compile(pattern) for field, (_, pattern) in rules.items()}
+
+        keyword_fields: Dict[str, List[str]] = {}
+        for field, (keywords, _) in rules.items():
+            for keyword in keywords:
+                keyword_fields.setdefault(unicodedata.normalize("NFC", keyword), []).append(field)
+
+        # The scanner reports the longest keyword starting at each position, so a keyword
+        # also stands for every shorter keyword it contains (e.g. "ﺑﯿﻤﻪ ﺳﻬﻢ ﮐﺎﺭﻣﻨﺪ" implies "ﺑﯿﻤﻪ").
+        self.keyword_fields = {
+            keyword: {field for other, fields in keyword_fields.items() if other in keyword for field in fields}
+            for keyword in keyword_fields
+        }
+        self.keyword_count = len({field for fields in keyword_fields.values() for field in fields})
+        alternation = "|".join(re.escape(k) for k in sorted(keyword_fields, key=len, reverse=True))
+        self.scanner = re.compile(f"(?=({alternation}))") if alternation else None
+
+    def fields_on_line(self, line: str) -> set:
+        """Return the fields whose keywords occur on `line`."""
+        fields = set()
+        for keyword in set(self.scanner.findall(line)):
+            fields |= self.keyword_fields[keyword]
+        return fields
+
+    def extract(self, lines: List[str]) -> Dict[str, Optional[str]]:
+        """Return the raw value for every keyword rule that matched somewhere in `lines`."""
+        values: Dict[str, Optional[str]] = {}
+        if self.scanner is None:
+            return values
+        for line in lines:
+            for field in self.fields_on_line(line) - values.keys():
+                match = self.patterns[field].search(line)
+                if match:
+                    try:
+                        values[field] = match.group(1).strip()
+                    except IndexError:
+                        logger.warning(f"No group found for pattern {self.patterns[field].pattern} in line: {line}")
+                        values[field] = None
+            if len(values) == self.keyword_count:
+                break
+        return values
+
+
 class PayslipExtractor:
-    """Persian payslip data extractor with detailed debugging."""
+    """Persian payslip data extractor; `debug` prints the text and every extracted field."""
 
-    def __init__(self, debug=True):
+    def __init__(
+        self,
+        debug=False,
+        rules: Dict[str, Tuple[List[str], str]] = EXTRACTION_RULES,
+        text_cache: Union[TextCache, bool, None] = None,
+    ):
         self.logger = logger
         self.debug = debug
+        self.rules = rules
+        self.engine = RuleEngine(rules)
+        # None uses the shared cache (when enabled); False reads every PDF with PyMuPDF.
+        self.text_cache = default_text_cache() if text_cache is None else text_cache or None
+
+    def page_texts(self, pdf_path: str) -> List[str]:
+        """Text of each page of a PDF, from the text cache when this content was read before."""
+        cache, sha256 = self.text_cache, None
+        if cache is not None:
+            try:
+                sha256 = file_sha256(pdf_path)
+                pages = cache.get(sha256)
+                metrics.inc("text_cache_lookups_total", result="miss" if pages is None else "hit")
+                if pages is not None:
+                    return pages
+            except sqlite3.Error as e:
+                self.logger.warning(f"Text cache unavailable: {e}")
+                cache = None
+        with metrics.timer("pdf_open_seconds"):
+            doc = fitz.open(pdf_path)
+        with doc, metrics.timer("pdf_get_text_seconds"):
+            pages = [page.get_text() for page in doc]
+        if cache is not None:
+            try:
+                cache.put(sha256, pages, pdf_path)
+            except sqlite3.Error as e:
+                self.logger.warning(f"Could not cache text of {pdf_path}: {e}")
+        return pages
 
     def extract_from_file(self, pdf_path: str) -> PayslipData:
         """Extract payslip data from a PDF file."""
         try:
-            with fitz.open(pdf_path) as doc:
-                text = ""
-                for page in doc:
-                    text += page.get_text()
-                self.logger.info("Successfully extracted text from PDF")
-                if self.debug:
-                    print("\n==== FULL EXTRACTED TEXT ====")
-                    print(text)
-                    print("============================\n")
-                return self._process_text(text)
+            text = "".join(self.page_texts(pdf_path))
+            self.logger.debug(f"Extracted text from {pdf_path}")
+            if self.debug:
+                print("\n==== FULL EXTRACTED TEXT ====")
+                print(text)
+                print("============================\n")
+            return self._process_text(text)
         except Exception as e:
             self.logger.error(f"Error extracting data: {str(e)}")
             raise
 
-    def _extract_from_line(self, lines, keywords, pattern):
-        """Extract value from a line containing any of the keywords."""
-        for line in lines:
-            if any(keyword in line for keyword in keywords):
-                match = re.search(pattern, line)
-                if match:
-                    try:
-                        return match.group(1).strip()
-                    except IndexError:
-                        self.logger.warning(f"No group found for pattern {pattern} in line: {line}")
-                        return None
-        return None
+    def extract_from_text(self, text: str) -> PayslipData:
+        """Extract payslip data from text already pulled out of a PDF."""
+        return self._process_text(text)
 
+    def iter_payslips(
+        self, pdf_path: str, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[Tuple[int, int, PayslipData]]:
+        """Yield (first_page, last_page, PayslipData) per employee in a combined PDF; see iter_page_groups."""
+        with fitz.open(pdf_path) as doc:
+            for first, last, text in iter_page_groups(doc, start, stop):
+                yield first, last, self.extract_from_text(text)
+
+    @metrics.timed("extract_fields_seconds")
     def _process_text(self, text: str) -> PayslipData:
         """Process extracted text and populate PayslipData."""
         payslip = PayslipData()
@@ -100,43 +259,15 @@ class PayslipExtractor:
             print(f"Extracted name: {payslip.name}")
             print(f"Extracted family name: {payslip.family_name}")
 
-        # Define extraction rules for other fields
-        extraction_rules = {
-            "national_code": (["ﮐﺪ ﻣﻠﯽ"], r"(\d{10})"),
-            "personnel_number": (["ﭘﺮﺳﻨﻠﯽ"], r"(\d+)"),
-            "insurance_number": (["ﺑﯿﻤﻪ"], r"(\d+)"),
-            "company_name": (["ﺷﺮﮐﺖ"], r"ﺷﺮﮐﺖ\s+([\u0600-\u06FF\s]+)"),
-            "year": ([], r"^(\d{4})$"),  # First line if 4 digits
-            "month": (["ﺑﻬﻤﻦ"], r"(ﺑﻬﻤﻦ)"),
-            "standard_working_days": (["ﮐﺎﺭﮐﺮﺩ ﻋﺎﺩﯼ"], r"(\d+[\/\.]\d+|\d+)"),
-            "base_salary": (["ﺣﻘﻮﻕ ﭘﺎﯾﻪ"], r"([\d,]+)"),
-            "housing_allowance": (["ﺣﻖ ﻣﺴﮑﻦ"], r"([\d,]+)"),
-            "food_allowance": (["ﺧﻮﺍﺭﻭﺑﺎﺭ"], r"([\d,]+)"),
-            "total_salary": (["ﺣﻘﻮﻕ ﻭ ﻣﺰﺍﯾﺎ"], r"([\d,]+)"),
-            "employee_insurance": (["ﺑﯿﻤﻪ ﺳﻬﻢ ﮐﺎﺭﻣﻨﺪ"], r"([\d,]+)"),
-            "food_expense": (["ﻫﺰﯾﻨﻪ ﻏﺬﺍ"], r"([\d,]+)"),
-            "total_deductions": (["ﺟﻤﻊ ﮐﺴﻮﺭ"], r"([\d,]+)"),
-            "net_payment": (["ﺧﺎﻟﺺ ﭘﺮﺩﺍﺧﺘﯽ"], r"([\d,]+)"),
-            "net_payment_text": (["ﺧﺎﻟﺺ ﭘﺮﺩﺍﺧﺘﯽ"], r"[\d,]+([^\n\r]+)"),
-        }
-
-        # Apply extraction rules
-        for field, (keywords, pattern) in extraction_rules.items():
-            if field == "year" and re.match(r"^\d{4}$", clean_lines[0]):
+        # Apply extraction rules in a single pass over the lines
+        values = self.engine.extract(clean_lines)
+        for field in self.rules:
+            if field == "year" and clean_lines and YEAR_LINE.match(clean_lines[0]):
                 payslip.year = clean_lines[0]
             else:
-                value = self._extract_from_line(clean_lines, keywords, pattern)
+                value = values.get(field)
                 if value:
-                    if field in [
-                        "base_salary",
-                        "housing_allowance",
-                        "food_allowance",
-                        "total_salary",
-                        "employee_insurance",
-                        "food_expense",
-                        "total_deductions",
-                        "net_payment",
-                    ]:
+                    if field in NUMERIC_FIELDS:
                         value = value.replace(",", "")
                     setattr(payslip, field, value)
             if self.debug and getattr(payslip, field):
@@ -0,0 +1,174 @@
+"""
+Bot conversation handlers shared by every runtime: long polling and the async
+poller in main.py, and the webhook workers in app/bot.py.
+"""
+import os
+import logging
+from datetime import datetime, timedelta
+
+from peewee import fn
+
+from app import bale_api, metrics, uploads
+from app.broadcast import DOCUMENT_CAPTION, format_summary
+from app.chat_cache import CachedChat, ChatCache
+from app.db_export import unit_of_work, Payslip
+from app.state_store import make_state_store
+from app.validation_index import ValidationIndex, normalize_national_code, normalize_personnel_number
+
+logger = logging.getLogger("PayrollDebug")
+
+# Employee list for validation; compiled from list.xlsx on first use and reloaded when it changes
+validation_index = ValidationIndex("list.xlsx")
+
+# Conversation state per chat; STATE_BACKEND=db shares it between bot processes
+user_states = make_state_store()
+
+# Registered chats' national code, latest payslip and cooldown; ingestion invalidates it
+chat_cache = ChatCache()
+
+# Time between two /getpayslip requests that are answered with a payslip
+COOLDOWN = timedelta(days=28)
+
+# Outbound dispatcher; set by the runtime that starts one, sends go straight to Bale while it is None
+dispatcher = None
+
+# Looked up at every scrape, so a store or cache swapped in later is still reported
+metrics.gauge("chat_cache", lambda: chat_cache.snapshot())
+metrics.gauge("state_store", lambda: user_states.metrics.snapshot())
+
+# --- Bale Bot Helper Functions ---
+def send_message(chat_id, text):
+    """Send a text message to the specified chat ID."""
+    logger.debug(f"Sending message to {chat_id}: {text}")
+    if dispatcher:
+        dispatcher.enqueue_message(chat_id, text)
+    else:
+        bale_api.send_message(chat_id, text)
+
+def send_document(chat_id, file_path, caption=None):
+    """Send a document to the specified chat ID."""
+    if os.path.exists(file_path):
+        logger.debug(f"Sending document {file_path} to {chat_id}")
+        if dispatcher:
+            dispatcher.enqueue_document(chat_id, file_path, caption=caption)
+        else:
+            uploads.send_document(chat_id, file_path, caption=caption)
+    else:
+        logger.debug(f"File not found at {file_path}")
+        send_message(chat_id, "فایل حقوقی شما یافت نشد.")
+
+def send_bot_update(chat_id, payslip):
+    """Send a payroll summary and PDF to the user."""
+    send_message(chat_id, format_summary(payslip))
+    send_document(chat_id, payslip.pdf_path, caption=DOCUMENT_CAPTION)
+
+# --- Update Handlers ---
+def handle_update(update):
+    """Process one update inside its own unit of work; used by every bot runtime."""
+    with metrics.timer("bot_update_seconds"), unit_of_work():
+        process_update(update)
+
+def process_update(update):
+    """Process incoming bot updates."""
+    if "message" in update:
+        message = update["message"]
+        chat_id = message["chat"]["id"]
+        text = message.get("text", "").strip()
+        logger.debug(f"Received update from chat {chat_id}: {text}")
+
+        if text == "/start":
+            user_states.set(chat_id, {"state": "waiting_for_national_code"})
+            send_message(chat_id, "سلام! لطفاً کد ملی خود را وارد کنید:")
+
+        elif text == "/getpayslip":
+            handle_getpayslip(chat_id)
+
+        else:
+            state_info = user_states.get(chat_id) or {}
+            state = state_info.get("state")
+            if state == "waiting_for_national_code":
+                handle_national_code(chat_id, text)
+            elif state == "waiting_for_personnel_number":
+                handle_personnel_number(chat_id, text, state_info["national_code"])
+            else:
+                send_message(chat_id, "لطفاً از دستورات موجود استفاده کنید: /start یا /getpayslip")
+
+def handle_national_code(chat_id, text):
+    """Handle national code input during registration."""
+    national_code = normalize_national_code(text)
+    if national_code and national_code in validation_index:
+        user_states.set(chat_id, {"state": "waiting_for_personnel_number", "national_code": national_code})
+        send_message(chat_id, "لطفاً شماره پرسنلی خود را وارد کنید:")
+    else:
+        send_message(chat_id, "کد ملی شما در سیستم یافت نشد. لطفاً دوباره تلاش کنید.")
+        user_states.delete(chat_id)
+
+def handle_personnel_number(chat_id, text, national_code):
+    """Handle personnel number input and complete registration."""
+    expected = validation_index.get(national_code)
+    if expected and normalize_personnel_number(text) == expected:
+        # Rows already linked to this chat are left alone, so re-registering writes nothing.
+        (Payslip
+         .update(chat_id=str(chat_id))
+         .where(Payslip.national_code == national_code,
+                Payslip.chat_id.is_null() | (Payslip.chat_id != str(chat_id)))
+         .execute())
+        chat_cache.invalidate_chat(chat_id)
+        chat_cache.invalidate_national_codes([national_code])
+        send_message(chat_id, "ثبت نام شما با موفقیت انجام شد. برای دریافت فیش حقوقی از /getpayslip استفاده کنید.")
+        user_states.delete(chat_id)
+    else:
+        send_message(chat_id, "شماره پرسنلی اشتباه است. لطفاً دوباره تلاش کنید.")
+        user_states.delete(chat_id)
+
+def load_chat(chat_id):
+    """Read a registered chat's CachedChat from the database; None if the chat is not registered."""
+    row = (Payslip
+           .select(Payslip.national_code, fn.MAX(Payslip.last_request_at).alias("last_request_at"))
+           .where(Payslip.chat_id == str(chat_id))
+           .group_by(Payslip.national_code)
+           .first())
+    if row is None:
+        return None
+    latest = (Payslip
+              .select(Payslip.id)
+              .where(Payslip.national_code == row.national_code)
+              .order_by(Payslip.id.desc())
+              .first())
+    # Some backends hand aggregates back as text.
+    last_request_at = Payslip.last_request_at.python_value(row.last_request_at)
+    return CachedChat(row.national_code, latest.id if latest else None,
+                      last_request_at + COOLDOWN if last_request_at else None)
+
+def handle_getpayslip(chat_id):
+    """Handle the /getpayslip command with a 28-day cooldown."""
+    chat = chat_cache.get(chat_id)
+    if chat is None:
+        chat = load_chat(chat_id)
+        if chat is None:
+            send_message(chat_id, "شما ثبت نام نکرده‌اید. لطفاً با /start ثبت نام کنید.")
+            return
+        chat_cache.put(chat_id, chat)
+
+    now = datetime.now()
+    if chat.cooldown_until and now < chat.cooldown_until:
+        send_message(chat_id, "شما اخیراً درخواست داده‌اید. لطفاً 28 روز صبر کنید.")
+        return
+
+    latest_payslip = Payslip.get_or_none(Payslip.id == chat.payslip_id) if chat.payslip_id else None
+    if latest_payslip:
+        # The cooldown is claimed before sending; another process that got there first wins.
+        claimed = (Payslip
+                   .update(last_request_at=now)
+                   .where(Payslip.chat_id == str(chat_id),
+                          Payslip.last_request_at.is_null() | (Payslip.last_request_at <= now - COOLDOWN))
+                   .execute())
+        if not claimed:
+            chat_cache.invalidate_chat(chat_id)
+            send_message(chat_id, "شما اخیراً درخواست داده‌اید. لطفاً 28 روز صبر کنید.")
+            return
+        chat_cache.put(chat_id, chat._replace(cooldown_until=now + COOLDOWN))
+        send_bot_update(chat_id, latest_payslip)
+    else:
+        chat_cache.invalidate_chat(chat_id)
+        send_message(chat_id, "هیچ فیش حقوقی برای شما یافت نشد.")
@@ -0,0 +1,197 @@
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app import metrics
+
+logger = logging.getLogger("Ingest")
+
+# Number of extraction processes; 1 keeps everything in the calling process.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+# Seconds between directory polls in watch mode; 0 disables watching.
+INGEST_POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "5"))
+
+# Long-lived extractor owned by each worker process (set by _init_worker).
+_extractor = None
+# True in pool processes, whose metrics ride back to the parent on each IngestResult.
+_ship_metrics = False
+
+
+@dataclass
+class IngestResult:
+    """Outcome of extracting a single PDF."""
+
+    pdf_path: str
+    data: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    metrics: Optional[dict] = None
+
+
+@dataclass
+class IngestSummary:
+    """Aggregated outcome of an ingestion run."""
+
+    files: int = 0
+    succeeded: int = 0
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def failed(self) -> int:
+        return len(self.errors)
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.elapsed if self.elapsed > 0 else 0.0
+
+    def log(self):
+        """Log the per-file errors in input order followed by the throughput line."""
+        for pdf_path, error in self.errors:
+            logger.error(f"Error processing {pdf_path}: {error}")
+        logger.info(
+            f"Ingested {self.succeeded}/{self.files} files in {self.elapsed:.2f}s "
+            f"({self.files_per_second:.1f} files/s, {self.failed} failed)"
+        )
+
+
+def _init_worker():
+    """Create the extractor once per worker process."""
+    # Imported here so watching a directory doesn't load PyMuPDF until there is work.
+    from app.extractor import PayslipExtractor
+
+    global _extractor
+    _extractor = PayslipExtractor()
+
+
+def _init_pool_worker():
+    global _ship_metrics
+    _ship_metrics = True
+    # A forked worker starts with a copy of the parent's numbers; drop it so nothing counts twice.
+    metrics.REGISTRY.take()
+    _init_worker()
+
+
+def _extract_worker(pdf_path: str) -> IngestResult:
+    """Extract one PDF with the worker's extractor; errors are returned, not raised."""
+    if _extractor is None:
+        _init_worker()
+    try:
+        with metrics.timer("ingest_extract_seconds"):
+            result = IngestResult(pdf_path, data=_extractor.extract_from_file(pdf_path).to_dict())
+    except Exception as e:
+        result = IngestResult(pdf_path, error=f"{type(e).__name__}: {e}")
+    if _ship_metrics:
+        result.metrics = metrics.REGISTRY.take()
+    return result
+
+
+def list_pdfs(input_dir: str) -> List[str]:
+    """Return the PDF files in `input_dir`, sorted so runs are deterministic."""
+    return [
+        os.path.join(input_dir, filename)
+        for filename in sorted(os.listdir(input_dir))
+        if filename.lower().endswith(".pdf")
+    ]
+
+
+def watch_pdfs(input_dir: str, interval: float = INGEST_POLL_INTERVAL) -> Iterator[List[str]]:
+    """
+    Poll `input_dir` forever and yield sorted batches of PDFs to ingest. The first batch
+    is everything already in the directory; later batches only hold files that appeared
+    or changed since.
+
+    Every poll compares each PDF's (size, mtime) with the last scan; the directory's own
+    mtime is no shortcut, since rewriting a file in place does not change it. New and
+    changed files are yielded once their size and mtime are stable across two polls,
+    which keeps half-copied uploads out of the extractor.
+    """
+    def scan():
+        with os.scandir(input_dir) as entries:
+            return {
+                entry.path: (entry.stat().st_size, entry.stat().st_mtime_ns)
+                for entry in entries
+                if entry.is_file() and entry.name.lower().endswith(".pdf")
+            }
+
+    seen = scan()
+    yield sorted(seen)
+
+    unsettled: Dict[str, Tuple[int, int]] = {}
+    while True:
+        time.sleep(interval)
+        current = scan()
+        unsettled = {path: sig for path, sig in unsettled.items() if path in current}
+        ready = []
+        for pdf_path, signature in current.items():
+            if seen.get(pdf_path) == signature:
+                continue
+            if unsettled.get(pdf_path) == signature:
+                ready.append(pdf_path)
+                seen[pdf_path] = signature
+                del unsettled[pdf_path]
+            else:
+                unsettled[pdf_path] = signature
+        if ready:
+            yield sorted(ready)
+
+
+def extract_pdfs(pdf_paths: List[str], workers: int = INGEST_WORKERS) -> Iterator[IngestResult]:
+    """Yield an IngestResult per path, in input order, using `workers` processes."""
+    workers = max(1, min(workers, len(pdf_paths)))
+    if workers == 1:
+        for pdf_path in pdf_paths:
+            yield _extract_worker(pdf_path)
+        return
+
+    chunksize = max(1, len(pdf_paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pool_worker) as pool:
+        for result in pool.map(_extract_worker, pdf_paths, chunksize=chunksize):
+            if result.metrics is not None:
+                metrics.REGISTRY.merge(result.metrics)
+                result.metrics = None
+            yield result
+
+
+def ingest_pdfs(
+    pdf_paths: List[str],
+    store: Callable[[List[Tuple[str, Dict[str, Any]]]], None],
+    workers: int = INGEST_WORKERS,
+    batch_size: int = 1,
+) -> IngestSummary:
+    """
+    Extract `pdf_paths` in parallel and hand the results to `store` in the calling process,
+    `batch_size` files at a time as a list of (pdf_path, payslip_dict). `store` is where DB
+    writes happen, so workers never touch the DB; if it raises, every file in the batch fails.
+    """
+    summary = IngestSummary(files=len(pdf_paths))
+    started = time.perf_counter()
+    batch: List[IngestResult] = []
+
+    def flush():
+        try:
+            with metrics.timer("ingest_store_seconds"):
+                store([(result.pdf_path, result.data) for result in batch])
+            summary.succeeded += len(batch)
+        except Exception as e:
+            summary.errors.extend((result.pdf_path, f"{type(e).__name__}: {e}") for result in batch)
+        batch.clear()
+
+    for result in extract_pdfs(pdf_paths, workers=workers):
+        if result.error is not None:
+            summary.errors.append((result.pdf_path, result.error))
+            continue
+        batch.append(result)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    # Extraction and store failures interleave; report them in input order.
+    order = {pdf_path: i for i, pdf_path in enumerate(pdf_paths)}
+    summary.errors.sort(key=lambda error: order[error[0]])
+    summary.elapsed = time.perf_counter() - started
+    summary.log()
+    return summary
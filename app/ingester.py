@@ -0,0 +1,160 @@
+"""
+Ingestion role: extract new payslip PDFs (and split combined exports), store them,
+and broadcast the months they touched.
+
+    python -m app ingest [--once] [--input-dir input_files]
+"""
+import os
+import sys
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import handlers, metrics
+from app.broadcast import broadcast_month
+from app.db_export import DB_BATCH_SIZE, init_db, save_many, to_db_row, unit_of_work
+from app.ingest import INGEST_POLL_INTERVAL, INGEST_WORKERS, ingest_pdfs, list_pdfs, watch_pdfs
+from app.manifest import IngestManifest
+from app.pdf_store import PDF_STORE_ENABLED, default_pdf_store
+
+logger = logging.getLogger("PayrollDebug")
+
+# Combined multi-employee exports dropped here are split into one PDF per employee
+COMBINED_INPUT_DIR = os.getenv("COMBINED_INPUT_DIR", "input_files/combined")
+# Broadcast newly ingested months to registered users in the background
+BROADCAST_AFTER_INGEST = os.getenv("BROADCAST_AFTER_INGEST", "1") == "1"
+
+# Runs monthly broadcasts one after another, off the ingestion thread
+broadcaster = ThreadPoolExecutor(max_workers=1, thread_name_prefix="broadcaster")
+
+def store_payslips(items, sha256_of=None):
+    """
+    Upsert a batch of (pdf_path, payslip_dict) into the database. With PDF_STORE_ENABLED
+    the PDFs are copied into the content-addressed store and the rows point there;
+    `sha256_of(pdf_path)`, e.g. IngestManifest.sha256, saves hashing each file again.
+    Returns the (year, month) periods the batch touched; delivery is left to the broadcast.
+    """
+    rows = []
+    for pdf_path, payslip_dict in items:
+        if PDF_STORE_ENABLED:
+            payslip_dict["pdf_path"] = default_pdf_store().put(pdf_path, sha256_of(pdf_path) if sha256_of else None)
+        else:
+            payslip_dict["pdf_path"] = os.path.abspath(pdf_path)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Extracted data: {payslip_dict}")
+        rows.append(payslip_dict)
+    with unit_of_work():
+        save_many(rows)
+    # Registered chats of these employees must see the new payslip on their next /getpayslip.
+    handlers.chat_cache.invalidate_national_codes(
+        row["national_code"] for row in rows if row.get("national_code"))
+    periods = set()
+    for row in rows:
+        typed = to_db_row({"year": row.get("year"), "month": row.get("month")})
+        if typed["year"] is not None and typed["month"] is not None:
+            periods.add((typed["year"], typed["month"]))
+    return periods
+
+def start_broadcasts(periods):
+    """Queue a broadcast for each (year, month); reruns only reach users not yet served."""
+    if not BROADCAST_AFTER_INGEST:
+        return
+    for year, month in sorted(periods):
+        logger.debug(f"Scheduling broadcast for {year}/{month:02d}")
+        broadcaster.submit(broadcast_month, year, month)
+
+def process_pdfs(pdf_paths, manifest, workers=INGEST_WORKERS, batch_size=DB_BATCH_SIZE):
+    """
+    Ingest the PDFs in `pdf_paths` that the manifest has not seen before.
+    Extraction runs on `workers` processes; DB writes stay in this process and happen
+    `batch_size` payslips at a time. Once the batch is stored, the months it touched are
+    broadcast in the background, so ingestion never waits on delivery.
+    """
+    pending = manifest.pending(pdf_paths)
+    logger.debug(f"{len(pending)} of {len(pdf_paths)} PDF files are new; using {workers} worker(s).")
+    periods = set()
+
+    def store(items):
+        periods.update(store_payslips(items, sha256_of=manifest.sha256))
+        for pdf_path, _ in items:
+            manifest.record(pdf_path)
+
+    summary = ingest_pdfs(pending, store, workers=workers, batch_size=batch_size)
+    start_broadcasts(periods)
+    return summary
+
+def process_combined_pdfs(pdf_paths, manifest, workers=INGEST_WORKERS, batch_size=DB_BATCH_SIZE):
+    """
+    Split each new combined export into per-employee PDFs and store their payslips,
+    `batch_size` at a time; the stored pdf_path is the employee's own PDF.
+    """
+    from app.splitter import split_pdf
+
+    periods = set()
+    for pdf_path in manifest.pending(pdf_paths):
+        logger.debug(f"Splitting combined file: {pdf_path}")
+        batch = []
+        try:
+            for payslip in split_pdf(pdf_path, workers=workers):
+                batch.append((payslip.pdf_path, payslip.data))
+                if len(batch) >= batch_size:
+                    periods.update(store_payslips(batch))
+                    batch = []
+            if batch:
+                periods.update(store_payslips(batch))
+        except Exception as e:
+            logger.error(f"Error processing {pdf_path}: {str(e)}")
+            continue
+        manifest.record(pdf_path)
+    start_broadcasts(periods)
+
+def process_all_pdfs(input_dir="input_files", workers=INGEST_WORKERS, manifest=None, combined_dir=COMBINED_INPUT_DIR):
+    """Scan the input directories and process all PDF files not ingested yet."""
+    logger.debug(f"Scanning directory {input_dir} for PDF files.")
+    if manifest is None:
+        manifest = IngestManifest()
+    if combined_dir and os.path.isdir(combined_dir):
+        process_combined_pdfs(list_pdfs(combined_dir), manifest, workers=workers)
+    return process_pdfs(list_pdfs(input_dir), manifest, workers=workers)
+
+def watch_combined_dir(combined_dir=COMBINED_INPUT_DIR, interval=INGEST_POLL_INTERVAL, workers=INGEST_WORKERS):
+    """Split and ingest combined exports as they arrive in `combined_dir`."""
+    manifest = IngestManifest()
+    logger.debug(f"Watching {combined_dir} for combined PDF files every {interval}s.")
+    for pdf_paths in watch_pdfs(combined_dir, interval=interval):
+        process_combined_pdfs(pdf_paths, manifest, workers=workers)
+
+def watch_input_dir(input_dir="input_files", interval=INGEST_POLL_INTERVAL, workers=INGEST_WORKERS,
+                    combined_dir=COMBINED_INPUT_DIR):
+    """Ingest what is already in `input_dir`, then keep ingesting PDFs as they arrive."""
+    if combined_dir and os.path.isdir(combined_dir):
+        threading.Thread(target=watch_combined_dir, args=(combined_dir, interval, workers), daemon=True).start()
+    manifest = IngestManifest()
+    logger.debug(f"Watching {input_dir} for new PDF files every {interval}s.")
+    for pdf_paths in watch_pdfs(input_dir, interval=interval):
+        process_pdfs(pdf_paths, manifest, workers=workers)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Ingest payslip PDFs into the database.")
+    parser.add_argument("--input-dir", default="input_files")
+    parser.add_argument("--combined-dir", default=COMBINED_INPUT_DIR)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--once", action="store_true", help="Ingest what is there now and exit instead of watching")
+    args = parser.parse_args(argv)
+    init_db()
+    metrics.install_profiler_signal()
+    if args.once or INGEST_POLL_INTERVAL <= 0:
+        summary = process_all_pdfs(args.input_dir, workers=args.workers, combined_dir=args.combined_dir)
+        broadcaster.shutdown(wait=True)
+        metrics.log_summary()
+        return 1 if summary.failed else 0
+    metrics.start_log_reporter()
+    watch_input_dir(args.input_dir, workers=args.workers, combined_dir=args.combined_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
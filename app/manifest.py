@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from app.utils import file_sha256
+
+logger = logging.getLogger("IngestManifest")
+
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST", "data/ingest_manifest.jsonl")
+
+
+class IngestManifest:
+    """
+    Append-only record of ingested PDFs, keyed by content hash.
+
+    Each line is one ingested file: {"path", "size", "mtime_ns", "sha256", "ingested_at"}.
+    A file whose path, size and mtime match a recorded entry is skipped without being
+    read; anything else is hashed once and skipped if its content was already ingested.
+    """
+
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        self.hashes = set()
+        self.files: Dict[str, Tuple[int, int, str]] = {}
+        self._hashed: Dict[str, Tuple[int, int, str]] = {}
+        self._torn = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                self._torn = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from an interrupted append; the file will be re-ingested.
+                    logger.warning(f"Skipping unreadable manifest line in {self.path}")
+                    continue
+                self.hashes.add(entry["sha256"])
+                self.files[entry["path"]] = (entry["size"], entry["mtime_ns"], entry["sha256"])
+        logger.info(f"Loaded {len(self.hashes)} ingested file hashes from {self.path}")
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def __contains__(self, pdf_path: str) -> bool:
+        return self.is_ingested(pdf_path)
+
+    def is_ingested(self, pdf_path: str, stat: Optional[os.stat_result] = None) -> bool:
+        """Return True if this file, or a file with identical content, was already ingested."""
+        key = os.path.abspath(pdf_path)
+        stat = stat or os.stat(pdf_path)
+        known = self.files.get(key)
+        if known and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return True
+        sha256 = file_sha256(pdf_path)
+        self._hashed[key] = (stat.st_size, stat.st_mtime_ns, sha256)
+        return sha256 in self.hashes
+
+    def sha256(self, pdf_path: str) -> str:
+        """Return the content hash of `pdf_path`, reusing the one computed by is_ingested."""
+        key = os.path.abspath(pdf_path)
+        entry = self._hashed.get(key) or self.files.get(key)
+        return entry[2] if entry else file_sha256(pdf_path)
+
+    def pending(self, pdf_paths: List[str]) -> List[str]:
+        """Filter `pdf_paths` down to files that still need ingesting, one per distinct content."""
+        pending, batch_hashes = [], set()
+        for pdf_path in pdf_paths:
+            if self.is_ingested(pdf_path):
+                continue
+            sha256 = self.sha256(pdf_path)
+            if sha256 not in batch_hashes:
+                batch_hashes.add(sha256)
+                pending.append(pdf_path)
+        return pending
+
+    def record(self, pdf_path: str):
+        """Mark `pdf_path` as ingested; one appended line per file keeps this O(1)."""
+        key = os.path.abspath(pdf_path)
+        entry = self._hashed.pop(key, None)
+        if entry is None:
+            stat = os.stat(pdf_path)
+            entry = (stat.st_size, stat.st_mtime_ns, file_sha256(pdf_path))
+        size, mtime_ns, sha256 = entry
+        self.hashes.add(sha256)
+        self.files[key] = entry
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps({
+            "path": key,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": sha256,
+            "ingested_at": time.time(),
+        })
+        with open(self.path, "a", encoding="utf-8") as file:
+            if self._torn:
+                file.write("\n")
+                self._torn = False
+            file.write(line + "\n")
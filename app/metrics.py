@@ -0,0 +1,327 @@
+"""
+In-process counters, latency histograms and a sampling profiler.
+
+    with metrics.timer("bale_request_seconds", method="sendMessage"):
+        ...
+    metrics.inc("bale_requests_total", method="sendMessage", status="200")
+
+Everything lands in one process-wide registry, which app.bot serves at /metrics in
+the Prometheus text format and start_log_reporter() summarises to the log. Worker
+processes hand their numbers to the parent with take() and merge().
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("Metrics")
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Seconds between metric summaries in the log; 0 turns the summary off.
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "300"))
+# Seconds between stack samples while the profiler runs.
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.01"))
+PROFILER_OUTPUT_DIR = os.getenv("PROFILER_OUTPUT_DIR", "data/profiles")
+
+# Upper bounds, in seconds, of the latency buckets; +Inf is implied.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Bucketed latency distribution, as Prometheus exposes it."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation; an estimate, like histogram_quantile."""
+        rank, seen = q * self.count, 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return 0.0
+
+
+class Registry:
+    """Thread-safe store of counters, histograms and gauge callbacks."""
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.gauges: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name: str, snapshot: Callable[[], Dict[str, float]]):
+        """Expose `snapshot()`'s numbers as gauges `<name>_<key>`, read at every scrape."""
+        with self._lock:
+            self.gauges[name] = snapshot
+
+    def take(self) -> dict:
+        """Return the counters and histograms recorded so far and start from zero; see merge()."""
+        with self._lock:
+            state = {
+                "counters": self.counters,
+                "histograms": {
+                    name: {key: (h.counts, h.sum, h.count) for key, h in series.items()}
+                    for name, series in self.histograms.items()
+                },
+            }
+            self.counters, self.histograms = {}, {}
+        return state
+
+    def merge(self, state: dict):
+        """Add numbers taken from another registry, e.g. an ingestion worker process."""
+        with self._lock:
+            for name, series in state["counters"].items():
+                target = self.counters.setdefault(name, {})
+                for key, value in series.items():
+                    target[key] = target.get(key, 0) + value
+            for name, series in state["histograms"].items():
+                target = self.histograms.setdefault(name, {})
+                for key, (counts, total, count) in series.items():
+                    histogram = target.get(key)
+                    if histogram is None:
+                        histogram = target[key] = Histogram()
+                    histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                    histogram.sum += total
+                    histogram.count += count
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self.counters.items()}
+            histograms = {
+                name: {key: (list(h.counts), h.sum, h.count) for key, h in series.items()}
+                for name, series in self.histograms.items()
+            }
+            gauges = dict(self.gauges)
+        for name, series in sorted(counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{_labels(key)} {value:g}" for key, value in sorted(series.items()))
+        for name, series in sorted(histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for key, (counts, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS + (float("inf"),), counts):
+                    cumulative += bucket
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(key)} {total:.6f}")
+                lines.append(f"{name}_count{_labels(key)} {count}")
+        for name, snapshot in sorted(gauges.items()):
+            try:
+                values = snapshot()
+            except Exception as e:
+                logger.warning(f"Gauge {name} failed: {e}")
+                continue
+            for key, value in sorted(values.items()):
+                lines.append(f"# TYPE {name}_{key} gauge")
+                lines.append(f"{name}_{key} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[str]:
+        """One line per latency series: count, mean, p50 and p95."""
+        with self._lock:
+            series = [
+                (name, key, h.count, h.sum, h.quantile(0.5), h.quantile(0.95))
+                for name, by_labels in sorted(self.histograms.items())
+                for key, h in sorted(by_labels.items())
+                if h.count
+            ]
+        return [
+            f"{name}{_labels(key)}: n={count} avg={total / count * 1e3:.1f}ms "
+            f"p50<={_ms(p50)} p95<={_ms(p95)}"
+            for name, key, count, total, p50, p95 in series
+        ]
+
+
+def _ms(seconds: float) -> str:
+    return "+Inf" if seconds == float("inf") else f"{seconds * 1e3:g}ms"
+
+
+def _labels(key: Labels) -> str:
+    if not key:
+        return ""
+    pairs = []
+    for name, value in key:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+REGISTRY = Registry()
+
+
+def inc(name: str, amount: float = 1, **labels):
+    if METRICS_ENABLED:
+        REGISTRY.inc(name, amount, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    if METRICS_ENABLED:
+        REGISTRY.observe(name, value, **labels)
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observe the time spent in the block, also when it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def timed(name: str, **labels):
+    """Decorator form of timer()."""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def gauge(name: str, snapshot: Callable[[], Dict[str, float]]):
+    REGISTRY.gauge(name, snapshot)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def log_summary():
+    """Log one line per latency series recorded so far."""
+    for line in REGISTRY.summary():
+        logger.info(line)
+
+
+def start_log_reporter(interval: float = METRICS_LOG_INTERVAL) -> Optional[threading.Thread]:
+    """Call log_summary() every `interval` seconds on a daemon thread."""
+    if interval <= 0 or not METRICS_ENABLED:
+        return None
+
+    def report():
+        while True:
+            time.sleep(interval)
+            log_summary()
+
+    thread = threading.Thread(target=report, name="metrics-log", daemon=True)
+    thread.start()
+    return thread
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's stack from a background thread while running.
+
+    Costs nothing while stopped, so it can stay installed in production and be
+    switched on for a while (SIGUSR2 or POST /debug/profiler) when something is
+    slow. stop() writes the samples as folded stacks, the input of flamegraph.pl
+    and speedscope, and returns the path.
+    """
+
+    def __init__(self, interval: float = PROFILER_INTERVAL, output_dir: str = PROFILER_OUTPUT_DIR):
+        self.interval = interval
+        self.output_dir = output_dir
+        self.samples: Counter = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> bool:
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self.samples = Counter()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+            self._thread.start()
+        logger.info(f"Sampling profiler started ({self.interval * 1e3:g}ms interval)")
+        return True
+
+    def stop(self) -> Optional[str]:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return None
+        self._stopping.set()
+        thread.join()
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+        logger.info(f"Sampling profiler stopped; {sum(self.samples.values())} samples written to {path}")
+        return path
+
+    def toggle(self) -> Optional[str]:
+        """Start if stopped; stop and return the profile path if running."""
+        if self.running:
+            return self.stop()
+        self.start()
+        return None
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stopping.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+
+profiler = SamplingProfiler()
+
+
+def install_profiler_signal(signum: int = getattr(signal, "SIGUSR2", 0)) -> bool:
+    """Toggle the profiler on `signum` (SIGUSR2 by default); main thread only, not on Windows."""
+    if not signum or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, lambda *_: profiler.toggle())
+    return True
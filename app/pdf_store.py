@@ -0,0 +1,223 @@
+"""
+Content-addressed store for ingested payslip PDFs.
+
+Each PDF is copied to <root>/ab/cd/<sha256>.pdf, keyed by the SHA-256 of the file as
+it was dropped, so re-sent batches and moved input files cost no extra disk and
+Payslip.pdf_path never points into input_files/. With `compact`, the copy is rewritten
+through PyMuPDF's garbage-collecting, deflating save when that makes it smaller.
+
+    python -m app.pdf_store migrate   # move existing rows' PDFs into the store
+    python -m app.pdf_store gc [--dry-run]
+
+The database is only imported by the maintenance commands, so senders that just need
+attachment_name() can be imported without DB settings.
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+from app.utils import file_sha256
+
+logger = logging.getLogger("PdfStore")
+
+PDF_STORE_ENABLED = os.getenv("PDF_STORE_ENABLED", "1") == "1"
+PDF_STORE_PATH = os.getenv("PDF_STORE_PATH", "data/pdf_store")
+# Rewrite stored PDFs with garbage collection and deflate; costs CPU at ingest, saves bytes on every send.
+PDF_STORE_COMPACT = os.getenv("PDF_STORE_COMPACT", "0") == "1"
+# File name users see for a stored PDF, which is otherwise named by its hash.
+PDF_STORE_FILE_NAME = os.getenv("PDF_STORE_FILE_NAME", "payslip.pdf")
+# Blobs younger than this are never collected; an ingest may not have stored its row yet.
+PDF_STORE_GC_GRACE = float(os.getenv("PDF_STORE_GC_GRACE", "3600"))
+
+
+@dataclass
+class GcReport:
+    """Outcome of a garbage collection pass."""
+
+    kept: int = 0
+    removed: int = 0
+    freed_bytes: int = 0
+
+
+class PdfStore:
+    """PDFs on disk, addressed by content hash."""
+
+    def __init__(self, root: str = PDF_STORE_PATH, compact: bool = PDF_STORE_COMPACT):
+        self.root = os.path.abspath(root)
+        self.compact = compact
+
+    def path_for(self, sha256: str) -> str:
+        """Where the blob with this hash lives, whether or not it exists yet."""
+        return os.path.join(self.root, sha256[:2], sha256[2:4], f"{sha256}.pdf")
+
+    def get(self, sha256: str) -> Optional[str]:
+        """Path of the stored blob with this hash, or None."""
+        path = self.path_for(sha256)
+        return path if os.path.exists(path) else None
+
+    def __contains__(self, path: str) -> bool:
+        """Whether `path` is inside this store."""
+        return os.path.abspath(path).startswith(self.root + os.sep)
+
+    def put(self, source: str, sha256: Optional[str] = None) -> str:
+        """Store `source` unless identical bytes are already stored; return the stored path."""
+        if source in self:
+            return os.path.abspath(source)
+        sha256 = sha256 or file_sha256(source)
+        path = self.path_for(sha256)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            if not (self.compact and self._compact(source, tmp_path)):
+                shutil.copyfile(source, tmp_path)
+            # Concurrent puts of the same content write the same bytes; the last rename wins harmlessly.
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    @staticmethod
+    def _compact(source: str, target: str) -> bool:
+        """Write a garbage-collected, deflated copy of `source`; False if it would not be smaller."""
+        import fitz
+
+        try:
+            with fitz.open(source) as doc:
+                doc.save(target, garbage=4, deflate=True, deflate_images=True, deflate_fonts=True, clean=True)
+        except Exception as e:
+            logger.warning(f"Could not compact {source}, storing it as is: {e}")
+            return False
+        if os.path.getsize(target) >= os.path.getsize(source):
+            os.remove(target)
+            return False
+        return True
+
+    def blobs(self) -> Iterator[Tuple[str, os.stat_result]]:
+        """Yield (path, stat) for every stored PDF."""
+        if not os.path.isdir(self.root):
+            return
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".pdf"):
+                    path = os.path.join(directory, filename)
+                    yield path, os.stat(path)
+
+    def referenced_paths(self, batch_size: Optional[int] = None) -> set:
+        """
+        Every stored path a Payslip row points to, or an unsent OutboundMessage
+        still has to upload, read in keyset pages of `batch_size` (DB_BATCH_SIZE).
+        """
+        from app.db_export import DB_BATCH_SIZE, OutboundMessage, Payslip, unit_of_work
+
+        batch_size = batch_size or DB_BATCH_SIZE
+        referenced = set()
+        sources = (
+            (Payslip, Payslip.pdf_path, True),
+            (OutboundMessage, OutboundMessage.file_path, OutboundMessage.status.in_(["pending", "sending"])),
+        )
+        for model, path_field, condition in sources:
+            last_id = 0
+            while True:
+                with unit_of_work():
+                    page = list(model
+                                .select(model.id, path_field)
+                                .where(model.id > last_id, path_field.startswith(self.root + os.sep), condition)
+                                .order_by(model.id)
+                                .limit(batch_size)
+                                .tuples())
+                if not page:
+                    break
+                referenced.update(path for _, path in page)
+                last_id = page[-1][0]
+        return referenced
+
+    def gc(self, grace: float = PDF_STORE_GC_GRACE, dry_run: bool = False) -> GcReport:
+        """Remove blobs nothing references (see referenced_paths) that are older than `grace` seconds."""
+        referenced = self.referenced_paths()
+        cutoff = time.time() - grace
+        report = GcReport()
+        for path, stat in self.blobs():
+            if path in referenced or stat.st_mtime > cutoff:
+                report.kept += 1
+                continue
+            if not dry_run:
+                os.remove(path)
+            report.removed += 1
+            report.freed_bytes += stat.st_size
+        verb = "Would remove" if dry_run else "Removed"
+        logger.info(f"{verb} {report.removed} unreferenced PDFs ({report.freed_bytes} bytes); kept {report.kept}")
+        return report
+
+    def migrate(self, batch_size: Optional[int] = None) -> int:
+        """Copy the PDFs of rows that point outside the store into it and repoint the rows."""
+        from app.db_export import DB_BATCH_SIZE, Payslip, unit_of_work
+
+        batch_size = batch_size or DB_BATCH_SIZE
+        moved, last_id = 0, 0
+        while True:
+            with unit_of_work():
+                page = list(Payslip
+                            .select(Payslip.id, Payslip.pdf_path)
+                            .where(Payslip.id > last_id, Payslip.pdf_path.is_null(False))
+                            .order_by(Payslip.id)
+                            .limit(batch_size)
+                            .tuples())
+            if not page:
+                return moved
+            last_id = page[-1][0]
+            for payslip_id, pdf_path in page:
+                if pdf_path in self or not os.path.exists(pdf_path):
+                    continue
+                stored = self.put(pdf_path)
+                with unit_of_work():
+                    Payslip.update(pdf_path=stored).where(Payslip.id == payslip_id).execute()
+                moved += 1
+
+
+def attachment_name(path: str) -> str:
+    """Name to send a PDF under: stored blobs are named by hash, so they get PDF_STORE_FILE_NAME."""
+    return PDF_STORE_FILE_NAME if path in default_pdf_store() else os.path.basename(path)
+
+
+_default_store: Optional[PdfStore] = None
+
+
+def default_pdf_store() -> PdfStore:
+    """The process-wide store at PDF_STORE_PATH."""
+    global _default_store
+    if _default_store is None:
+        _default_store = PdfStore()
+    return _default_store
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the content-addressed payslip PDF store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="Move PDFs that rows still reference outside the store into it")
+    gc = commands.add_parser("gc", help="Delete stored PDFs no payslip references")
+    gc.add_argument("--dry-run", action="store_true")
+    gc.add_argument("--grace", type=float, default=PDF_STORE_GC_GRACE, help="Skip blobs younger than this many seconds")
+    args = parser.parse_args(argv)
+
+    from app.db_export import init_db
+
+    init_db()
+    store = default_pdf_store()
+    if args.command == "migrate":
+        logger.info(f"Moved {store.migrate()} payslip PDFs into {store.root}")
+    else:
+        store.gc(grace=args.grace, dry_run=args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import sys
+import time
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app import db_export
+from app.db_export import DB_BATCH_SIZE, Payslip, init_db, registered_chat_ids, save_many, unit_of_work
+from app.extractor import PayslipExtractor
+from app.pdf_store import PDF_STORE_ENABLED, default_pdf_store
+from app.text_cache import TextCache, default_text_cache
+
+logger = logging.getLogger("Reprocess")
+
+
+@dataclass
+class ReprocessSummary:
+    """Outcome of re-parsing the cached archive."""
+
+    documents: int = 0
+    stored: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.documents / self.elapsed if self.elapsed > 0 else 0.0
+
+    def log(self):
+        logger.info(
+            f"Re-parsed {self.documents} documents from cached text in {self.elapsed:.2f}s "
+            f"({self.documents_per_second:.0f} documents/s), stored {self.stored} payslips"
+        )
+
+
+def store_reparsed(rows: List[Dict[str, Any]]) -> int:
+    """
+    Upsert re-parsed payslips. Rows the old rules could not key (no year, month or
+    national code) are replaced rather than left beside the corrected ones, and the
+    corrected rows inherit their employee's registered chat.
+    """
+    paths = [row["pdf_path"] for row in rows if row.get("pdf_path")]
+    with unit_of_work(), db_export.database.atomic():
+        chat_ids = registered_chat_ids(row.get("national_code") for row in rows)
+        (Payslip
+         .delete()
+         .where(Payslip.pdf_path.in_(paths),
+                Payslip.national_code.is_null() | Payslip.year.is_null() | Payslip.month.is_null())
+         .execute())
+        stored = save_many(rows)
+        for national_code, chat_id in chat_ids.items():
+            (Payslip
+             .update(chat_id=chat_id)
+             .where(Payslip.national_code == national_code, Payslip.chat_id.is_null())
+             .execute())
+    return stored
+
+
+def reprocess_archive(
+    cache: Optional[TextCache] = None,
+    extractor: Optional[PayslipExtractor] = None,
+    batch_size: int = DB_BATCH_SIZE,
+    dry_run: bool = False,
+) -> ReprocessSummary:
+    """Run the current extraction rules over every cached document without opening any PDF."""
+    cache = cache or default_text_cache() or TextCache()
+    extractor = extractor or PayslipExtractor(debug=False, text_cache=cache)
+    summary = ReprocessSummary()
+    started = time.perf_counter()
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        if not dry_run:
+            summary.stored += store_reparsed(batch)
+        batch.clear()
+
+    for sha256, path, pages in cache.items():
+        row = extractor.extract_from_text("".join(pages)).to_dict()
+        # Both are keyed by the hash of the dropped file, so the stored copy is found directly.
+        row["pdf_path"] = (PDF_STORE_ENABLED and default_pdf_store().get(sha256)) or path
+        batch.append(row)
+        summary.documents += 1
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    summary.elapsed = time.perf_counter() - started
+    summary.log()
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Re-run the extraction rules over the cached text of every ingested PDF.")
+    parser.add_argument("--batch-size", type=int, default=DB_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Parse only; don't write to the database")
+    args = parser.parse_args(argv)
+    if not args.dry_run:
+        init_db()
+    reprocess_archive(batch_size=args.batch_size, dry_run=args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
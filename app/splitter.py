@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Tuple
+
+import fitz
+
+from app.extractor import PayslipExtractor, iter_page_groups
+from app.ingest import INGEST_WORKERS
+
+logger = logging.getLogger("Splitter")
+
+# Where the per-employee PDFs cut from a combined export are written.
+SPLIT_OUTPUT_DIR = os.getenv("SPLIT_OUTPUT_DIR", "data/split")
+# Pages handed to one worker at a time; bounds the work in flight, not the file size.
+SPLIT_PAGES_PER_TASK = int(os.getenv("SPLIT_PAGES_PER_TASK", "200"))
+
+# Long-lived extractor owned by each worker process.
+_extractor = None
+
+
+@dataclass
+class SplitPayslip:
+    """One employee's payslip cut from a combined PDF."""
+
+    source: str
+    first_page: int
+    last_page: int
+    pdf_path: str
+    data: Dict[str, Any]
+
+
+def _output_path(source: str, output_dir: str, first_page: int, national_code=None) -> str:
+    stem = os.path.splitext(os.path.basename(source))[0]
+    suffix = f"_{national_code}" if national_code else ""
+    return os.path.join(output_dir, f"{stem}_{first_page + 1:05d}{suffix}.pdf")
+
+
+def _write_pages(doc, first_page: int, last_page: int, pdf_path: str):
+    tmp_path = f"{pdf_path}.{os.getpid()}.tmp"
+    with fitz.open() as out:
+        out.insert_pdf(doc, from_page=first_page, to_page=last_page)
+        out.save(tmp_path, garbage=3, deflate=True)
+    os.replace(tmp_path, pdf_path)
+
+
+def _split_range(task: Tuple[str, str, int, int]) -> List[SplitPayslip]:
+    """Extract and write out every payslip that starts in one page range."""
+    global _extractor
+    if _extractor is None:
+        _extractor = PayslipExtractor(debug=False)
+    source, output_dir, start, stop = task
+    results = []
+    with fitz.open(source) as doc:
+        for first, last, text in iter_page_groups(doc, start, stop):
+            data = _extractor.extract_from_text(text).to_dict()
+            pdf_path = _output_path(source, output_dir, first, data.get("national_code"))
+            _write_pages(doc, first, last, pdf_path)
+            results.append(SplitPayslip(source, first, last, os.path.abspath(pdf_path), data))
+    return results
+
+
+def split_pdf(
+    pdf_path: str,
+    output_dir: str = SPLIT_OUTPUT_DIR,
+    workers: int = INGEST_WORKERS,
+    pages_per_task: int = SPLIT_PAGES_PER_TASK,
+) -> Iterator[SplitPayslip]:
+    """
+    Split a combined payroll export into one PDF and one extracted record per employee.
+
+    The page range is cut into `pages_per_task` slices that `workers` processes handle
+    in parallel, each opening the file itself and loading one page at a time, so memory
+    does not grow with the size of the export. Payslips are yielded in page order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+    tasks = [
+        (pdf_path, output_dir, start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+    workers = max(1, min(workers, len(tasks)))
+    started = time.perf_counter()
+    count = 0
+    if workers == 1:
+        for task in tasks:
+            for payslip in _split_range(task):
+                count += 1
+                yield payslip
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for results in pool.map(_split_range, tasks):
+                for payslip in results:
+                    count += 1
+                    yield payslip
+    elapsed = time.perf_counter() - started
+    logger.info(f"Split {pdf_path} ({page_count} pages) into {count} payslips in {elapsed:.2f}s using {workers} worker(s)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Split a combined payroll PDF into one PDF per employee.")
+    parser.add_argument("pdf_path")
+    parser.add_argument("--output-dir", default=SPLIT_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--pages-per-task", type=int, default=SPLIT_PAGES_PER_TASK)
+    args = parser.parse_args(argv)
+    for payslip in split_pdf(args.pdf_path, args.output_dir, args.workers, args.pages_per_task):
+        print(f"{payslip.first_page + 1}-{payslip.last_page + 1}\t{payslip.data.get('national_code', '')}\t{payslip.pdf_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
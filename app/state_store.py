@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from app.db_export import ConversationState, unit_of_work
+
+logger = logging.getLogger("StateStore")
+
+# "memory" keeps state in this process; "db" shares it through the ConversationState table.
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+# Seconds an untouched conversation is kept; abandoned registrations expire after this.
+STATE_TTL = float(os.getenv("STATE_TTL", "900"))
+# Conversations held by the in-memory backend before the least recently used is dropped.
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "10000"))
+# Writes between sweeps of expired rows in the DB backend.
+STATE_PURGE_EVERY = int(os.getenv("STATE_PURGE_EVERY", "500"))
+
+
+@dataclass
+class StateStoreMetrics:
+    """Lookup and eviction counters of a state store."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0    # Dropped to stay under the size cap
+    expirations: int = 0  # Dropped because their TTL ran out
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class StateStore(ABC):
+    """Conversation state per chat: a small JSON-able dict, or None when the chat has none."""
+
+    def __init__(self, ttl: float = STATE_TTL):
+        self.ttl = ttl
+        self.metrics = StateStoreMetrics()
+
+    @abstractmethod
+    def get(self, chat_id) -> Optional[Dict[str, Any]]:
+        """The chat's state, or None if it has none or it expired; a hit restarts its TTL."""
+
+    @abstractmethod
+    def set(self, chat_id, state: Dict[str, Any]):
+        """Replace the chat's state and restart its TTL."""
+
+    @abstractmethod
+    def delete(self, chat_id):
+        """Forget the chat's state."""
+
+
+class MemoryStateStore(StateStore):
+    """
+    Per-process store with a TTL and an LRU size cap.
+
+    Reading an entry restarts its TTL, so access order is also expiry order: expired
+    entries gather at the front and are swept there on every write; past
+    `max_entries` the least recently used go too.
+    States are held as tuples of items rather than dicts to keep entries small.
+    """
+
+    def __init__(self, ttl: float = STATE_TTL, max_entries: int = STATE_MAX_ENTRIES):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, chat_id) -> Optional[Dict[str, Any]]:
+        key = str(chat_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.metrics.count("expirations")
+                entry = None
+            if entry is None:
+                self.metrics.count("misses")
+                return None
+            self._entries[key] = (now + self.ttl, entry[1])
+            self._entries.move_to_end(key)
+        self.metrics.count("hits")
+        return dict(entry[1])
+
+    def set(self, chat_id, state: Dict[str, Any]):
+        key = str(chat_id)
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, tuple(state.items()))
+            self._entries.move_to_end(key)
+            while self._entries:
+                oldest_key, (expires_at, _) = next(iter(self._entries.items()))
+                if expires_at <= now:
+                    self.metrics.count("expirations")
+                elif len(self._entries) > self.max_entries:
+                    self.metrics.count("evictions")
+                else:
+                    break
+                del self._entries[oldest_key]
+
+    def delete(self, chat_id):
+        with self._lock:
+            self._entries.pop(str(chat_id), None)
+
+
+class DatabaseStateStore(StateStore):
+    """
+    Store in the ConversationState table, so every bot process and the webhook see
+    the same conversations and they survive restarts. Reads and writes push a row's
+    expiry out by the TTL; rows past it are ignored on read and deleted in bulk every `purge_every` writes.
+    """
+
+    def __init__(self, ttl: float = STATE_TTL, purge_every: int = STATE_PURGE_EVERY):
+        super().__init__(ttl)
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with unit_of_work():
+            return ConversationState.select().where(ConversationState.expires_at > datetime.now()).count()
+
+    def get(self, chat_id) -> Optional[Dict[str, Any]]:
+        now = datetime.now()
+        with unit_of_work():
+            row = (ConversationState
+                   .select(ConversationState.state)
+                   .where(ConversationState.chat_id == str(chat_id),
+                          ConversationState.expires_at > now)
+                   .first())
+            if row is not None:
+                # Like the memory store, a read keeps an active conversation alive.
+                (ConversationState
+                 .update(expires_at=now + timedelta(seconds=self.ttl))
+                 .where(ConversationState.chat_id == str(chat_id))
+                 .execute())
+        if row is None:
+            self.metrics.count("misses")
+            return None
+        self.metrics.count("hits")
+        return json.loads(row.state)
+
+    def set(self, chat_id, state: Dict[str, Any]):
+        expires_at = datetime.now() + timedelta(seconds=self.ttl)
+        with unit_of_work():
+            (ConversationState
+             .insert(chat_id=str(chat_id), state=json.dumps(state, ensure_ascii=False), expires_at=expires_at)
+             .on_conflict(conflict_target=[ConversationState.chat_id],
+                          preserve=[ConversationState.state, ConversationState.expires_at])
+             .execute())
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge_expired()
+
+    def delete(self, chat_id):
+        with unit_of_work():
+            ConversationState.delete().where(ConversationState.chat_id == str(chat_id)).execute()
+
+    def purge_expired(self) -> int:
+        """Delete expired rows; returns how many went."""
+        with unit_of_work():
+            purged = ConversationState.delete().where(ConversationState.expires_at <= datetime.now()).execute()
+        if purged:
+            self.metrics.count("expirations", purged)
+            logger.debug(f"Purged {purged} expired conversation states")
+        return purged
+
+
+def make_state_store(backend: str = STATE_BACKEND) -> StateStore:
+    """The state store selected by STATE_BACKEND."""
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "db":
+        return DatabaseStateStore()
+    raise ValueError(f"Unknown STATE_BACKEND: {backend!r}")
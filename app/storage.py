@@ -1,15 +1,254 @@
 import json
 import os
+import time
+import atexit
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 
+from app.utils import normalize_persian, parse_int, parse_month
 
-def save_to_json(data, json_path="data/extracted_data.json"):
-    if os.path.exists(json_path):
-        with open(json_path, "r", encoding="utf-8") as file:
-            existing_data = json.load(file)
-    else:
-        existing_data = []
+logger = logging.getLogger("Storage")
 
-    existing_data.append(data)
+STORAGE_PATH = os.getenv("STORAGE_PATH", "data/extracted_data.jsonl")
+LEGACY_JSON_PATH = os.getenv("LEGACY_JSON_PATH", "data/extracted_data.json")
+STORAGE_FSYNC_EVERY = int(os.getenv("STORAGE_FSYNC_EVERY", "100"))             # Records per fsync
+STORAGE_FSYNC_INTERVAL = float(os.getenv("STORAGE_FSYNC_INTERVAL", "1.0"))    # Max seconds between fsyncs
 
-    with open(json_path, "w", encoding="utf-8") as file:
-        json.dump(existing_data, file, ensure_ascii=False, indent=4)
+
+def record_key(record: dict) -> Optional[Tuple[str, int, int]]:
+    """(national_code, year, month) of an extracted payslip; None if any part is missing."""
+    national_code = record.get("national_code")
+    key = (
+        normalize_persian(str(national_code)) if national_code else None,
+        parse_int(record.get("year")),
+        parse_month(record.get("month")),
+    )
+    return None if None in key else key
+
+
+def _fsync_directory(path: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JsonlStore:
+    """
+    Append-only JSON Lines file of extracted payslips.
+
+    Appending a record writes one line, so saving N payslips is O(N) I/O, and a crash
+    can at most tear the last line, which readers skip. Appends are fsynced every
+    `fsync_every` records or `fsync_interval` seconds, and on flush()/close(). Later
+    records for the same (national_code, year, month) supersede earlier ones;
+    compact() drops the superseded lines.
+    """
+
+    def __init__(
+        self,
+        path: str = STORAGE_PATH,
+        fsync_every: int = STORAGE_FSYNC_EVERY,
+        fsync_interval: float = STORAGE_FSYNC_INTERVAL,
+    ):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a+b")
+            # Terminate a line torn by an earlier crash so the next record starts cleanly.
+            if self._file.tell() > 0:
+                self._file.seek(-1, os.SEEK_END)
+                if self._file.read(1) != b"\n":
+                    self._file.write(b"\n")
+        return self._file
+
+    def append(self, record: dict):
+        """Append one record; durable once the next fsync runs."""
+        self.append_many([record])
+
+    def append_many(self, records: Iterable[dict]) -> int:
+        """Append records in one write per call; returns how many were written."""
+        lines = [json.dumps(record, ensure_ascii=False) + "\n" for record in records]
+        if not lines:
+            return 0
+        file = self._open()
+        file.write("".join(lines).encode("utf-8"))
+        self._unsynced += len(lines)
+        if (self._unsynced >= self.fsync_every
+                or time.monotonic() - self._synced_at >= self.fsync_interval):
+            self.flush()
+        return len(lines)
+
+    def flush(self):
+        """Write buffered records through to disk."""
+        if self._file is None:
+            return
+        self._file.flush()
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.read()
+
+    def read(self) -> Iterator[dict]:
+        """Yield every stored record in append order, one line at a time."""
+        if self._file is not None:
+            self._file.flush()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping unreadable line in {self.path}")
+
+    def latest(self) -> Iterator[dict]:
+        """Yield the current record for each payslip, i.e. without superseded versions."""
+        last = self._last_positions()
+        for position, record in enumerate(self.read()):
+            key = record_key(record)
+            if key is None or last[key] == position:
+                yield record
+
+    def _last_positions(self):
+        # Only the keys are held in memory, never the records themselves.
+        last = {}
+        for position, record in enumerate(self.read()):
+            key = record_key(record)
+            if key is not None:
+                last[key] = position
+        return last
+
+    def compact(self) -> Tuple[int, int]:
+        """
+        Rewrite the file keeping only the latest record per (national_code, year, month).
+
+        The new file is written and fsynced beside the old one and then renamed over
+        it, so readers see either the old or the new file, never a partial one.
+        Returns (records kept, records dropped).
+        """
+        self.close()
+        if not os.path.exists(self.path):
+            return 0, 0
+        tmp_path = f"{self.path}.{os.getpid()}.compact"
+        last = self._last_positions()
+        kept = dropped = 0
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            for position, record in enumerate(self.read()):
+                key = record_key(record)
+                if key is not None and last[key] != position:
+                    dropped += 1
+                    continue
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                kept += 1
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self.path)
+        _fsync_directory(self.path)
+        logger.info(f"Compacted {self.path}: kept {kept}, dropped {dropped} superseded records")
+        return kept, dropped
+
+
+def migrate_json_array(json_path: str = LEGACY_JSON_PATH, store: Optional[JsonlStore] = None) -> int:
+    """
+    Move records from the old single-array JSON file into the JSONL store.
+
+    The legacy file is renamed to `<json_path>.migrated` afterwards, so this runs once.
+    Returns the number of records migrated.
+    """
+    if not os.path.exists(json_path):
+        return 0
+    with open(json_path, "r", encoding="utf-8") as file:
+        try:
+            records = json.load(file)
+        except ValueError:
+            logger.error(f"{json_path} is not valid JSON; leaving it in place")
+            return 0
+    if isinstance(records, dict):
+        records = [records]
+
+    store = store or JsonlStore()
+    with store:
+        count = store.append_many(records)
+    os.replace(json_path, json_path + ".migrated")
+    logger.info(f"Migrated {count} records from {json_path} to {store.path}")
+    return count
+
+
+_stores: Dict[str, JsonlStore] = {}
+_stores_lock = threading.Lock()
+
+
+def _paths_for(json_path: str) -> Tuple[Optional[str], str]:
+    """(legacy JSON array to migrate, JSONL store path) for a path given to save_to_json."""
+    if json_path.endswith(".json"):
+        # A caller still passing the old array file gets a JSONL file beside it.
+        return json_path, json_path[:-len(".json")] + ".jsonl"
+    return (LEGACY_JSON_PATH if json_path == STORAGE_PATH else None), json_path
+
+
+def shared_store(json_path: str = STORAGE_PATH) -> JsonlStore:
+    """
+    The process-wide store for `json_path`, opened on first use and closed at exit,
+    so its fsync batching spans calls. A legacy array file is migrated into it first.
+    """
+    legacy_path, path = _paths_for(json_path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = JsonlStore(path)
+            if legacy_path and os.path.exists(legacy_path):
+                migrate_json_array(legacy_path, store)
+            if legacy_path == json_path:
+                logger.warning(f"{json_path} is a legacy JSON array path; records are appended to {path}")
+        return store
+
+
+@atexit.register
+def close_shared_stores():
+    """Flush and close every shared store; runs at interpreter exit."""
+    with _stores_lock:
+        for store in _stores.values():
+            store.close()
+        _stores.clear()
+
+
+def save_to_json(data, json_path=STORAGE_PATH):
+    """
+    Append one extracted payslip to the JSONL store at `json_path`. A `.json` path
+    (the old single-array format) is migrated to the `.jsonl` file beside it.
+    """
+    store = shared_store(json_path)
+    with _stores_lock:
+        store.append(data)
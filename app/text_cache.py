@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+import fitz
+
+logger = logging.getLogger("TextCache")
+
+TEXT_CACHE_ENABLED = os.getenv("TEXT_CACHE_ENABLED", "1") == "1"
+TEXT_CACHE_PATH = os.getenv("TEXT_CACHE_PATH", "data/text_cache.sqlite")
+# Compressed bytes kept before the least recently used documents are evicted.
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Text layout can change between PyMuPDF releases, so entries are only valid for the one that made them.
+ENGINE = f"pymupdf-{fitz.VersionBind}"
+
+# Seconds between access-time updates of the same entry; keeps reads from turning into writes.
+TOUCH_INTERVAL = 3600
+# Puts between size checks.
+EVICT_EVERY = 64
+
+
+class TextCache:
+    """
+    Page text of PDFs, keyed by content hash and PyMuPDF version.
+
+    Text is stored zlib-compressed in a local SQLite file shared by all processes.
+    When the stored size passes `max_bytes`, the least recently used documents are
+    dropped until it is back under 90% of the limit. Each entry also remembers the
+    last path the document was read from, so the archive can be re-parsed without
+    touching the PDFs (see app.reprocess).
+    """
+
+    def __init__(self, path: str = TEXT_CACHE_PATH, max_bytes: int = TEXT_CACHE_MAX_BYTES, engine: str = ENGINE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.engine = engine
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pid = None
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection inherited through fork is unusable; worker processes open their own.
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=wal")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS page_text ("
+                " sha256 TEXT NOT NULL, engine TEXT NOT NULL, path TEXT, pages BLOB NOT NULL,"
+                " size INTEGER NOT NULL, accessed_at REAL NOT NULL, PRIMARY KEY (sha256, engine))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS page_text_accessed_at ON page_text (accessed_at)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, sha256: str) -> Optional[List[str]]:
+        """Return the cached page texts of the document with this hash, or None."""
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT pages, accessed_at FROM page_text WHERE sha256 = ? AND engine = ?", (sha256, self.engine)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            now = time.time()
+            if now - row[1] > TOUCH_INTERVAL:
+                conn.execute("UPDATE page_text SET accessed_at = ? WHERE sha256 = ? AND engine = ?",
+                             (now, sha256, self.engine))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, sha256: str, pages: List[str], path: Optional[str] = None):
+        """Store the page texts of a document, replacing any earlier entry."""
+        blob = zlib.compress(json.dumps(pages, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO page_text (sha256, engine, path, pages, size, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, self.engine, os.path.abspath(path) if path else None, blob, len(blob), time.time()),
+            )
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        conn = self._connection()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM page_text").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess, freed, victims = total - int(self.max_bytes * 0.9), 0, []
+        for rowid, size in conn.execute("SELECT rowid, size FROM page_text ORDER BY accessed_at"):
+            victims.append((rowid,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM page_text WHERE rowid = ?", victims)
+        logger.info(f"Evicted {len(victims)} documents ({freed} bytes) from {self.path}")
+
+    def size(self) -> Tuple[int, int]:
+        """(documents, compressed bytes) currently stored."""
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM page_text").fetchone()
+
+    def items(self) -> Iterator[Tuple[str, Optional[str], List[str]]]:
+        """Yield (sha256, path, pages) for every document cached by this PyMuPDF version."""
+        with self._lock:
+            self._connection()  # Creates the table on first use.
+        # A connection of its own, so a long iteration doesn't hold the lock.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            rows = conn.execute("SELECT sha256, path, pages FROM page_text WHERE engine = ?", (self.engine,))
+            for sha256, path, blob in rows:
+                yield sha256, path, json.loads(zlib.decompress(blob))
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+_default_cache: Optional[TextCache] = None
+
+
+def default_text_cache() -> Optional[TextCache]:
+    """The process-wide cache at TEXT_CACHE_PATH, or None when TEXT_CACHE_ENABLED is off."""
+    global _default_cache
+    if not TEXT_CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        _default_cache = TextCache()
+    return _default_cache
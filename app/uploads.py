@@ -0,0 +1,81 @@
+import os
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from app import bale_api
+from app.db_export import UploadedFile, unit_of_work
+from app.pdf_store import attachment_name
+from app.utils import file_sha256
+
+logger = logging.getLogger("Uploads")
+
+# (path, size, mtime_ns) -> sha256, so an unchanged file is hashed once per process.
+_hashes: Dict[Tuple[str, int, int], str] = {}
+_hashes_lock = threading.Lock()
+
+
+def content_hash(file_path: str) -> str:
+    """Return the SHA-256 of `file_path`, memoised on its size and mtime."""
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _hashes_lock:
+        sha256 = _hashes.get(key)
+    if sha256 is None:
+        sha256 = file_sha256(file_path)
+        with _hashes_lock:
+            _hashes[key] = sha256
+    return sha256
+
+
+def cached_file_id(sha256: str) -> Optional[str]:
+    with unit_of_work():
+        row = UploadedFile.get_or_none(UploadedFile.sha256 == sha256)
+    return row.file_id if row else None
+
+
+def remember_file_id(sha256: str, file_id: str):
+    with unit_of_work():
+        (UploadedFile
+         .insert(sha256=sha256, file_id=file_id)
+         .on_conflict(conflict_target=[UploadedFile.sha256], preserve=[UploadedFile.file_id, UploadedFile.uploaded_at])
+         .execute())
+
+
+def forget_file_id(sha256: str):
+    with unit_of_work():
+        UploadedFile.delete().where(UploadedFile.sha256 == sha256).execute()
+
+
+def _uploaded_file_id(response) -> Optional[str]:
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    if not body.get("ok"):
+        return None
+    return (body.get("result") or {}).get("document", {}).get("file_id")
+
+
+def send_document(chat_id, file_path, caption=None):
+    """
+    Send a PDF, uploading it only if Bale doesn't already have these exact bytes.
+
+    The file_id Bale returns for an upload is cached against the file's content hash.
+    Later sends of the same content reuse it; if Bale rejects a cached id with a 4xx
+    it is dropped and the file is uploaded again. Returns the final HTTP response.
+    """
+    sha256 = content_hash(file_path)
+    file_id = cached_file_id(sha256)
+    if file_id:
+        response = bale_api.send_document_id(chat_id, file_id, caption=caption)
+        if response.status_code < 400 or response.status_code == 429 or response.status_code >= 500:
+            return response
+        logger.info(f"Bale rejected cached file_id for {file_path} ({response.status_code}); re-uploading")
+        forget_file_id(sha256)
+
+    response = bale_api.send_document(chat_id, file_path, caption=caption, file_name=attachment_name(file_path))
+    file_id = _uploaded_file_id(response)
+    if file_id:
+        remember_file_id(sha256, file_id)
+    return response
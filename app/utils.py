@@ -0,0 +1,110 @@
+import time
+import hashlib
+import threading
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+# Read size used when hashing files; large enough to keep syscalls cheap.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """Return the hex SHA-256 of a file without loading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Persian (U+06F0..) and Arabic-Indic (U+0660..) digits to ASCII.
+DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+PERSIAN_MONTHS = [
+    "فروردین", "اردیبهشت", "خرداد", "تیر", "مرداد", "شهریور",
+    "مهر", "آبان", "آذر", "دی", "بهمن", "اسفند",
+]
+
+
+def normalize_persian(text: str) -> str:
+    """Fold presentation forms, Arabic yeh/kaf and non-ASCII digits into one canonical spelling."""
+    text = unicodedata.normalize("NFKC", text)
+    return text.translate(DIGITS).replace("ي", "ی").replace("ك", "ک").strip()
+
+
+def parse_int(value) -> Optional[int]:
+    """Parse an amount such as "1,250,000" or "۱۴۰۳"; None if there is no number."""
+    if value is None or isinstance(value, int):
+        return value
+    text = normalize_persian(str(value)).replace(",", "").replace("٬", "")
+    return int(text) if text.isdigit() else None
+
+
+def parse_decimal(value) -> Optional[Decimal]:
+    """Parse a quantity such as "30", "30.5" or the payslip's "31/00"; None if unparseable."""
+    if value is None or isinstance(value, Decimal):
+        return value
+    text = normalize_persian(str(value)).replace("/", ".").replace("٫", ".")
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+def parse_month(value) -> Optional[int]:
+    """Parse a Persian month name (in any glyph form) or number into 1..12; None otherwise."""
+    if value is None or isinstance(value, int):
+        return value
+    text = normalize_persian(str(value))
+    if text.isdigit():
+        return int(text) if 1 <= int(text) <= 12 else None
+    for number, name in enumerate(PERSIAN_MONTHS, start=1):
+        if text == name or text.endswith(" " + name):
+            return number
+    return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take `tokens` if available and return 0, else return the seconds until they will be."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` are available, without taking them."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available and take them."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    @property
+    def full(self) -> bool:
+        """True when the bucket has refilled completely, i.e. it has been idle."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens >= self.capacity
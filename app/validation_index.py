@@ -0,0 +1,172 @@
+import os
+import pickle
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.utils import file_sha256, normalize_persian
+
+logger = logging.getLogger("ValidationIndex")
+
+VALIDATION_SOURCE = os.getenv("VALIDATION_SOURCE", "list.xlsx")
+VALIDATION_INDEX_PATH = os.getenv("VALIDATION_INDEX_PATH", "data/validation_index.pickle")
+# Seconds between checks of the source file for changes
+VALIDATION_CHECK_INTERVAL = float(os.getenv("VALIDATION_CHECK_INTERVAL", "5"))
+
+NATIONAL_CODE_COLUMN = "شماره ملی"
+PERSONNEL_NUMBER_COLUMN = "شماره پرسنلی روی فیشش قبلی"
+
+INDEX_VERSION = 1
+
+
+def _digits(value) -> str:
+    text = normalize_persian(str(value))
+    # Excel hands numeric cells back as floats ("54042798.0").
+    if text.endswith(".0"):
+        text = text[:-2]
+    return "".join(ch for ch in text if ch.isdigit())
+
+
+def normalize_national_code(value) -> Optional[str]:
+    """Canonical 10-digit national code from user input or a spreadsheet cell; None if invalid."""
+    if value is None:
+        return None
+    digits = _digits(value)
+    if not digits or len(digits) > 10:
+        return None
+    return digits.zfill(10)
+
+
+def normalize_personnel_number(value) -> Optional[str]:
+    """Canonical personnel number: ASCII digits without leading zeros."""
+    if value is None:
+        return None
+    digits = _digits(value).lstrip("0")
+    return digits or None
+
+
+class ValidationIndex:
+    """
+    National code -> personnel number map compiled from the staff spreadsheet.
+
+    The spreadsheet is parsed once into a pickled dict next to it, tagged with the
+    source's size, mtime and SHA-256; later processes load the pickle instead of
+    running openpyxl. Loading happens on first use. Every `check_interval` seconds a
+    lookup stats the source, and if it changed one caller rebuilds the map while the
+    others keep answering from the previous one until the new map is swapped in. A
+    source that cannot be read after the first load leaves the previous map in place.
+    """
+
+    def __init__(
+        self,
+        source: str = VALIDATION_SOURCE,
+        index_path: str = VALIDATION_INDEX_PATH,
+        check_interval: float = VALIDATION_CHECK_INTERVAL,
+    ):
+        self.source = source
+        self.index_path = index_path
+        self.check_interval = check_interval
+        self._data: Optional[Dict[str, str]] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _source_signature(self) -> Tuple[int, int]:
+        stat = os.stat(self.source)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _read_spreadsheet(self) -> Dict[str, str]:
+        import pandas as pd
+
+        df = pd.read_excel(self.source, dtype=str, usecols=[NATIONAL_CODE_COLUMN, PERSONNEL_NUMBER_COLUMN])
+        data = {}
+        for national_code, personnel_number in zip(df[NATIONAL_CODE_COLUMN], df[PERSONNEL_NUMBER_COLUMN]):
+            code = normalize_national_code(national_code)
+            number = normalize_personnel_number(personnel_number)
+            if code and number:
+                data[code] = number
+        return data
+
+    def _read_index(self) -> Optional[dict]:
+        try:
+            with open(self.index_path, "rb") as file:
+                index = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        return index if index.get("version") == INDEX_VERSION else None
+
+    def _write_index(self, index: dict):
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(index, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+
+    def _build(self, signature: Tuple[int, int]) -> Dict[str, str]:
+        """Return the map for the source as of `signature`, from the pickle when it is still valid."""
+        index = self._read_index()
+        if index and (index["size"], index["mtime_ns"]) == signature:
+            return index["data"]
+
+        sha256 = file_sha256(self.source)
+        if index and index["sha256"] == sha256:
+            # Touched but not edited; keep the data, refresh the signature.
+            data = index["data"]
+        else:
+            started = time.perf_counter()
+            data = self._read_spreadsheet()
+            logger.info(f"Compiled {len(data)} employees from {self.source} in {time.perf_counter() - started:.2f}s")
+        self._write_index({
+            "version": INDEX_VERSION,
+            "size": signature[0],
+            "mtime_ns": signature[1],
+            "sha256": sha256,
+            "data": data,
+        })
+        return data
+
+    def _current(self) -> Dict[str, str]:
+        data = self._data
+        now = time.monotonic()
+        if data is not None and now - self._checked_at < self.check_interval:
+            return data
+        self._checked_at = now
+        try:
+            return self._refresh(data)
+        except Exception as e:
+            # Only the first load has nothing to fall back on; a broken edit is retried next interval.
+            if data is None:
+                raise
+            logger.warning(f"Could not reload {self.source}, keeping the previous map: {e}")
+            return data
+
+    def _refresh(self, data: Optional[Dict[str, str]]) -> Dict[str, str]:
+        """Load the map, or rebuild it if the source changed since `data` was built."""
+        signature = self._source_signature()
+        if data is not None and signature == self._signature:
+            return data
+
+        # The first load has to wait; a reload only needs one thread, the rest use the old map.
+        if not self._lock.acquire(blocking=data is None):
+            return data
+        try:
+            if self._data is None or signature != self._signature:
+                self._data = self._build(signature)
+                self._signature = signature
+            return self._data
+        finally:
+            self._lock.release()
+
+    def get(self, national_code) -> Optional[str]:
+        """Personnel number registered for `national_code`, in any spelling; None if unknown."""
+        code = normalize_national_code(national_code)
+        return self._current().get(code) if code else None
+
+    def __contains__(self, national_code) -> bool:
+        return self.get(national_code) is not None
+
+    def __len__(self) -> int:
+        return len(self._current())
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Benchmarks run against a scratch SQLite database unless DB_BACKEND says otherwise.
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.gettempdir(), "payslip-bench.db"))
+os.environ.setdefault("PDF_STORE_PATH", os.path.join(tempfile.gettempdir(), "payslip-bench-pdf-store"))
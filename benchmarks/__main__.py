@@ -0,0 +1,123 @@
+"""
+Run the benchmark suite and write the results as JSON.
+
+    python -m benchmarks [--scale small|full] [--only extractor,ingest,...]
+                         [--output results.json] [--compare baseline.json]
+
+With --compare, every metric is checked against the baseline file and the run
+fails if one got worse by more than --tolerance (a fraction, default 0.25).
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+
+import fitz
+
+SCALES = {
+    "small": {"payslips": 500, "files": 50, "users": 25, "records": 1000, "employees": 1000, "repeats": 3},
+    "full": {"payslips": 5000, "files": 500, "users": 200, "records": 20000, "employees": 20000, "repeats": 10},
+}
+
+# Metric name suffixes where a smaller number is better; for the rest, larger is better.
+LOWER_IS_BETTER = ("_ms", "_us", "_seconds")
+HIGHER_IS_BETTER = ("_per_second", "speedup")
+
+
+def _suite(scale, backend, workers):
+    from benchmarks import bench_bot, bench_extractor, bench_ingest, bench_lookup, bench_startup, bench_storage
+
+    size = SCALES[scale]
+    return {
+        "extractor": lambda: bench_extractor.run(size["payslips"]),
+        "extractor_files": lambda: bench_extractor.run_files(size["files"]),
+        "ingest": lambda: bench_ingest.run(size["files"], workers=workers, backend=backend),
+        "bot": lambda: bench_bot.run(size["users"], backend=backend),
+        "storage": lambda: bench_storage.run(size["records"]),
+        "lookup": lambda: bench_lookup.run(size["employees"], backend=backend),
+        "startup": lambda: bench_startup.run(size["repeats"]),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Return (benchmark, metric, baseline, current) for every metric that regressed past `tolerance`."""
+    regressions = []
+    for name, metrics in results["benchmarks"].items():
+        for metric, value in metrics.items():
+            before = baseline.get("benchmarks", {}).get(name, {}).get(metric)
+            if not isinstance(value, float) or not isinstance(before, (int, float)) or before <= 0:
+                continue
+            if metric.endswith(LOWER_IS_BETTER) and value > before * (1 + tolerance):
+                regressions.append((name, metric, before, value))
+            elif metric.endswith(HIGHER_IS_BETTER) and value < before * (1 - tolerance):
+                regressions.append((name, metric, before, value))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the payslip benchmarks and write JSON results.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--only", help="Comma-separated benchmarks to run")
+    parser.add_argument("--backend", choices=["sqlite", "configured"], default="sqlite",
+                        help="'configured' uses the DB from the environment, e.g. a local scratch Postgres")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", default=None, help="Defaults to benchmarks/results/<timestamp>.json")
+    parser.add_argument("--compare", help="Baseline results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    suite = _suite(args.scale, args.backend, args.workers)
+    selected = args.only.split(",") if args.only else list(suite)
+    unknown = set(selected) - set(suite)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "pymupdf": fitz.VersionBind,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "scale": args.scale,
+            "backend": args.backend,
+        },
+        "benchmarks": {},
+    }
+    for name in selected:
+        started = time.perf_counter()
+        results["benchmarks"][name] = suite[name]()
+        print(f"{name}: done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results",
+                                         time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for name, metric, before, value in regressions:
+            print(f"REGRESSION {name}.{metric}: {before:.3f} -> {value:.3f}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    sys.exit(main())
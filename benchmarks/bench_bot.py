@@ -0,0 +1,98 @@
+"""
+Benchmark of the bot's update handlers (app.handlers) against a local Bale stub.
+
+Every simulated user runs the full conversation: /start, national code, personnel
+number, /getpayslip. Updates are handled one at a time for latency percentiles and
+then with one thread per chat for throughput. Sends go straight to the stub.
+
+    python -m benchmarks.bench_bot [users] [threads]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app import bale_api
+from app.bale_stub import BaleStubServer
+from app.db_export import Payslip, unit_of_work
+from app.validation_index import ValidationIndex
+from benchmarks.scratch import scratch_database, write_validation_list
+from benchmarks.synthetic import write_payslip_pdf
+
+
+def _conversation(user: int, update_id: int):
+    chat = {"id": 1_000_000 + user}
+    texts = ["/start", f"{user:010d}", str(10000 + user), "/getpayslip"]
+    return [{"update_id": update_id + i, "message": {"chat": chat, "text": text}} for i, text in enumerate(texts)]
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(users=100, threads=16, backend="sqlite", latency=0.0):
+    """Return per-update latency and updates/s for `users` full conversations."""
+    from app import handlers
+
+    saved = handlers.validation_index, handlers.dispatcher, handlers.logger.level, bale_api.BASE_URL
+    handlers.dispatcher = None
+    handlers.logger.setLevel(logging.WARNING)
+    try:
+        with tempfile.TemporaryDirectory() as tmp, scratch_database(backend), BaleStubServer(latency=latency) as stub:
+            bale_api.BASE_URL = stub.base_url
+            pdf = write_payslip_pdf(os.path.join(tmp, "payslip.pdf"), [0])
+            employees = [(f"{i:010d}", str(10000 + i)) for i in range(2 * users)]
+            handlers.validation_index = ValidationIndex(
+                write_validation_list(os.path.join(tmp, "list.xlsx"), employees),
+                index_path=os.path.join(tmp, "validation_index.pickle"),
+            )
+            with unit_of_work():
+                Payslip.insert_many([
+                    {"national_code": code, "personnel_number": number, "year": 1403, "month": month, "pdf_path": pdf}
+                    for code, number in employees for month in (10, 11)
+                ]).execute()
+
+            # Sequential: one update at a time, first half of the users.
+            latencies = []
+            started = time.perf_counter()
+            for user in range(users):
+                for update in _conversation(user, user * 4):
+                    began = time.perf_counter()
+                    handlers.handle_update(update)
+                    latencies.append(time.perf_counter() - began)
+            sequential = time.perf_counter() - started
+
+            # Concurrent: each chat's conversation in order on its own thread, second half.
+            def converse(user):
+                for update in _conversation(user, user * 4):
+                    handlers.handle_update(update)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(converse, range(users, 2 * users)))
+            concurrent = time.perf_counter() - started
+
+            documents = len(stub.calls("sendDocument"))
+        updates = users * 4
+        return {
+            "users": users,
+            "updates": updates,
+            "p50_ms": _percentile(latencies, 0.50) * 1e3,
+            "p95_ms": _percentile(latencies, 0.95) * 1e3,
+            "sequential_updates_per_second": updates / sequential,
+            "concurrent_updates_per_second": updates / concurrent,
+            "threads": threads,
+            "payslips_sent": documents,
+        }
+    finally:
+        handlers.validation_index, handlers.dispatcher, level, bale_api.BASE_URL = saved
+        handlers.logger.setLevel(level)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    for key, value in run(*args).items():
+        print(f"{key:32} {value:.2f}" if isinstance(value, float) else f"{key:32} {value}")
@@ -0,0 +1,99 @@
+"""
+Benchmarks of PayslipExtractor.
+
+run() compares the compiled single-pass RuleEngine against the previous per-field
+scan, checks both produce identical PayslipData, and reports per-payslip parse
+times. run_files() times extract_from_file on synthetic PDFs, reading them with
+PyMuPDF and then from a warm text cache.
+
+    python -m benchmarks.bench_extractor [payslips]
+"""
+import os
+import re
+import sys
+import time
+import tempfile
+import unicodedata
+
+from app.extractor import EXTRACTION_RULES, NUMERIC_FIELDS, PayslipData, PayslipExtractor
+from app.text_cache import TextCache
+from benchmarks.synthetic import payslip_text, write_payslip_pdfs
+
+
+def legacy_process_text(text: str) -> PayslipData:
+    """The per-field extraction loop PayslipExtractor used before the RuleEngine."""
+    def extract_from_line(lines, keywords, pattern):
+        for line in lines:
+            if any(keyword in line for keyword in keywords):
+                match = re.search(pattern, line)
+                if match:
+                    return match.group(1).strip()
+        return None
+
+    payslip = PayslipData()
+    clean_lines = [unicodedata.normalize("NFC", line.strip()) for line in text.splitlines() if line.strip()]
+    if len(clean_lines) >= 3 and ":" in clean_lines[1]:
+        payslip.name = clean_lines[1].split(":")[0].strip()
+        payslip.family_name = clean_lines[2].strip()
+    for field, (keywords, pattern) in EXTRACTION_RULES.items():
+        if field == "year" and re.match(r"^\d{4}$", clean_lines[0]):
+            payslip.year = clean_lines[0]
+        else:
+            value = extract_from_line(clean_lines, keywords, pattern)
+            if value:
+                if field in NUMERIC_FIELDS:
+                    value = value.replace(",", "")
+                setattr(payslip, field, value)
+    return payslip
+
+
+def bench(parse, texts, repeat=5):
+    """Return the best per-payslip time in microseconds over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            parse(text)
+        best = min(best, time.perf_counter() - started)
+    return best / len(texts) * 1e6
+
+
+def run(count=2000):
+    """Return before/after per-payslip timings for `count` synthetic payslips."""
+    texts = [payslip_text(i) for i in range(count)]
+    extractor = PayslipExtractor(debug=False)
+
+    for text in texts:
+        assert extractor._process_text(text) == legacy_process_text(text), "engine output differs"
+
+    before = bench(legacy_process_text, texts)
+    after = bench(extractor._process_text, texts)
+    return {"payslips": count, "before_us": before, "after_us": after, "speedup": before / after}
+
+
+def run_files(count=200, corpus_dir=None):
+    """Return per-file extract_from_file times for `count` synthetic PDFs, without and with the text cache."""
+    paths = write_payslip_pdfs(corpus_dir, count)
+
+    def per_file(extractor):
+        started = time.perf_counter()
+        for path in paths:
+            extractor.extract_from_file(path)
+        return (time.perf_counter() - started) / len(paths) * 1e3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TextCache(os.path.join(tmp, "text_cache.sqlite"))
+        uncached = per_file(PayslipExtractor(debug=False, text_cache=False))
+        cold = per_file(PayslipExtractor(debug=False, text_cache=cache))
+        warm = per_file(PayslipExtractor(debug=False, text_cache=cache))
+        cache.close()
+    return {"files": count, "pymupdf_ms": uncached, "cache_cold_ms": cold, "cache_warm_ms": warm,
+            "cache_speedup": uncached / warm}
+
+
+if __name__ == "__main__":
+    result = run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+    print(f"payslips:  {result['payslips']}")
+    print(f"before:    {result['before_us']:.1f} us/payslip")
+    print(f"after:     {result['after_us']:.1f} us/payslip")
+    print(f"speedup:   {result['speedup']:.2f}x")
@@ -0,0 +1,52 @@
+"""
+End-to-end benchmark of app.ingester.process_all_pdfs: extraction, DB upserts and manifest.
+
+The first run reads every PDF with PyMuPDF; the second ingests the same files again
+(with a fresh manifest) and is served by the text cache. Broadcasting is off.
+
+    python -m benchmarks.bench_ingest [files] [workers]
+"""
+import os
+import sys
+import logging
+import tempfile
+
+from app import text_cache
+from app.db_export import Payslip, unit_of_work
+from app.ingest import INGEST_WORKERS
+from app.manifest import IngestManifest
+from benchmarks.scratch import scratch_database
+from benchmarks.synthetic import write_payslip_pdfs
+
+
+def run(count=200, workers=INGEST_WORKERS, backend="sqlite", corpus_dir=None):
+    """Return files/s for a cold and a text-cached ingest of `count` synthetic PDFs."""
+    from app import ingester
+
+    corpus_dir = os.path.dirname(write_payslip_pdfs(corpus_dir, count)[0])
+    saved = ingester.BROADCAST_AFTER_INGEST, ingester.logger.level, text_cache._default_cache
+    ingester.BROADCAST_AFTER_INGEST = False
+    ingester.logger.setLevel(logging.WARNING)
+    try:
+        with tempfile.TemporaryDirectory() as tmp, scratch_database(backend):
+            # Forked workers inherit this cache object and open their own connection to it.
+            text_cache._default_cache = text_cache.TextCache(os.path.join(tmp, "text_cache.sqlite"))
+            results = {"files": count, "workers": workers}
+            for run_name in ("cold", "cached"):
+                manifest = IngestManifest(os.path.join(tmp, f"{run_name}-manifest.jsonl"))
+                summary = ingester.process_all_pdfs(corpus_dir, workers=workers, manifest=manifest, combined_dir=None)
+                results[f"{run_name}_seconds"] = summary.elapsed
+                results[f"{run_name}_files_per_second"] = summary.files_per_second
+                results[f"{run_name}_failed"] = summary.failed
+            with unit_of_work():
+                results["rows"] = Payslip.select().count()
+    finally:
+        ingester.BROADCAST_AFTER_INGEST, level, text_cache._default_cache = saved
+        ingester.logger.setLevel(level)
+    return results
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    for key, value in run(*args).items():
+        print(f"{key:28} {value:.2f}" if isinstance(value, float) else f"{key:28} {value}")
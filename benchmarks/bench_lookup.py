@@ -0,0 +1,75 @@
+"""
+Benchmark of the lookups behind each bot update: the staff list check and the
+latest-payslip query.
+
+    python -m benchmarks.bench_lookup [employees]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+from app.db_export import Payslip, unit_of_work
+from app.validation_index import ValidationIndex
+from benchmarks.scratch import scratch_database, write_validation_list
+
+
+def _per_call(fn, args):
+    started = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return (time.perf_counter() - started) / len(args)
+
+
+def run(employees=5000, lookups=2000, backend="sqlite"):
+    """Return spreadsheet compile/load times and per-lookup latencies for `employees` staff."""
+    rng = random.Random(0)
+    staff = [(f"{i:010d}", str(10000 + i)) for i in range(employees)]
+    probes = [rng.choice(staff)[0] for _ in range(lookups)]
+
+    import pandas  # noqa: F401  Imported up front so the compile time is openpyxl's, not the import's
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = write_validation_list(os.path.join(tmp, "list.xlsx"), staff)
+        index_path = os.path.join(tmp, "validation_index.pickle")
+
+        started = time.perf_counter()
+        assert len(ValidationIndex(source, index_path)) == employees
+        compile_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index = ValidationIndex(source, index_path)
+        len(index)
+        load_seconds = time.perf_counter() - started
+        validation_us = _per_call(index.get, probes) * 1e6
+
+        with scratch_database(backend):
+            with unit_of_work():
+                Payslip.insert_many([
+                    {"national_code": code, "year": 1403, "month": month}
+                    for code, _ in staff for month in (10, 11, 12)
+                ]).execute()
+
+                def latest(code):
+                    return (Payslip.select()
+                            .where(Payslip.national_code == code)
+                            .order_by(Payslip.id.desc())
+                            .first())
+
+                latest_us = _per_call(latest, probes) * 1e6
+
+    return {
+        "employees": employees,
+        "lookups": lookups,
+        "validation_compile_seconds": compile_seconds,
+        "validation_load_seconds": load_seconds,
+        "validation_lookup_us": validation_us,
+        "latest_payslip_query_us": latest_us,
+    }
+
+
+if __name__ == "__main__":
+    result = run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+    for key, value in result.items():
+        print(f"{key:28} {value:.2f}" if isinstance(value, float) else f"{key:28} {value}")
@@ -0,0 +1,72 @@
+"""
+Cold-start benchmark of the role entry points, from `python -X importtime`.
+
+Each role's module is imported in a fresh interpreter `repeats` times; the fastest
+run is kept, since the slower ones only add disk and scheduler noise. Also records
+which heavy libraries a role drags in, so a stray eager import shows up in review.
+
+    python -m benchmarks.bench_startup [repeats]
+"""
+import os
+import sys
+import time
+import subprocess
+
+from app.__main__ import ROLES
+
+# Roles whose startup matters for restarts and rolling deploys.
+STARTUP_ROLES = ("bot", "webhook", "ingest", "export")
+# Libraries a role should only load when it needs them.
+HEAVY_MODULES = ("fitz", "pandas", "numpy", "openpyxl", "flask", "requests", "peewee")
+
+
+def _parse_importtime(stderr: str):
+    """Return ({top-level module: cumulative microseconds}, set of every module imported)."""
+    top_level, imported = {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # The header line
+        imported.add(name.strip())
+        if not name[1:].startswith(" "):
+            top_level[name.strip()] = int(cumulative)
+    return top_level, imported
+
+
+def measure(module: str, repeats: int = 5):
+    """(import microseconds, process wall seconds, imported modules) of the fastest of `repeats` runs."""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=project_root)
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                capture_output=True, text=True, cwd=project_root, env=env)
+        wall = time.perf_counter() - started
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+        top_level, imported = _parse_importtime(result.stderr)
+        # `site` and the encodings run before any of our code; leave them out.
+        micros = sum(value for name, value in top_level.items() if name not in ("site", "encodings"))
+        if best is None or micros < best[0]:
+            best = (micros, wall, imported)
+    return best
+
+
+def run(repeats: int = 5):
+    """Return import time, process wall time and heavy imports per role."""
+    results = {"repeats": repeats}
+    for role in STARTUP_ROLES:
+        micros, wall, imported = measure(ROLES[role], repeats)
+        results[f"{role}_import_ms"] = micros / 1e3
+        results[f"{role}_process_ms"] = wall * 1e3
+        results[f"{role}_heavy_imports"] = ",".join(name for name in HEAVY_MODULES if name in imported)
+    return results
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:2]]
+    for key, value in run(*args).items():
+        print(f"{key:32} {value:.2f}" if isinstance(value, float) else f"{key:32} {value}")
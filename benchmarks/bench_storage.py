@@ -0,0 +1,77 @@
+"""
+Benchmark of the JSON Lines payslip store against the old rewrite-the-array save.
+
+    python -m benchmarks.bench_storage [records]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+
+from app.extractor import PayslipExtractor
+from app.storage import JsonlStore
+from benchmarks.synthetic import payslip_text
+
+# The legacy save is quadratic; it is timed on at most this many records.
+LEGACY_LIMIT = 500
+
+
+def legacy_save_to_json(data, json_path):
+    """The save_to_json app.storage had before the JSONL store: load, append, rewrite."""
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as file:
+            existing_data = json.load(file)
+    else:
+        existing_data = []
+    existing_data.append(data)
+    with open(json_path, "w", encoding="utf-8") as file:
+        json.dump(existing_data, file, ensure_ascii=False, indent=4)
+
+
+def run(count=5000):
+    """Return per-record append times, read and compaction throughput for `count` payslips."""
+    extractor = PayslipExtractor(debug=False, text_cache=False)
+    records = [extractor.extract_from_text(payslip_text(i)).to_dict() for i in range(count)]
+    legacy_count = min(count, LEGACY_LIMIT)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        for record in records[:legacy_count]:
+            legacy_save_to_json(record, os.path.join(tmp, "legacy.json"))
+        legacy = (time.perf_counter() - started) / legacy_count
+
+        path = os.path.join(tmp, "store.jsonl")
+        with JsonlStore(path) as store:
+            started = time.perf_counter()
+            for record in records:
+                store.append(record)
+            store.flush()
+            append = (time.perf_counter() - started) / count
+            # A second copy of every payslip gives compaction something to drop.
+            store.append_many(records)
+
+            started = time.perf_counter()
+            read = sum(1 for _ in store.read())
+            read_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            kept, dropped = store.compact()
+            compact_seconds = time.perf_counter() - started
+
+    return {
+        "records": count,
+        "legacy_records": legacy_count,
+        "legacy_append_us": legacy * 1e6,
+        "append_us": append * 1e6,
+        "read_records_per_second": read / read_seconds,
+        "compact_seconds": compact_seconds,
+        "compact_kept": kept,
+        "compact_dropped": dropped,
+    }
+
+
+if __name__ == "__main__":
+    result = run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+    for key, value in result.items():
+        print(f"{key:26} {value:.2f}" if isinstance(value, float) else f"{key:26} {value}")
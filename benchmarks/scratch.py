@@ -0,0 +1,49 @@
+"""Throwaway databases and fixtures shared by the benchmarks."""
+import os
+import tempfile
+from contextlib import contextmanager
+
+from peewee import SqliteDatabase
+
+from app import db_export
+
+
+@contextmanager
+def scratch_database(backend: str = "sqlite"):
+    """
+    Point the models at a fresh SQLite file for the duration of a benchmark.
+
+    With backend="configured" the database from the environment is used as-is (run
+    its migrations first); point it at a scratch Postgres database, never production.
+    """
+    if backend == "configured":
+        db_export.init_db()
+        yield db_export.database
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = SqliteDatabase(os.path.join(tmp, "bench.db"), pragmas={"journal_mode": "wal", "busy_timeout": 5000})
+        previous, db_export.database = db_export.database, database
+        try:
+            with database.bind_ctx(db_export.MODELS):
+                database.create_tables(db_export.MODELS)
+                database.close()
+                yield database
+        finally:
+            database.close()
+            db_export.database = previous
+
+
+def write_validation_list(path: str, employees):
+    """Write the staff spreadsheet ValidationIndex reads, for (national_code, personnel_number) pairs."""
+    from openpyxl import Workbook
+
+    from app.validation_index import NATIONAL_CODE_COLUMN, PERSONNEL_NUMBER_COLUMN
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([NATIONAL_CODE_COLUMN, PERSONNEL_NUMBER_COLUMN])
+    for national_code, personnel_number in employees:
+        sheet.append([national_code, personnel_number])
+    workbook.save(path)
+    return path
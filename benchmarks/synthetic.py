@@ -0,0 +1,95 @@
+"""Synthetic payslip content in the layout PayslipExtractor expects."""
+import os
+import random
+import tempfile
+
+FIRST_NAMES = ["ﻋﻠﯽ", "ﻣﺮﯾﻢ", "ﺭﺿﺎ", "ﺳﺎﺭﺍ", "ﺣﺴﯿﻦ", "ﺯﻫﺮﺍ", "ﻣﺤﻤﺪ", "ﻧﺮﮔﺲ"]
+FAMILY_NAMES = ["ﺍﺣﻤﺪﯼ", "ﺭﺿﺎﯾﯽ", "ﮐﺮﯾﻤﯽ", "ﻣﺤﻤﺪﯼ", "ﺣﺴﯿﻨﯽ", "ﺻﺎﺩﻗﯽ"]
+
+
+def _amount(rng, low, high):
+    return f"{rng.randrange(low, high) * 1000:,}"
+
+
+def payslip_lines(index: int, seed: int = 0) -> list:
+    """Return the text lines of payslip number `index`; the same index always gives the same payslip."""
+    rng = random.Random(seed * 1_000_003 + index)
+    return [
+        "1403",
+        f"{rng.choice(FIRST_NAMES)}:",
+        rng.choice(FAMILY_NAMES),
+        f"ﮐﺪ ﻣﻠﯽ: {index:010d}",
+        f"ﺷﻤﺎﺭﻩ ﭘﺮﺳﻨﻠﯽ: {10000 + index}",
+        f"ﺷﻤﺎﺭﻩ ﺑﯿﻤﻪ: {rng.randrange(1_000_000, 9_999_999)}",
+        "ﺷﺮﮐﺖ ﻧﻤﻮﻧﻪ ﭘﺎﺭﺱ",
+        "ﻣﺎﻩ ﺑﻬﻤﻦ",
+        f"ﮐﺎﺭﮐﺮﺩ ﻋﺎﺩﯼ {rng.choice(['30', '29', '31/00'])}",
+        f"ﺣﻘﻮﻕ ﭘﺎﯾﻪ {_amount(rng, 80_000, 200_000)}",
+        f"ﺣﻖ ﻣﺴﮑﻦ {_amount(rng, 5_000, 10_000)}",
+        f"ﺧﻮﺍﺭﻭﺑﺎﺭ {_amount(rng, 10_000, 20_000)}",
+        f"ﺍﺿﺎﻓﻪ ﮐﺎﺭ ﺳﺎﻋﺖ {rng.randrange(0, 40)}",
+        f"ﺣﻘﻮﻕ ﻭ ﻣﺰﺍﯾﺎ {_amount(rng, 100_000, 250_000)}",
+        f"ﺑﯿﻤﻪ ﺳﻬﻢ ﮐﺎﺭﻣﻨﺪ {_amount(rng, 7_000, 17_000)}",
+        f"ﻫﺰﯾﻨﻪ ﻏﺬﺍ {_amount(rng, 1_000, 3_000)}",
+        f"ﺟﻤﻊ ﮐﺴﻮﺭ {_amount(rng, 8_000, 20_000)}",
+        f"ﺧﺎﻟﺺ ﭘﺮﺩﺍﺧﺘﯽ {_amount(rng, 90_000, 230_000)} ﺭﯾﺎﻝ",
+        "ﺷﻤﺎﺭﻩ ﺣﺴﺎﺏ ﺩﻓﺘﺮ",
+    ]
+
+
+def payslip_text(index: int, seed: int = 0) -> str:
+    """Return payslip number `index` as the newline-joined text PyMuPDF would produce."""
+    return "\n".join(payslip_lines(index, seed)) + "\n"
+
+
+def _page_html(lines) -> str:
+    import html
+
+    return "".join(f'<p dir="rtl">{html.escape(line)}</p>' for line in lines)
+
+
+def _add_payslip_pages(doc, index: int, seed: int, pages_per_payslip: int):
+    pages = [payslip_lines(index, seed)]
+    pages += [[f"ﺍﺩﺍﻣﻪ {index}", f"ﺻﻔﺤﻪ {n + 2}"] for n in range(pages_per_payslip - 1)]
+    for lines in pages:
+        page = doc.new_page()
+        # MuPDF's HTML layout shapes and orders the RTL text, so the text layer reads
+        # back in logical order much like the payroll software's own exports.
+        page.insert_htmlbox(page.rect + (36, 36, -36, -36), _page_html(lines))
+
+
+def write_payslip_pdf(path: str, indices, seed: int = 0, pages_per_payslip: int = 1) -> str:
+    """
+    Write a PDF holding payslip `index` for each of `indices`, one after another, the
+    way the payroll software's combined export lays them out. Extra pages of a payslip
+    are continuation pages that don't start with a year.
+    """
+    import fitz
+
+    with fitz.open() as doc:
+        for index in indices:
+            _add_payslip_pages(doc, index, seed, pages_per_payslip)
+        doc.save(path, garbage=3, deflate=True)
+    return path
+
+
+def corpus_dir(count: int, seed: int = 0) -> str:
+    """Default location of the `count`-file synthetic corpus."""
+    return os.path.join(tempfile.gettempdir(), "payslip-bench-corpus", f"{seed}-{count}")
+
+
+def write_payslip_pdfs(output_dir: str = None, count: int = 100, seed: int = 0) -> list:
+    """
+    Write payslips 0..count-1 as one PDF each into `output_dir`, like a month's
+    input_files; files already there are kept, so a corpus is generated only once.
+    The default directory under the system temp dir holds exactly `count` files.
+    """
+    output_dir = output_dir or corpus_dir(count, seed)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for index in range(count):
+        path = os.path.join(output_dir, f"payslip_{seed}_{index:06d}.pdf")
+        if not os.path.exists(path):
+            os.replace(write_payslip_pdf(path + ".tmp", [index], seed), path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,52 @@
+"""Peewee migrations -- 001_initial.
+
+The payslip table as it was before migrations existed: every column a varchar.
+Databases created by the old `create_tables` call already have it, so this only
+creates the table, or adds columns an older copy of the table is missing.
+"""
+
+import peewee as pw
+from peewee_migrate import Migrator
+from playhouse.migrate import SchemaMigrator, migrate as run_operations
+
+CHAR_COLUMNS = [
+    "name", "family_name", "national_code", "personnel_number", "insurance_number",
+    "company_name", "year", "month", "standard_working_days", "base_salary",
+    "housing_allowance", "food_allowance", "total_salary", "employee_insurance",
+    "food_expense", "total_deductions", "net_payment", "net_payment_text",
+    "chat_id", "pdf_path",
+]
+
+
+def _legacy_columns():
+    columns = {name: pw.CharField(null=True) for name in CHAR_COLUMNS}
+    columns["last_request_at"] = pw.DateTimeField(null=True)
+    return columns
+
+
+def _create_or_complete(database: pw.Database):
+    columns = _legacy_columns()
+    if not database.table_exists("payslip"):
+        model = type("Payslip", (pw.Model,), {
+            **columns,
+            "Meta": type("Meta", (), {"database": database, "table_name": "payslip"}),
+        })
+        database.create_tables([model])
+        return
+
+    existing = {column.name for column in database.get_columns("payslip")}
+    schema = SchemaMigrator.from_database(database)
+    run_operations(*[
+        schema.add_column("payslip", name, field)
+        for name, field in columns.items() if name not in existing
+    ])
+
+
+def migrate(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your migrations here."""
+    migrator.run(_create_or_complete, database)
+
+
+def rollback(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your rollback migrations here."""
+    migrator.sql('DROP TABLE IF EXISTS "payslip"')
@@ -0,0 +1,109 @@
+"""Peewee migrations -- 002_typed_payslip.
+
+Convert the payslip period and money columns from varchar to numbers, in place,
+and index the columns the bot filters on.
+
+1. Every distinct value of a converted column is parsed once in Python and rewritten
+   as a plain number string (month names become 1..12, "1,250" becomes "1250", values
+   that are not numbers become NULL).
+2. Rows that now collide on (national_code, year, month) are collapsed onto the newest
+   one, keeping any registered chat_id / last_request_at.
+3. Column types change: ALTER ... TYPE ... USING on Postgres, a table rebuild on SQLite.
+4. Indexes are created.
+"""
+
+import peewee as pw
+from peewee_migrate import Migrator
+from playhouse.migrate import SchemaMigrator, migrate as run_operations
+
+from app.utils import parse_decimal, parse_int, parse_month
+
+MONEY_COLUMNS = [
+    "base_salary", "housing_allowance", "food_allowance", "total_salary",
+    "employee_insurance", "food_expense", "total_deductions", "net_payment",
+]
+
+# column -> (new field, parser, Postgres cast)
+TYPED_COLUMNS = {
+    "year": (pw.IntegerField(null=True), parse_int, "integer"),
+    "month": (pw.IntegerField(null=True), parse_month, "integer"),
+    "standard_working_days": (pw.DecimalField(max_digits=6, decimal_places=2, null=True), parse_decimal, "numeric(6,2)"),
+    **{column: (pw.BigIntegerField(null=True), parse_int, "bigint") for column in MONEY_COLUMNS},
+}
+
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS "payslip_national_code" ON "payslip" ("national_code")',
+    'CREATE INDEX IF NOT EXISTS "payslip_chat_id" ON "payslip" ("chat_id")',
+    'CREATE INDEX IF NOT EXISTS "payslip_national_code_id_desc" ON "payslip" ("national_code", "id" DESC)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS "payslip_national_code_year_month" '
+    'ON "payslip" ("national_code", "year", "month")',
+]
+
+
+def _normalise_values(database: pw.Database):
+    payslip = pw.Table("payslip").bind(database)
+    for column, (_, parse, _) in TYPED_COLUMNS.items():
+        field = getattr(payslip.c, column)
+        values = [value for (value,) in payslip.select(field).distinct().where(field.is_null(False)).tuples()]
+        for value in values:
+            parsed = parse(value)
+            normalised = None if parsed is None else str(parsed)
+            if normalised != value:
+                payslip.update({field: normalised}).where(field == value).execute()
+
+
+def _drop_duplicates(database: pw.Database):
+    payslip = pw.Table("payslip").bind(database)
+    c = payslip.c
+    duplicates = (payslip
+                  .select(c.national_code, c.year, c.month)
+                  .where(c.national_code.is_null(False), c.year.is_null(False), c.month.is_null(False))
+                  .group_by(c.national_code, c.year, c.month)
+                  .having(pw.fn.COUNT(c.id) > 1)
+                  .tuples())
+    for national_code, year, month in list(duplicates):
+        rows = list(payslip
+                    .select(c.id, c.chat_id, c.last_request_at)
+                    .where(c.national_code == national_code, c.year == year, c.month == month)
+                    .order_by(c.id.desc())
+                    .tuples())
+        keep_id = rows[0][0]
+        chat_id = next((row[1] for row in rows if row[1]), None)
+        last_request_at = max((row[2] for row in rows if row[2]), default=None)
+        payslip.update({c.chat_id: chat_id, c.last_request_at: last_request_at}).where(c.id == keep_id).execute()
+        payslip.delete().where(c.id.in_([row[0] for row in rows[1:]])).execute()
+
+
+def _change_types(database: pw.Database):
+    schema = SchemaMigrator.from_database(database)
+    postgres = isinstance(database, pw.PostgresqlDatabase)
+    run_operations(*[
+        schema.alter_column_type("payslip", column, field, cast=f'"{column}"::{cast}' if postgres else None)
+        for column, (field, _, cast) in TYPED_COLUMNS.items()
+    ])
+
+
+def _revert_types(database: pw.Database):
+    schema = SchemaMigrator.from_database(database)
+    postgres = isinstance(database, pw.PostgresqlDatabase)
+    run_operations(*[
+        schema.alter_column_type("payslip", column, pw.CharField(null=True), cast=f'"{column}"::varchar' if postgres else None)
+        for column in TYPED_COLUMNS
+    ])
+
+
+def migrate(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your migrations here."""
+    migrator.run(_normalise_values, database)
+    migrator.run(_drop_duplicates, database)
+    migrator.run(_change_types, database)
+    for statement in INDEXES:
+        migrator.sql(statement)
+
+
+def rollback(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your rollback migrations here."""
+    for name in ("payslip_national_code", "payslip_chat_id", "payslip_national_code_id_desc",
+                 "payslip_national_code_year_month"):
+        migrator.sql(f'DROP INDEX IF EXISTS "{name}"')
+    migrator.run(_revert_types, database)
@@ -0,0 +1,36 @@
+"""Peewee migrations -- 003_outbound_message.
+
+Durable outbound queue for the Bale dispatcher.
+"""
+
+import datetime as dt
+
+import peewee as pw
+from peewee_migrate import Migrator
+
+
+def migrate(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your migrations here."""
+
+    @migrator.create_model
+    class OutboundMessage(pw.Model):
+        id = pw.AutoField()
+        chat_id = pw.CharField(max_length=255)
+        kind = pw.CharField(max_length=255)
+        text = pw.TextField(null=True)
+        file_path = pw.CharField(max_length=255, null=True)
+        status = pw.CharField(max_length=255, default="pending")
+        attempts = pw.IntegerField(default=0)
+        next_attempt_at = pw.DateTimeField(default=dt.datetime.now)
+        last_error = pw.TextField(null=True)
+        created_at = pw.DateTimeField(default=dt.datetime.now)
+        sent_at = pw.DateTimeField(null=True)
+
+        class Meta:
+            table_name = "outboundmessage"
+            indexes = [(("status", "next_attempt_at"), False)]
+
+
+def rollback(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your rollback migrations here."""
+    migrator.remove_model("outboundmessage")
@@ -0,0 +1,27 @@
+"""Peewee migrations -- 004_uploaded_file.
+
+Cache of Bale file_ids for uploaded PDFs, keyed by content hash.
+"""
+
+import datetime as dt
+
+import peewee as pw
+from peewee_migrate import Migrator
+
+
+def migrate(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your migrations here."""
+
+    @migrator.create_model
+    class UploadedFile(pw.Model):
+        sha256 = pw.CharField(max_length=255, primary_key=True)
+        file_id = pw.CharField(max_length=255)
+        uploaded_at = pw.DateTimeField(default=dt.datetime.now)
+
+        class Meta:
+            table_name = "uploadedfile"
+
+
+def rollback(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your rollback migrations here."""
+    migrator.remove_model("uploadedfile")
@@ -0,0 +1,37 @@
+"""Peewee migrations -- 005_broadcast_delivery.
+
+Per-recipient progress of the monthly broadcast.
+"""
+
+import datetime as dt
+
+import peewee as pw
+from peewee_migrate import Migrator
+
+
+def migrate(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your migrations here."""
+
+    @migrator.create_model
+    class BroadcastDelivery(pw.Model):
+        id = pw.AutoField()
+        payslip_id = pw.IntegerField()
+        chat_id = pw.CharField(max_length=255)
+        year = pw.IntegerField()
+        month = pw.IntegerField()
+        status = pw.CharField(max_length=255)
+        attempts = pw.IntegerField(default=0)
+        last_error = pw.TextField(null=True)
+        updated_at = pw.DateTimeField(default=dt.datetime.now)
+
+        class Meta:
+            table_name = "broadcastdelivery"
+            indexes = [
+                (("payslip_id", "chat_id"), True),
+                (("year", "month", "status"), False),
+            ]
+
+
+def rollback(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your rollback migrations here."""
+    migrator.remove_model("broadcastdelivery")
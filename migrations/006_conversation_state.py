@@ -0,0 +1,25 @@
+"""Peewee migrations -- 006_conversation_state.
+
+Registration conversation state shared by bot processes.
+"""
+
+import peewee as pw
+from peewee_migrate import Migrator
+
+
+def migrate(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your migrations here."""
+
+    @migrator.create_model
+    class ConversationState(pw.Model):
+        chat_id = pw.CharField(max_length=255, primary_key=True)
+        state = pw.TextField()
+        expires_at = pw.DateTimeField(index=True)
+
+        class Meta:
+            table_name = "conversationstate"
+
+
+def rollback(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your rollback migrations here."""
+    migrator.remove_model("conversationstate")
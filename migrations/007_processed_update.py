@@ -0,0 +1,26 @@
+"""Peewee migrations -- 007_processed_update.
+
+update_ids handled by the webhook, so redelivered updates are processed once.
+"""
+
+import datetime as dt
+
+import peewee as pw
+from peewee_migrate import Migrator
+
+
+def migrate(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your migrations here."""
+
+    @migrator.create_model
+    class ProcessedUpdate(pw.Model):
+        update_id = pw.BigIntegerField(primary_key=True)
+        received_at = pw.DateTimeField(default=dt.datetime.now, index=True)
+
+        class Meta:
+            table_name = "processedupdate"
+
+
+def rollback(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your rollback migrations here."""
+    migrator.remove_model("processedupdate")
@@ -0,0 +1,18 @@
+"""Peewee migrations -- 008_outbound_chat_index.
+
+Index the outbound queue by chat, so the dispatcher can check cheaply whether a
+chat still has an older unsent row.
+"""
+
+import peewee as pw
+from peewee_migrate import Migrator
+
+
+def migrate(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your migrations here."""
+    migrator.sql('CREATE INDEX IF NOT EXISTS "outboundmessage_chat_id_id" ON "outboundmessage" ("chat_id", "id")')
+
+
+def rollback(migrator: Migrator, database: pw.Database, *, fake=False):
+    """Write your rollback migrations here."""
+    migrator.sql('DROP INDEX IF EXISTS "outboundmessage_chat_id_id"')
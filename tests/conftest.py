@@ -0,0 +1,44 @@
+import sys
+import os
+import tempfile
+
+import pytest
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+# Tests run against SQLite; the `db` fixture gives each test its own file.
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "payslips.db")
+# Keep the extractor's text cache out of the working tree.
+os.environ["TEXT_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "text_cache.sqlite")
+# Likewise the content-addressed PDF store.
+os.environ["PDF_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "pdf_store")
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Point the Payslip model at a throwaway SQLite database."""
+    from peewee import SqliteDatabase
+    from app import db_export
+
+    test_db = SqliteDatabase(str(tmp_path / "payslips.db"))
+    monkeypatch.setattr(db_export, "database", test_db)
+    with test_db.bind_ctx(db_export.MODELS):
+        test_db.create_tables(db_export.MODELS)
+        test_db.close()
+        yield test_db
+    test_db.close()
+
+
+@pytest.fixture
+def bale_stub(monkeypatch):
+    """A local Bale Bot API stub that bale_api talks to for the duration of the test."""
+    from app import bale_api
+    from app.bale_stub import BaleStubServer
+
+    with BaleStubServer() as server:
+        monkeypatch.setattr(bale_api, "BASE_URL", server.base_url)
+        yield server
@@ -0,0 +1,102 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+from app import bale_api
+from app.async_bot import AsyncBot
+from app.bale_stub import BaleStubServer
+
+
+def test_updates_run_concurrently_across_chats_and_in_order_per_chat(monkeypatch):
+    seen = []
+    running = {}
+    peaks = {"total": 0, "per_chat": 0}
+    lock = threading.Lock()
+
+    def handle(update):
+        message = update["message"]
+        chat_id = message["chat"]["id"]
+        with lock:
+            running[chat_id] = running.get(chat_id, 0) + 1
+            peaks["total"] = max(peaks["total"], sum(running.values()))
+            peaks["per_chat"] = max(peaks["per_chat"], running[chat_id])
+        time.sleep(0.05)
+        with lock:
+            running[chat_id] -= 1
+            seen.append((chat_id, message["text"]))
+        bale_api.send_message(chat_id, "ack " + message["text"])
+
+    with BaleStubServer() as stub:
+        monkeypatch.setattr(bale_api, "BASE_URL", stub.base_url)
+        for i in range(3):
+            for chat_id in (1, 2, 3, 4):
+                stub.push_message(chat_id, f"{chat_id}-{i}")
+
+        bot = AsyncBot(handle, max_in_flight=8, poll_timeout=1)
+        thread = threading.Thread(target=asyncio.run, args=(bot.run(),))
+        thread.start()
+        replies = stub.wait_for_calls("sendMessage", 12)
+        bot.stop()
+        thread.join(5)
+
+    assert len(replies) == 12 and bot.handled == 12 and bot.failed == 0
+    for chat_id in (1, 2, 3, 4):
+        assert [text for chat, text in seen if chat == chat_id] == [f"{chat_id}-{i}" for i in range(3)]
+    # Different chats overlap; one chat's updates never do.
+    assert peaks["total"] > 1
+    assert peaks["per_chat"] == 1
+
+
+def test_error_replies_from_get_updates_back_off(monkeypatch):
+    calls = []
+    first_call = threading.Event()
+
+    def get_updates(offset=None, timeout=20):
+        calls.append(offset)
+        first_call.set()
+        return {"ok": False, "error_code": 401, "description": "Unauthorized"}
+
+    monkeypatch.setattr(bale_api, "get_updates", get_updates)
+    bot = AsyncBot(lambda update: None, poll_timeout=1)
+    thread = threading.Thread(target=asyncio.run, args=(bot.run(),))
+    thread.start()
+    assert first_call.wait(5)
+    time.sleep(0.2)
+    bot.stop()
+    thread.join(5)
+
+    # The first retry waits a second; a reply treated as success would have polled again at once.
+    assert len(calls) == 1
+    assert not thread.is_alive()
+
+
+def test_failing_handler_does_not_stop_the_chat(monkeypatch):
+    handled = []
+
+    def handle(update):
+        if update["message"]["text"] == "boom":
+            raise RuntimeError("boom")
+        handled.append(update["message"]["text"])
+        bale_api.send_message(1, "ok")
+
+    with BaleStubServer() as stub:
+        monkeypatch.setattr(bale_api, "BASE_URL", stub.base_url)
+        stub.push_message(1, "boom")
+        stub.push_message(1, "after")
+
+        bot = AsyncBot(handle, max_in_flight=1, poll_timeout=1)
+        thread = threading.Thread(target=asyncio.run, args=(bot.run(),))
+        thread.start()
+        stub.wait_for_calls("sendMessage", 1)
+        bot.stop()
+        thread.join(5)
+
+    assert handled == ["after"]
+    assert bot.failed == 1
@@ -0,0 +1,31 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import json
+
+import benchmarks.__main__ as runner
+
+
+def test_suite_writes_json_and_flags_regressions(tmp_path, monkeypatch):
+    monkeypatch.setitem(runner.SCALES, "small", {"payslips": 20, "files": 4, "users": 3, "records": 50, "employees": 50,
+                                                 "repeats": 1})
+    output = tmp_path / "results.json"
+
+    assert runner.main(["--output", str(output), "--workers", "1"]) == 0
+    results = json.loads(output.read_text())
+    assert set(results["benchmarks"]) == {"extractor", "extractor_files", "ingest", "bot", "storage", "lookup", "startup"}
+    assert results["benchmarks"]["ingest"]["rows"] == 4
+    assert results["benchmarks"]["bot"]["payslips_sent"] == 6
+    assert "fitz" not in results["benchmarks"]["startup"]["bot_heavy_imports"]
+
+    # A baseline ten times faster makes this run a regression.
+    baseline = json.loads(output.read_text())
+    baseline["benchmarks"]["storage"]["append_us"] /= 10
+    assert runner.compare(results, baseline, tolerance=0.25) == [
+        ("storage", "append_us", baseline["benchmarks"]["storage"]["append_us"], results["benchmarks"]["storage"]["append_us"]),
+    ]
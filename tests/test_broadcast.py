@@ -0,0 +1,92 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import pytest
+
+from app import dispatcher as dispatcher_module
+from app.broadcast import Broadcast
+from app.db_export import BroadcastDelivery, Payslip, save_many
+
+
+@pytest.fixture
+def stub(db, bale_stub, monkeypatch):
+    monkeypatch.setattr(dispatcher_module, "DISPATCH_BACKOFF_BASE", 0.01)
+    return bale_stub
+
+
+def _payslips(tmp_path, count, chat_every=1, month=1):
+    for i in range(count):
+        pdf = tmp_path / f"{month}-{i}.pdf"
+        pdf.write_bytes(b"%PDF-1.4 " + str(i).encode())
+        Payslip.create(national_code=f"{i:010d}", year=1403, month=month, name=f"n{i}",
+                       pdf_path=str(pdf), chat_id=str(100 + i) if i % chat_every == 0 else None)
+
+
+def _broadcast(**kwargs):
+    kwargs.setdefault("rate", 1000)
+    kwargs.setdefault("batch_size", 3)
+    return Broadcast(1403, 1, concurrency=4, **kwargs)
+
+
+def test_sends_each_registered_payslip_once(stub, tmp_path):
+    _payslips(tmp_path, 10, chat_every=2)
+    _payslips(tmp_path, 2, month=2)
+
+    report = _broadcast().run()
+    assert (report.total, report.sent, report.failed) == (5, 5, 0)
+
+    summaries = sorted(c["params"]["chat_id"] for c in stub.calls("sendMessage"))
+    documents = sorted(c["params"]["chat_id"] for c in stub.calls("sendDocument"))
+    assert summaries == documents == sorted(str(100 + i) for i in range(0, 10, 2))
+    assert BroadcastDelivery.select().where(BroadcastDelivery.status == "sent").count() == 5
+
+    # Running the month again sends nothing.
+    assert _broadcast().run().total == 0
+    assert len(stub.calls("sendMessage")) == 5
+
+
+def test_months_ingested_after_registration_reach_the_chat(stub, tmp_path):
+    save_many([{"national_code": "0000000042", "year": "1403", "month": "11"}])
+    Payslip.update(chat_id="42").execute()  # What registration does
+
+    pdf = tmp_path / "12.pdf"
+    pdf.write_bytes(b"%PDF-1.4 12")
+    save_many([{"national_code": "0000000042", "year": "1403", "month": "12", "pdf_path": str(pdf)}])
+
+    assert [(p.month, p.chat_id) for p in Payslip.select().order_by(Payslip.month)] == [(11, "42"), (12, "42")]
+    assert Broadcast(1403, 12).pending_count() == 1
+    assert Broadcast(1403, 12, rate=1000).run().sent == 1
+    assert [c["params"]["chat_id"] for c in stub.calls("sendDocument")] == ["42"]
+
+
+def test_interrupted_broadcast_resumes_without_repeating_summaries(stub, tmp_path):
+    _payslips(tmp_path, 4)
+    missing = Payslip.get(Payslip.national_code == "0000000003")
+    os.remove(missing.pdf_path)
+
+    report = _broadcast(max_attempts=1).run()
+    assert (report.sent, report.failed) == (3, 1)
+    assert BroadcastDelivery.get(BroadcastDelivery.payslip_id == missing.id).status == "summary"
+
+    with open(missing.pdf_path, "wb") as file:
+        file.write(b"%PDF-1.4 restored")
+    report = _broadcast().run()
+    assert (report.total, report.sent) == (1, 1)
+
+    summaries = [c["params"]["chat_id"] for c in stub.calls("sendMessage")]
+    assert summaries.count(missing.chat_id) == 1
+    assert len(stub.calls("sendDocument")) == 4
+
+
+def test_retryable_errors_are_retried(stub, tmp_path):
+    _payslips(tmp_path, 2)
+    stub.fail_next("sendMessage", status=429, times=2, retry_after=0)
+
+    report = _broadcast(max_attempts=3).run()
+    assert (report.sent, report.failed) == (2, 0)
+    assert sum(d.attempts for d in BroadcastDelivery.select()) == 6
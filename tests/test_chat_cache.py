@@ -0,0 +1,77 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import handlers
+from app.chat_cache import CachedChat, ChatCache
+from app.db_export import Payslip
+
+
+@pytest.fixture
+def stub(db, bale_stub, monkeypatch):
+    monkeypatch.setattr(handlers, "chat_cache", ChatCache())
+    monkeypatch.setattr(handlers, "dispatcher", None)
+    return bale_stub
+
+
+def _getpayslip(chat_id=7):
+    handlers.handle_update({"update_id": 1, "message": {"chat": {"id": chat_id}, "text": "/getpayslip"}})
+
+
+def test_lru_eviction_and_invalidation():
+    cache = ChatCache(max_entries=2)
+    cache.put(1, CachedChat("0000000001", 10, None))
+    cache.put(2, CachedChat("0000000002", 20, None))
+    assert cache.get(1).payslip_id == 10
+    cache.put(3, CachedChat("0000000002", 30, None))
+    assert cache.get(2) is None and cache.evictions == 1
+
+    cache.invalidate_national_codes(["0000000002"])
+    assert cache.get(3) is None
+    assert cache.get("1") is not None
+    assert cache.snapshot()["hit_rate"] == 0.5
+
+
+def test_cooldown_is_answered_from_the_cache(stub, tmp_path):
+    pdf = tmp_path / "payslip.pdf"
+    pdf.write_bytes(b"%PDF-1.4 payslip")
+    Payslip.create(national_code="0012345678", year=1403, month=11, pdf_path=str(pdf), chat_id="7")
+
+    _getpayslip()
+    assert len(stub.calls("sendDocument")) == 1
+    assert Payslip.get().last_request_at is not None
+
+    Payslip.update(last_request_at=None).execute()  # Only the cache knows about the cooldown now.
+    _getpayslip()
+    assert len(stub.calls("sendDocument")) == 1
+    assert handlers.chat_cache.hits == 1
+
+
+def test_ingestion_invalidates_the_latest_payslip(stub, tmp_path):
+    from app import ingester
+
+    old, new = tmp_path / "old.pdf", tmp_path / "new.pdf"
+    old.write_bytes(b"%PDF-1.4 old")
+    new.write_bytes(b"%PDF-1.4 new")
+    Payslip.create(national_code="0012345678", year=1403, month=10, pdf_path=str(old), chat_id="7",
+                   last_request_at=datetime.now() - timedelta(days=30))
+    _getpayslip()
+    assert len(handlers.chat_cache) == 1
+
+    ingester.store_payslips([(str(new), {"national_code": "0012345678", "year": "1403", "month": "11"})])
+    assert len(handlers.chat_cache) == 0
+
+    assert Payslip.get(Payslip.month == 11).chat_id == "7"
+    Payslip.update(last_request_at=datetime.now() - timedelta(days=30)).execute()
+    _getpayslip()
+    uploads = stub.calls("sendDocument")
+    assert len(uploads) == 2
+    assert handlers.chat_cache.get(7).payslip_id == Payslip.get(Payslip.month == 11).id
@@ -0,0 +1,65 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+from app.db_export import Payslip, registered_chat_ids, save_many
+
+
+def _row(national_code, month="ﺑﻬﻤﻦ", **extra):
+    return {"national_code": national_code, "year": "1403", "month": month, **extra}
+
+
+def test_save_many_upserts_on_natural_key(db):
+    assert save_many([_row("0000000001", net_payment="100"), _row("0000000002")], batch_size=1) == 2
+    Payslip.update(chat_id="42").where(Payslip.national_code == "0000000001").execute()
+
+    # Re-ingesting the same month updates in place, keeps the chat and dedups within the batch;
+    # a new month inherits the chat the employee registered.
+    save_many([
+        _row("0000000001", net_payment="150"),
+        _row("0000000001", net_payment="200", pdf_path="/x.pdf"),
+        _row("0000000001", month="ﺍﺳﻔﻨﺪ"),
+    ])
+    rows = list(Payslip.select().where(Payslip.national_code == "0000000001").order_by(Payslip.id))
+    assert [(r.month, r.net_payment, r.chat_id) for r in rows] == [(11, 200, "42"), (12, None, "42")]
+    assert rows[0].pdf_path == "/x.pdf"
+    assert Payslip.select().count() == 3
+
+
+def test_registered_chat_ids_resolves_batch_in_one_query(db):
+    save_many([_row("0000000001"), _row("0000000002"), _row("0000000003")])
+    Payslip.update(chat_id="7").where(Payslip.national_code == "0000000002").execute()
+
+    queries = []
+    original_execute_sql = db.execute_sql
+    db.execute_sql = lambda sql, *args, **kwargs: queries.append(sql) or original_execute_sql(sql, *args, **kwargs)
+    assert registered_chat_ids(["0000000001", "0000000002", None, "0000000003"]) == {"0000000002": "7"}
+    assert len(queries) == 1
+
+
+def test_unit_of_work_returns_connection_and_nests(db):
+    from app.db_export import unit_of_work
+
+    assert db.is_closed()
+    with unit_of_work():
+        with unit_of_work():
+            Payslip.select().count()
+        assert not db.is_closed()
+    assert db.is_closed()
+
+
+def test_postgres_backend_is_a_reconnecting_pool(monkeypatch):
+    from app import db_export
+
+    monkeypatch.setattr(db_export, "DB_BACKEND", "postgres")
+    for var in ("DB_NAME", "DB_USER", "DB_PASSWORD", "DB_HOST"):
+        monkeypatch.setattr(db_export, var, "test")
+    monkeypatch.setattr(db_export, "DB_MAX_CONNECTIONS", 3)
+    database = db_export.make_database()
+    assert isinstance(database, db_export.ReconnectingPooledPostgresqlDatabase)
+    assert database._max_connections == 3
+    assert database._stale_timeout == db_export.DB_STALE_TIMEOUT
@@ -0,0 +1,124 @@
+import sys
+import os
+import time
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import pytest
+
+from app import dispatcher as dispatcher_module
+from app.db_export import OutboundMessage
+from app.dispatcher import Dispatcher, enqueue_message
+from app.utils import TokenBucket
+
+
+@pytest.fixture
+def stub(db, bale_stub, monkeypatch):
+    monkeypatch.setattr(dispatcher_module, "DISPATCH_BACKOFF_BASE", 0.01)
+    return bale_stub
+
+
+def _wait_until_settled(timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not OutboundMessage.select().where(OutboundMessage.status.in_(["pending", "sending"])).exists():
+            return
+        time.sleep(0.02)
+    raise AssertionError("queue did not drain")
+
+
+def test_delivers_queue_in_order_per_chat(stub, tmp_path):
+    pdf = tmp_path / "payslip.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    dispatcher = Dispatcher(workers=4, rate=1000, chat_rate=1000, chat_burst=1000, poll_interval=0.01).start()
+    for i in range(5):
+        for chat_id in (1, 2, 3):
+            dispatcher.enqueue_message(chat_id, f"{chat_id}-{i}")
+    dispatcher.enqueue_document(1, str(pdf), caption="doc")
+    _wait_until_settled()
+    dispatcher.stop()
+
+    messages = stub.calls("sendMessage")
+    for chat_id in (1, 2, 3):
+        assert [c["params"]["text"] for c in messages if c["params"]["chat_id"] == str(chat_id)] == [
+            f"{chat_id}-{i}" for i in range(5)
+        ]
+    document = stub.calls("sendDocument")[0]
+    assert document["params"]["caption"] == "doc"
+    assert document["params"]["document"]["size"] == 8
+    assert dispatcher.metrics.snapshot()["sent"] == 16
+    assert dispatcher.metrics.snapshot()["queue_depth"] == 0
+
+
+def test_a_throttled_summary_is_not_overtaken_by_its_pdf(stub, tmp_path):
+    pdf = tmp_path / "payslip.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    stub.fail_next("sendMessage", 429, retry_after=1)
+    dispatcher = Dispatcher(workers=4, rate=1000, chat_rate=1000, chat_burst=1000, poll_interval=0.01)
+    dispatcher.enqueue_message(1, "summary")
+    dispatcher.enqueue_document(1, str(pdf), caption="doc")
+    dispatcher.enqueue_message(2, "other chat")
+    dispatcher.start()
+    _wait_until_settled()
+    dispatcher.stop()
+
+    assert [(c["method"], c["params"]["chat_id"]) for c in stub.calls() if c["params"]["chat_id"] == "1"] == [
+        ("sendMessage", "1"), ("sendDocument", "1"),
+    ]
+    assert dispatcher.metrics.snapshot()["retried"] == 1
+    assert len(stub.calls()) == 3
+
+
+def test_retries_throttling_and_server_errors_but_not_client_errors(stub):
+    stub.fail_next("sendMessage", 429, retry_after=0)
+    stub.fail_next("sendMessage", 500, times=2)
+    dispatcher = Dispatcher(workers=1, rate=1000, chat_rate=1000, chat_burst=1000, poll_interval=0.01).start()
+    ok = dispatcher.enqueue_message(1, "eventually")
+    _wait_until_settled()
+
+    stub.fail_next("sendMessage", 400)
+    bad = dispatcher.enqueue_message(1, "rejected")
+    _wait_until_settled()
+    dispatcher.stop()
+
+    assert OutboundMessage.get_by_id(ok).status == "sent"
+    assert OutboundMessage.get_by_id(ok).attempts == 4
+    assert OutboundMessage.get_by_id(bad).status == "failed"
+    assert "400" in OutboundMessage.get_by_id(bad).last_error
+    metrics = dispatcher.metrics.snapshot()
+    assert (metrics["sent"], metrics["retried"], metrics["failed"]) == (1, 3, 1)
+
+
+def test_gives_up_after_max_attempts(stub):
+    stub.fail_next("sendMessage", 503, times=3)
+    dispatcher = Dispatcher(workers=1, rate=1000, max_attempts=3, poll_interval=0.01).start()
+    job_id = dispatcher.enqueue_message(1, "never")
+    _wait_until_settled()
+    dispatcher.stop()
+    assert OutboundMessage.get_by_id(job_id).status == "failed"
+    assert stub.calls("sendMessage") == []
+
+
+def test_pending_and_interrupted_rows_survive_a_restart(stub):
+    queued = enqueue_message(5, "queued before start")
+    interrupted = OutboundMessage.create(chat_id="6", kind="message", text="was sending", status="sending").id
+
+    dispatcher = Dispatcher(workers=2, rate=1000, poll_interval=0.01).start()
+    _wait_until_settled()
+    dispatcher.stop()
+    assert {c["params"]["text"] for c in stub.calls("sendMessage")} == {"queued before start", "was sending"}
+    assert OutboundMessage.get_by_id(queued).status == "sent"
+    assert OutboundMessage.get_by_id(interrupted).status == "sent"
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=100, capacity=5)
+    started = time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    # 5 from the burst, 10 more at 100/s.
+    assert time.monotonic() - started >= 0.09
+    assert bucket.try_acquire() > 0
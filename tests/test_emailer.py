@@ -0,0 +1,140 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import socket
+import subprocess
+import threading
+from email import message_from_bytes, policy
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app.emailer import BulkMailer
+
+
+class RecordingHandler:
+    """aiosmtpd handler that records messages and can answer with scripted errors."""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = 0
+        self.replies = []  # Returned for the next DATA commands, in order
+        self.lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self.lock:
+            self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        with self.lock:
+            if self.replies:
+                return self.replies.pop(0)
+            self.messages.append(envelope)
+        return "250 Message accepted"
+
+
+@pytest.fixture
+def smtp():
+    handler = RecordingHandler()
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        yield handler, port
+    finally:
+        controller.stop()
+
+
+def _jobs(tmp_path, count, prefix="user"):
+    for i in range(count):
+        pdf = tmp_path / f"{i}.pdf"
+        pdf.write_bytes(b"%PDF-1.4 " + str(i).encode())
+        yield f"{prefix}{i}@example.com", str(pdf)
+
+
+def _mailer(port, **kwargs):
+    kwargs.setdefault("rate", 1000)
+    return BulkMailer("127.0.0.1", port, "hr@example.com", password="", starttls=False, **kwargs)
+
+
+def test_sessions_are_reused_across_messages(smtp, tmp_path):
+    handler, port = smtp
+    report = _mailer(port, connections=2).send_all(_jobs(tmp_path, 20))
+
+    assert sorted(report.sent) == sorted(f"user{i}@example.com" for i in range(20))
+    assert report.failed == []
+    assert report.connections == 2
+    assert handler.sessions == 2
+    assert len(handler.messages) == 20
+
+    attachment = next(message_from_bytes(handler.messages[0].content, policy=policy.default).iter_attachments())
+    assert attachment.get_content_type() == "application/pdf"
+
+
+def test_transient_errors_are_retried(smtp, tmp_path):
+    handler, port = smtp
+    handler.replies = ["421 Service shutting down", "451 Try again later"]
+    report = _mailer(port, connections=1).send_all(_jobs(tmp_path, 3))
+
+    assert len(report.sent) == 3
+    assert report.failed == []
+    assert report.attempts == 5
+    # The 421 closes the session, so the mailer had to log in again.
+    assert report.connections == 2
+
+
+def test_permanent_failures_do_not_stop_the_batch(smtp, tmp_path):
+    handler, port = smtp
+    jobs = list(_jobs(tmp_path, 2)) + list(_jobs(tmp_path, 1, prefix="bounce"))
+    handler.replies = ["554 Transaction failed"]
+    report = _mailer(port, connections=1, max_attempts=3).send_all(iter(jobs))
+
+    failed = {recipient for recipient, _, _ in report.failed}
+    assert failed == {"user0@example.com", "bounce0@example.com"}
+    assert report.sent == ["user1@example.com"]
+
+
+def test_unreadable_pdfs_fail_their_recipient_but_not_the_workers(smtp, tmp_path):
+    handler, port = smtp
+    # More missing files than workers and queue slots; a dead worker would hang send_all.
+    missing = [(f"gone{i}@example.com", str(tmp_path / f"gone{i}.pdf")) for i in range(6)]
+    jobs = missing + list(_jobs(tmp_path, 2))
+    report = _mailer(port, connections=2).send_all(iter(jobs))
+
+    assert sorted(recipient for recipient, _, _ in report.failed) == [f"gone{i}@example.com" for i in range(6)]
+    assert all(error.startswith("FileNotFoundError") for _, _, error in report.failed)
+    assert sorted(report.sent) == ["user0@example.com", "user1@example.com"]
+    assert len(handler.messages) == 2
+
+
+def test_rate_limit_spaces_out_sends(smtp, tmp_path):
+    _, port = smtp
+    report = _mailer(port, connections=4, rate=20).send_all(_jobs(tmp_path, 30))
+
+    assert len(report.sent) == 30
+    # The bucket starts full (one second of tokens), then refills at 20/s.
+    assert report.elapsed >= 0.4
+
+
+def test_imports_without_database_settings(tmp_path):
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("DB_", "SQLITE_"))}
+    env["PYTHONPATH"] = project_root
+    # Run from an empty directory so no .env supplies the settings either.
+    result = subprocess.run([sys.executable, "-c", "import app.emailer"], cwd=tmp_path, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
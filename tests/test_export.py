@@ -0,0 +1,61 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import csv
+import json
+
+from openpyxl import load_workbook
+
+from app import export
+from app.db_export import Payslip, save_many
+
+
+def _payslips():
+    save_many([
+        {"national_code": f"{i:010d}", "year": "1403", "month": month, "company_name": company,
+         "total_salary": str(1000 * (i + 1)), "total_deductions": "100", "net_payment": str(1000 * (i + 1) - 100),
+         "standard_working_days": "30", "chat_id": "secret"}
+        for i in range(5) for month, company in (("بهمن", "A"), ("اسفند", "B"))
+    ])
+    Payslip.create(national_code="0099999999", year=1403, month=11, company_name="A")  # No amounts parsed
+
+
+def test_rows_stream_in_pages_to_every_format(db, tmp_path):
+    _payslips()
+
+    output = tmp_path / "bahman.csv"
+    assert export.export_payslips(str(output), year=1403, month=11, batch_size=2) == 6
+    with open(output, encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["national_code"] for row in rows] == [f"{i:010d}" for i in range(5)] + ["0099999999"]
+    assert "chat_id" not in rows[0] and rows[0]["standard_working_days"] == "30"
+
+    output = tmp_path / "company-b.jsonl"
+    assert export.export_payslips(str(output), company="B", batch_size=3) == 5
+    with open(output, encoding="utf-8") as file:
+        assert {json.loads(line)["month"] for line in file} == {12}
+
+    output = tmp_path / "all.xlsx"
+    assert export.export_payslips(str(output)) == 11
+    rows = list(load_workbook(output, read_only=True).active.values)
+    assert len(rows) == 12 and rows[0][0] == "id"
+
+
+def test_totals_per_month_and_company(db, tmp_path):
+    _payslips()
+
+    totals = export.payroll_totals(year=1403)
+    assert [(t.month, t.company_name, t.payslips) for t in totals] == [(11, "A", 6), (12, "B", 5)]
+    assert (totals[0].total_salary, totals[0].total_deductions, totals[0].net_payment) == (15000, 500, 14500)
+
+    output = tmp_path / "totals.csv"
+    assert export.main(["totals", str(output), "--month", "اسفند"]) == 0
+    with open(output, encoding="utf-8") as file:
+        assert list(csv.DictReader(file))[0]["net_payment"] == "14500"
+    assert export.main(["rows", str(tmp_path / "out.txt")]) == 1
+    assert not os.path.exists(tmp_path / "out.txt")
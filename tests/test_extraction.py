@@ -6,17 +6,20 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, ".."))
 sys.path.insert(0, project_root)
 
-from app.extractor import extract_data_from_pdf
-import json
+from app.extractor import PayslipExtractor
+from benchmarks.synthetic import payslip_text, write_payslip_pdf
 
 
-def test_extraction():
-    pdf_path = os.path.join(project_root, "input_files", "واچه تروسیان.pdf")
+def test_extraction(tmp_path):
+    pdf_path = write_payslip_pdf(str(tmp_path / "payslip.pdf"), [42])
 
-    extracted_data = extract_data_from_pdf(pdf_path)
+    extracted_data = PayslipExtractor(debug=False, text_cache=False).extract_to_dict(pdf_path)
 
-    print(json.dumps(extracted_data, ensure_ascii=False, indent=4))
-
-
-if __name__ == "__main__":
-    test_extraction()
+    assert extracted_data["national_code"] == "0000000042"
+    assert extracted_data["personnel_number"] == "10042"
+    assert extracted_data["year"] == "1403"
+    assert extracted_data["month"] == "ﺑﻬﻤﻦ"
+    # Amounts come out without thousands separators, matching the plain-text parse.
+    expected = PayslipExtractor(debug=False, text_cache=False).extract_from_text(payslip_text(42)).to_dict()
+    for field in ("base_salary", "housing_allowance", "total_salary", "total_deductions", "net_payment"):
+        assert extracted_data[field] == expected[field]
@@ -0,0 +1,61 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import fitz
+
+from app.ingest import ingest_pdfs, list_pdfs
+
+
+def _write_pdf(path, lines):
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "\n".join(lines))
+    doc.save(path)
+    doc.close()
+
+
+def _make_input_dir(tmp_path):
+    for i in range(6):
+        _write_pdf(str(tmp_path / f"{i:02d}.pdf"), ["1403", f"Name{i}:", f"Family{i}"])
+    (tmp_path / "03.pdf").write_bytes(b"not a pdf")
+    (tmp_path / "notes.txt").write_text("ignored")
+    return str(tmp_path)
+
+
+def test_parallel_ingestion_matches_serial(tmp_path):
+    input_dir = _make_input_dir(tmp_path)
+    pdf_paths = list_pdfs(input_dir)
+    assert [os.path.basename(p) for p in pdf_paths] == [f"{i:02d}.pdf" for i in range(6)]
+
+    stored = {}
+    for workers in (1, 3):
+        rows = []
+        summary = ingest_pdfs(pdf_paths, rows.extend, workers=workers)
+        stored[workers] = rows
+        assert summary.files == 6
+        assert summary.succeeded == 5
+        assert [os.path.basename(p) for p, _ in summary.errors] == ["03.pdf"]
+        assert summary.files_per_second > 0
+
+    assert stored[1] == stored[3]
+    assert [data["year"] for _, data in stored[3]] == ["1403"] * 5
+    assert stored[3][0][1]["family_name"] == "Family0"
+
+
+def test_store_errors_are_reported_in_order(tmp_path):
+    input_dir = _make_input_dir(tmp_path)
+
+    def store(items):
+        if any(data["name"] == "Name4" for _, data in items):
+            raise ValueError("boom")
+
+    # Batches are [00, 01], [02, 04], [05]; 03 fails extraction.
+    summary = ingest_pdfs(list_pdfs(input_dir), store, workers=2, batch_size=2)
+    assert summary.succeeded == 3
+    assert [os.path.basename(p) for p, _ in summary.errors] == ["02.pdf", "03.pdf", "04.pdf"]
+    assert summary.errors[0][1] == "ValueError: boom"
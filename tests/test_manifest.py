@@ -0,0 +1,69 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+from app.ingest import watch_pdfs
+from app.manifest import IngestManifest
+
+
+def test_manifest_skips_ingested_content(tmp_path):
+    manifest_path = str(tmp_path / "manifest.jsonl")
+    a = tmp_path / "a.pdf"
+    b = tmp_path / "b.pdf"
+    a.write_bytes(b"%PDF-a")
+    b.write_bytes(b"%PDF-b")
+
+    manifest = IngestManifest(manifest_path)
+    assert manifest.pending([str(a), str(b)]) == [str(a), str(b)]
+    manifest.record(str(a))
+
+    reloaded = IngestManifest(manifest_path)
+    assert len(reloaded) == 1
+    assert reloaded.pending([str(a), str(b)]) == [str(b)]
+
+    # Same bytes under another name are not ingested twice.
+    copy = tmp_path / "copy-of-a.pdf"
+    copy.write_bytes(b"%PDF-a")
+    assert reloaded.pending([str(copy)]) == []
+
+    # Changed content is picked up again.
+    a.write_bytes(b"%PDF-a2")
+    assert reloaded.pending([str(a)]) == [str(a)]
+
+
+def test_manifest_dedups_within_a_batch_and_survives_torn_line(tmp_path):
+    manifest_path = tmp_path / "manifest.jsonl"
+    for name in ("x.pdf", "y.pdf"):
+        (tmp_path / name).write_bytes(b"%PDF-same")
+
+    manifest = IngestManifest(str(manifest_path))
+    assert manifest.pending([str(tmp_path / "x.pdf"), str(tmp_path / "y.pdf")]) == [str(tmp_path / "x.pdf")]
+    manifest.record(str(tmp_path / "x.pdf"))
+
+    with open(manifest_path, "a") as file:
+        file.write('{"path": "torn')
+    manifest = IngestManifest(str(manifest_path))
+    (tmp_path / "z.pdf").write_bytes(b"%PDF-z")
+    manifest.record(str(tmp_path / "z.pdf"))
+    assert len(IngestManifest(str(manifest_path))) == 2
+
+
+def test_watch_pdfs_yields_existing_then_new_files(tmp_path):
+    (tmp_path / "old.pdf").write_bytes(b"%PDF-old")
+    watcher = watch_pdfs(str(tmp_path), interval=0.01)
+    assert next(watcher) == [str(tmp_path / "old.pdf")]
+
+    (tmp_path / "new.pdf").write_bytes(b"%PDF-new")
+    (tmp_path / "ignored.txt").write_text("x")
+    assert next(watcher) == [str(tmp_path / "new.pdf")]
+
+    # Rewriting a file in place leaves the directory's mtime alone but is still picked up.
+    dir_mtime = os.stat(tmp_path).st_mtime_ns
+    with open(tmp_path / "old.pdf", "r+b") as file:
+        file.write(b"%PDF-edited")
+    assert os.stat(tmp_path).st_mtime_ns == dir_mtime
+    assert next(watcher) == [str(tmp_path / "old.pdf")]
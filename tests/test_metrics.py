@@ -0,0 +1,107 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import time
+
+import fitz
+
+from app import bale_api, bot, metrics
+from app.bale_stub import BaleStubServer
+from app.bot import UpdatePool
+from app.extractor import PayslipExtractor
+from app.ingest import ingest_pdfs
+from app.metrics import Registry
+
+
+def _count(name, **labels):
+    series = metrics.REGISTRY.histograms.get(name, {})
+    histogram = series.get(tuple(sorted(labels.items())))
+    return histogram.count if histogram else 0
+
+
+def test_registry_renders_prometheus_text_and_merges_worker_numbers():
+    registry = Registry()
+    for seconds in (0.002, 0.002, 0.2):
+        registry.observe("request_seconds", seconds, method="send")
+    registry.inc("requests_total", method="send", status="200")
+    registry.inc("requests_total", method='say "hi"', status="200")
+    registry.gauge("cache", lambda: {"hit_rate": 0.5})
+
+    worker = Registry()
+    worker.observe("request_seconds", 50, method="send")
+    registry.merge(worker.take())
+    assert worker.histograms == {} and worker.counters == {}
+
+    text = registry.render()
+    assert 'request_seconds_bucket{method="send",le="0.0025"} 2' in text
+    assert 'request_seconds_bucket{method="send",le="0.25"} 3' in text
+    assert 'request_seconds_bucket{method="send",le="+Inf"} 4' in text
+    assert 'request_seconds_count{method="send"} 4' in text
+    assert 'requests_total{method="say \\"hi\\"",status="200"} 1' in text
+    assert "cache_hit_rate 0.5" in text
+    assert registry.summary() == ['request_seconds{method="send"}: n=4 avg=12551.0ms p50<=2.5ms p95<=+Inf']
+
+
+def test_pool_workers_report_their_stage_timings_to_the_parent(tmp_path):
+    for i in range(4):
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), f"1403\nName{i}:\nFamily{i}")
+        doc.save(str(tmp_path / f"{i}.pdf"))
+        doc.close()
+    before = _count("ingest_extract_seconds"), _count("extract_fields_seconds")
+
+    summary = ingest_pdfs(sorted(str(path) for path in tmp_path.iterdir()), lambda items: None, workers=2)
+
+    assert summary.succeeded == 4
+    assert _count("ingest_extract_seconds") - before[0] == 4
+    assert _count("extract_fields_seconds") - before[1] == 4
+
+
+def test_extractor_is_quiet_by_default(capsys):
+    PayslipExtractor(text_cache=False).extract_from_text("1403\nName:\nFamily")
+    assert capsys.readouterr().out == ""
+
+
+def test_metrics_endpoint_reports_bale_round_trips_and_pool_state(monkeypatch):
+    pool = UpdatePool(workers=2)
+    monkeypatch.setattr(bot, "update_pool", lambda: pool)
+    metrics.gauge("webhook", pool.snapshot)
+    with BaleStubServer() as server:
+        monkeypatch.setattr(bale_api, "BASE_URL", server.base_url)
+        before = _count("bale_request_seconds", method="sendMessage")
+        bale_api.send_message(7, "hello")
+
+    assert _count("bale_request_seconds", method="sendMessage") == before + 1
+    response = bot.app.test_client().get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'bale_requests_total{method="sendMessage",status="200"}' in response.get_data(as_text=True)
+    assert "webhook_queued 0" in response.get_data(as_text=True)
+
+
+def test_profiler_is_switched_on_and_off_at_runtime(tmp_path, monkeypatch):
+    client = bot.app.test_client()
+    assert client.post("/debug/profiler?action=start").status_code == 404
+
+    monkeypatch.setattr(bot, "PROFILER_TOKEN", "secret")
+    monkeypatch.setattr(metrics.profiler, "output_dir", str(tmp_path))
+    monkeypatch.setattr(metrics.profiler, "interval", 0.001)
+    assert client.post("/debug/profiler?action=start", headers={"X-Profiler-Token": "wrong"}).status_code == 403
+
+    started = client.post("/debug/profiler?action=start", headers={"X-Profiler-Token": "secret"}).get_json()
+    assert started == {"ok": True, "running": True, "profile": None}
+    deadline = time.monotonic() + 5
+    while not metrics.profiler.samples and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stopped = client.post("/debug/profiler?action=stop", headers={"X-Profiler-Token": "secret"}).get_json()
+
+    assert stopped["running"] is False
+    with open(stopped["profile"], encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("test_profiler_is_switched_on_and_off_at_runtime" in line for line in lines)
@@ -0,0 +1,72 @@
+import sys
+import os
+from decimal import Decimal
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+from peewee import SqliteDatabase
+
+from app import db_export
+from app.db_export import Payslip, migrate_db, save_many
+
+LEGACY_ROWS = [
+    # national_code, year, month, working days, base salary, chat_id
+    ("0012345678", "1403", "ﺑﻬﻤﻦ", "31/00", "100,000", None),
+    ("0012345678", "1403", "بهمن", "30", "120000", "42"),
+    ("0012345678", "1403", "اسفند", "29", "130000", None),
+    ("0099999999", "۱۴۰۳", "ﺑﻬﻤﻦ", "", "n/a", None),
+]
+
+
+def test_migration_converts_legacy_rows_in_place(tmp_path, monkeypatch):
+    database = SqliteDatabase(str(tmp_path / "legacy.db"))
+    database.execute_sql(
+        'CREATE TABLE "payslip" ("id" INTEGER NOT NULL PRIMARY KEY, "national_code" VARCHAR(255), '
+        '"year" VARCHAR(255), "month" VARCHAR(255), "standard_working_days" VARCHAR(255), '
+        '"base_salary" VARCHAR(255), "chat_id" VARCHAR(255))'
+    )
+    for row in LEGACY_ROWS:
+        database.execute_sql(
+            'INSERT INTO "payslip" ("national_code", "year", "month", "standard_working_days", '
+            '"base_salary", "chat_id") VALUES (?, ?, ?, ?, ?, ?)', row
+        )
+    monkeypatch.setattr(db_export, "database", database)
+    migrate_db()
+
+    with database.bind_ctx([Payslip]):
+        rows = [
+            (p.national_code, p.year, p.month, p.standard_working_days, p.base_salary, p.chat_id)
+            for p in Payslip.select().order_by(Payslip.id)
+        ]
+        # Both spellings of Bahman collapse onto the newer row, which keeps the chat_id.
+        assert rows == [
+            ("0012345678", 1403, 11, Decimal("30"), 120000, "42"),
+            ("0012345678", 1403, 12, Decimal("29"), 130000, None),
+            ("0099999999", 1403, 11, None, None, None),
+        ]
+
+        indexes = {index.name for index in database.get_indexes("payslip")}
+        assert {"payslip_national_code", "payslip_chat_id", "payslip_national_code_id_desc"} <= indexes
+
+        # The upsert path works against the migrated table.
+        save_many([{"national_code": "0012345678", "year": "1403", "month": "ﺑﻬﻤﻦ", "base_salary": "1,000"}])
+        assert Payslip.get(Payslip.national_code == "0012345678", Payslip.month == 11).base_salary == 1000
+
+    # Running again is a no-op.
+    migrate_db()
+
+
+def test_rolling_back_the_typed_payslip_migration_drops_its_indexes(tmp_path, monkeypatch):
+    from peewee_migrate import Router
+
+    database = SqliteDatabase(str(tmp_path / "rollback.db"))
+    monkeypatch.setattr(db_export, "database", database)
+    migrate_db()
+    router = Router(database, migrate_dir=db_export.MIGRATIONS_DIR)
+    while router.done[-1] != "001_initial":
+        router.rollback()
+
+    assert {index.name for index in database.get_indexes("payslip")} == set()
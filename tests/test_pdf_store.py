@@ -0,0 +1,119 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import fitz
+import pytest
+
+from app import ingester, manifest, pdf_store
+from app.db_export import OutboundMessage, Payslip
+from app.dispatcher import enqueue_document
+from app.emailer import build_message
+from app.manifest import IngestManifest
+from app.pdf_store import PdfStore
+from app.utils import file_sha256
+from benchmarks.synthetic import write_payslip_pdf
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = PdfStore(str(tmp_path / "store"))
+    monkeypatch.setattr(pdf_store, "_default_store", store)
+    return store
+
+
+def test_identical_files_are_stored_once(store, tmp_path):
+    first = tmp_path / "a.pdf"
+    first.write_bytes(b"%PDF-1.4 same bytes")
+    second = tmp_path / "b.pdf"
+    second.write_bytes(b"%PDF-1.4 same bytes")
+
+    sha256 = file_sha256(str(first))
+    stored = store.put(str(first))
+    assert stored == os.path.join(store.root, sha256[:2], sha256[2:4], f"{sha256}.pdf")
+    assert store.put(str(second)) == stored == store.get(sha256)
+    assert store.put(stored) == stored
+    assert len(list(store.blobs())) == 1
+
+    os.remove(first)  # The input file may go away; the stored copy stays deliverable.
+    assert build_message("hr@example.com", "a@example.com", stored).get_payload()[1].get_filename() == "payslip.pdf"
+
+
+def test_compaction_keeps_the_smaller_copy(tmp_path):
+    source = write_payslip_pdf(str(tmp_path / "payslip.pdf"), [1, 2, 3])
+    bloated = str(tmp_path / "bloated.pdf")
+    with fitz.open(source) as doc:
+        doc.save(bloated, garbage=0, deflate=False, expand=255)
+
+    stored = PdfStore(str(tmp_path / "store"), compact=True).put(bloated)
+    assert os.path.getsize(stored) < os.path.getsize(bloated)
+    with fitz.open(stored) as doc, fitz.open(bloated) as original:
+        assert [page.get_text() for page in doc] == [page.get_text() for page in original]
+
+
+def test_ingest_points_rows_into_the_store_and_gc_drops_orphans(db, store, tmp_path):
+    pdf = tmp_path / "input.pdf"
+    pdf.write_bytes(b"%PDF-1.4 bahman")
+    ingester.store_payslips([(str(pdf), {"national_code": "0012345678", "year": "1403", "month": "11"})])
+    stored = Payslip.get().pdf_path
+    assert stored in store
+
+    legacy = tmp_path / "legacy.pdf"
+    legacy.write_bytes(b"%PDF-1.4 esfand")
+    Payslip.create(national_code="0012345678", year=1403, month=12, pdf_path=str(legacy))
+    assert store.migrate() == 1
+    assert Payslip.get(Payslip.month == 12).pdf_path in store
+
+    (tmp_path / "orphan.pdf").write_bytes(b"%PDF-1.4 nobody")
+    orphan = store.put(str(tmp_path / "orphan.pdf"))
+    assert store.gc().removed == 0  # Still inside the grace period
+    report = store.gc(grace=0)
+    assert (report.kept, report.removed) == (2, 1)
+    assert not os.path.exists(orphan) and os.path.exists(stored)
+
+
+def test_gc_keeps_blobs_that_queued_documents_still_send(db, store, tmp_path):
+    old, new = tmp_path / "old.pdf", tmp_path / "new.pdf"
+    old.write_bytes(b"%PDF-1.4 first run")
+    new.write_bytes(b"%PDF-1.4 corrected")
+    row = {"national_code": "0012345678", "year": "1403", "month": "11"}
+    ingester.store_payslips([(str(old), dict(row))])
+    queued = Payslip.get().pdf_path
+    enqueue_document(7, queued)
+    delivered = tmp_path / "delivered.pdf"
+    delivered.write_bytes(b"%PDF-1.4 delivered")
+    sent = OutboundMessage.create(chat_id="8", kind="document", file_path=store.put(str(delivered)), status="sent")
+
+    # A re-ingest repoints the payslip while the old PDF is still waiting in the queue.
+    ingester.store_payslips([(str(new), dict(row))])
+    assert Payslip.get().pdf_path != queued
+
+    report = store.gc(grace=0)
+    assert os.path.exists(queued) and os.path.exists(Payslip.get().pdf_path)
+    assert not os.path.exists(sent.file_path)
+    assert (report.kept, report.removed) == (2, 1)
+
+
+def test_ingest_hashes_each_new_pdf_once(db, store, tmp_path, monkeypatch):
+    inputs = tmp_path / "input"
+    inputs.mkdir()
+    paths = [write_payslip_pdf(str(inputs / f"{i}.pdf"), [i]) for i in range(3)]
+    hashed = []
+
+    def counting_sha256(path):
+        hashed.append(path)
+        return file_sha256(path)
+
+    monkeypatch.setattr(manifest, "file_sha256", counting_sha256)
+    monkeypatch.setattr(pdf_store, "file_sha256", counting_sha256)
+    monkeypatch.setattr(ingester, "BROADCAST_AFTER_INGEST", False)
+
+    summary = ingester.process_pdfs(paths, IngestManifest(str(tmp_path / "manifest.jsonl")), workers=1)
+
+    assert summary.succeeded == 3
+    assert sorted(hashed) == sorted(paths)
+    assert all(row.pdf_path in store for row in Payslip.select())
@@ -0,0 +1,48 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+from app.extractor import PayslipExtractor, RuleEngine
+
+TEXT = "\n".join([
+    "1403",
+    "ﻋﻠﯽ:",
+    "ﺍﺣﻤﺪﯼ",
+    "ﮐﺪ ﻣﻠﯽ: 12345",
+    "ﮐﺪ ﻣﻠﯽ: 0012345678",
+    "ﺷﻤﺎﺭﻩ ﭘﺮﺳﻨﻠﯽ: 10658",
+    "ﺑﯿﻤﻪ ﺳﻬﻢ ﮐﺎﺭﻣﻨﺪ 7,000,000",
+    "ﺣﻘﻮﻕ ﭘﺎﯾﻪ 100,000,000",
+    "ﺧﺎﻟﺺ ﭘﺮﺩﺍﺧﺘﯽ 120,000,000 ﺭﯾﺎﻝ",
+])
+
+
+def test_fields_take_first_line_with_keyword_and_match():
+    payslip = PayslipExtractor(debug=False)._process_text(TEXT)
+    assert payslip.name == "ﻋﻠﯽ"
+    assert payslip.family_name == "ﺍﺣﻤﺪﯼ"
+    assert payslip.year == "1403"
+    # The first national-code line has no 10-digit number, so the next one is used.
+    assert payslip.national_code == "0012345678"
+    assert payslip.personnel_number == "10658"
+    assert payslip.base_salary == "100000000"
+    assert payslip.net_payment == "120000000"
+    assert payslip.net_payment_text == "ﺭﯾﺎﻝ"
+    assert payslip.month is None
+
+
+def test_overlapping_keywords_dispatch_to_every_rule():
+    # "ﺑﯿﻤﻪ" is contained in "ﺑﯿﻤﻪ ﺳﻬﻢ ﮐﺎﺭﻣﻨﺪ"; one line feeds both rules.
+    engine = RuleEngine()
+    assert engine.fields_on_line("ﺑﯿﻤﻪ ﺳﻬﻢ ﮐﺎﺭﻣﻨﺪ 7,000,000") == {"insurance_number", "employee_insurance"}
+    payslip = PayslipExtractor(debug=False)._process_text(TEXT)
+    assert payslip.insurance_number == "7"
+    assert payslip.employee_insurance == "7000000"
+
+
+def test_empty_text_gives_empty_payslip():
+    assert PayslipExtractor(debug=False)._process_text("").to_dict() == {}
@@ -0,0 +1,51 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import fitz
+
+from app.extractor import PayslipExtractor, iter_page_groups
+from app.splitter import split_pdf
+from benchmarks.synthetic import write_payslip_pdf
+
+
+def test_page_groups_follow_year_lines_across_range_edges(tmp_path):
+    pdf = write_payslip_pdf(str(tmp_path / "combined.pdf"), range(4), pages_per_payslip=2)
+    with fitz.open(pdf) as doc:
+        everything = [(first, last) for first, last, _ in iter_page_groups(doc)]
+        # A range that starts mid-payslip skips the tail and finishes its last payslip past `stop`.
+        middle = [(first, last) for first, last, _ in iter_page_groups(doc, 3, 5)]
+    assert everything == [(0, 1), (2, 3), (4, 5), (6, 7)]
+    assert middle == [(4, 5)]
+
+
+def test_iter_payslips_yields_one_record_per_employee(tmp_path):
+    pdf = write_payslip_pdf(str(tmp_path / "combined.pdf"), [7, 8, 9], pages_per_payslip=2)
+    payslips = list(PayslipExtractor(debug=False).iter_payslips(pdf))
+    assert [(first, last, data.national_code, data.year) for first, last, data in payslips] == [
+        (0, 1, "0000000007", "1403"),
+        (2, 3, "0000000008", "1403"),
+        (4, 5, "0000000009", "1403"),
+    ]
+
+
+def test_split_pdf_writes_one_file_per_employee_in_parallel(tmp_path):
+    pdf = write_payslip_pdf(str(tmp_path / "combined.pdf"), range(6), pages_per_payslip=2)
+    out = tmp_path / "split"
+
+    serial = list(split_pdf(pdf, str(out / "serial"), workers=1, pages_per_task=3))
+    parallel = list(split_pdf(pdf, str(out / "parallel"), workers=3, pages_per_task=3))
+
+    assert [p.data["national_code"] for p in parallel] == [f"{i:010d}" for i in range(6)]
+    assert [(p.first_page, p.last_page, p.data) for p in parallel] == [
+        (p.first_page, p.last_page, p.data) for p in serial
+    ]
+    for payslip in parallel:
+        assert os.path.basename(payslip.pdf_path).endswith(f"_{payslip.data['national_code']}.pdf")
+        with fitz.open(payslip.pdf_path) as doc:
+            assert doc.page_count == 2
+            assert payslip.data["national_code"] in doc[0].get_text()
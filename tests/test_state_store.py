@@ -0,0 +1,110 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import state_store
+from app.db_export import ConversationState
+from app.state_store import DatabaseStateStore, MemoryStateStore, StateStore, make_state_store
+
+
+def test_memory_store_drops_least_recently_used_past_the_cap():
+    store = MemoryStateStore(ttl=60, max_entries=3)
+    for chat_id in range(3):
+        store.set(chat_id, {"state": "waiting_for_national_code"})
+    assert store.get(0) == {"state": "waiting_for_national_code"}
+
+    store.set(3, {"state": "waiting_for_national_code"})
+    assert len(store) == 3
+    assert store.get(1) is None
+    assert store.get("0") is not None
+    assert store.metrics.evictions == 1
+
+
+def test_memory_store_expires_untouched_entries():
+    store = MemoryStateStore(ttl=0.05, max_entries=10)
+    store.set(1, {"state": "waiting_for_personnel_number", "national_code": "0012345678"})
+    assert store.get(1)["national_code"] == "0012345678"
+
+    time.sleep(0.1)
+    assert store.get(1) is None
+    store.set(2, {"state": "waiting_for_national_code"})
+    store.delete(2)
+    assert len(store) == 0
+    assert store.metrics.snapshot()["expirations"] == 1
+
+
+def test_reading_an_entry_restarts_its_ttl_so_the_sweep_reaches_expired_ones(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    store = MemoryStateStore(ttl=10, max_entries=10)
+    store.set(1, {"state": "waiting_for_national_code"})
+    store.set(2, {"state": "waiting_for_national_code"})
+
+    clock[0] += 6
+    assert store.get(1) is not None
+    clock[0] += 6
+    # 2 expired at the front; 1 was read 6s ago and is still live behind it.
+    store.set(3, {"state": "waiting_for_national_code"})
+    assert len(store) == 2
+    assert store.get(1) is not None and store.get(2) is None
+    assert store.metrics.expirations == 1
+
+
+def test_a_backend_missing_a_method_fails_when_constructed():
+    class Incomplete(StateStore):
+        def get(self, chat_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_database_store_is_shared_and_expires(db):
+    first, second = DatabaseStateStore(ttl=60), DatabaseStateStore(ttl=60)
+    first.set(42, {"state": "waiting_for_personnel_number", "national_code": "0012345678"})
+    first.set(42, {"state": "waiting_for_personnel_number", "national_code": "0087654321"})
+    assert second.get("42") == {"state": "waiting_for_personnel_number", "national_code": "0087654321"}
+    assert ConversationState.select().count() == 1
+
+    second.delete(42)
+    assert first.get(42) is None
+
+    stale = DatabaseStateStore(ttl=-1, purge_every=2)
+    stale.set(1, {"state": "waiting_for_national_code"})
+    assert stale.get(1) is None
+    stale.set(2, {"state": "waiting_for_national_code"})
+    assert ConversationState.select().count() == 0
+
+
+def test_database_store_reads_restart_the_ttl_too(db, monkeypatch):
+    clock = [datetime(2024, 1, 1, 12, 0)]
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock[0]
+
+    monkeypatch.setattr(state_store, "datetime", FakeDatetime)
+    store = DatabaseStateStore(ttl=10)
+    store.set(1, {"state": "waiting_for_national_code"})
+    store.set(2, {"state": "waiting_for_national_code"})
+
+    clock[0] += timedelta(seconds=6)
+    assert store.get(1) is not None
+    clock[0] += timedelta(seconds=6)
+    assert store.get(1) is not None
+    assert store.get(2) is None
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        make_state_store("redis")
@@ -0,0 +1,85 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import json
+
+from app.storage import JsonlStore, migrate_json_array
+
+
+def _payslip(code, month, net):
+    return {"national_code": code, "year": "1403", "month": month, "net_payment": net}
+
+
+def test_appends_stream_back_and_survive_a_torn_line(tmp_path):
+    path = tmp_path / "data.jsonl"
+    with JsonlStore(str(path), fsync_every=2) as store:
+        store.append(_payslip("1", "فروردین", "100"))
+        store.append_many([_payslip("2", "فروردین", "200"), _payslip("3", "فروردین", "300")])
+
+    # Simulate a crash half-way through writing a record.
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"national_code": "4", "ye')
+
+    with JsonlStore(str(path)) as store:
+        assert [r["national_code"] for r in store.read()] == ["1", "2", "3"]
+        store.append(_payslip("5", "فروردین", "500"))
+        assert [r["national_code"] for r in store] == ["1", "2", "3", "5"]
+
+
+def test_compaction_keeps_latest_record_per_payslip(tmp_path):
+    path = tmp_path / "data.jsonl"
+    with JsonlStore(str(path)) as store:
+        store.append(_payslip("1", "فروردین", "100"))
+        store.append(_payslip("2", "فروردین", "200"))
+        # Same payslip again, with the month spelled as a number and Persian digits.
+        store.append({"national_code": "1", "year": "۱۴۰۳", "month": "1", "net_payment": "150"})
+        store.append(_payslip("1", "اردیبهشت", "110"))
+        store.append({"net_payment": "0"})
+
+        assert store.compact() == (4, 1)
+        records = list(store.read())
+
+    assert [(r.get("national_code"), r["net_payment"]) for r in records] == [
+        ("2", "200"), ("1", "150"), ("1", "110"), (None, "0"),
+    ]
+    assert not [p for p in os.listdir(tmp_path) if p.endswith(".compact")]
+
+
+def test_legacy_json_array_is_migrated_once(tmp_path):
+    legacy = tmp_path / "extracted_data.json"
+    legacy.write_text(json.dumps([_payslip("1", "تیر", "1"), _payslip("2", "تیر", "2")]), encoding="utf-8")
+    store = JsonlStore(str(tmp_path / "data.jsonl"))
+
+    assert migrate_json_array(str(legacy), store) == 2
+    assert migrate_json_array(str(legacy), store) == 0
+    assert not legacy.exists()
+    assert (tmp_path / "extracted_data.json.migrated").exists()
+    assert [r["national_code"] for r in store.read()] == ["1", "2"]
+
+
+def test_save_to_json_batches_fsyncs_and_honours_a_legacy_path(tmp_path, monkeypatch):
+    from app import storage
+
+    legacy = tmp_path / "custom.json"
+    legacy.write_text(json.dumps([_payslip("1", "تیر", "1")]), encoding="utf-8")
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: fsyncs.append(fd) or real_fsync(fd))
+
+    synced_by_migration = None
+    for i in range(2, 52):
+        storage.save_to_json(_payslip(str(i), "تیر", str(i)), str(legacy))
+        if synced_by_migration is None:
+            synced_by_migration = len(fsyncs)
+    storage.close_shared_stores()
+
+    records = list(JsonlStore(str(tmp_path / "custom.jsonl")).read())
+    assert [r["national_code"] for r in records] == [str(i) for i in range(1, 52)]
+    assert not legacy.exists()
+    # 50 appends through one long-lived store: no fsync until it is closed.
+    assert len(fsyncs) == synced_by_migration + 1
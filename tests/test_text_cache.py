@@ -0,0 +1,69 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+from app import extractor as extractor_module, text_cache as text_cache_module
+from app.db_export import Payslip, save_many
+from app.extractor import EXTRACTION_RULES, PayslipExtractor
+from app.reprocess import reprocess_archive
+from app.text_cache import TextCache
+from benchmarks.synthetic import write_payslip_pdf
+
+
+def _forbid_pdf_access(monkeypatch):
+    def refuse(*args, **kwargs):
+        raise AssertionError("PDF opened despite cached text")
+    monkeypatch.setattr(extractor_module.fitz, "open", refuse)
+
+
+def test_second_extraction_reads_cached_text(tmp_path, monkeypatch):
+    cache = TextCache(str(tmp_path / "cache.sqlite"))
+    pdf = write_payslip_pdf(str(tmp_path / "a.pdf"), [5])
+    first = PayslipExtractor(debug=False, text_cache=cache).extract_from_file(pdf)
+
+    _forbid_pdf_access(monkeypatch)
+    second = PayslipExtractor(debug=False, text_cache=cache).extract_from_file(pdf)
+    assert second == first
+    assert second.national_code == "0000000005"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Another PyMuPDF version doesn't trust these entries.
+    assert TextCache(cache.path, engine="pymupdf-0.0").get(next(cache.items())[0]) is None
+
+
+def test_least_recently_used_documents_are_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_cache_module, "EVICT_EVERY", 1)
+    page = os.urandom(3000).hex()  # About 3 KB once compressed
+    cache = TextCache(str(tmp_path / "cache.sqlite"), max_bytes=12_000)
+    for i in range(3):
+        cache.put(f"doc{i}", [page])
+    monkeypatch.setattr(text_cache_module, "TOUCH_INTERVAL", -1)
+    assert cache.get("doc0") is not None
+    cache.put("doc3", [page])
+
+    assert cache.get("doc1") is None
+    assert all(cache.get(key) is not None for key in ("doc0", "doc2", "doc3"))
+    assert cache.size()[1] <= 12_000
+
+
+def test_reprocess_applies_new_rules_without_opening_pdfs(db, tmp_path, monkeypatch):
+    cache = TextCache(str(tmp_path / "cache.sqlite"))
+    pdf = write_payslip_pdf(str(tmp_path / "a.pdf"), [5])
+
+    # The old rules couldn't read the month.
+    old_rules = {field: rule for field, rule in EXTRACTION_RULES.items() if field != "month"}
+    row = PayslipExtractor(debug=False, rules=old_rules, text_cache=cache).extract_from_file(pdf).to_dict()
+    row["pdf_path"] = os.path.abspath(pdf)
+    save_many([row])
+    Payslip.update(chat_id="42").execute()
+
+    _forbid_pdf_access(monkeypatch)
+    summary = reprocess_archive(cache, PayslipExtractor(debug=False, text_cache=cache))
+    assert (summary.documents, summary.stored) == (1, 1)
+
+    payslips = [(p.national_code, p.year, p.month, p.chat_id) for p in Payslip.select()]
+    assert payslips == [("0000000005", 1403, 11, "42")]
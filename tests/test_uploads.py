@@ -0,0 +1,57 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import pytest
+
+from app import uploads
+from app.db_export import UploadedFile
+
+
+@pytest.fixture
+def stub(db, bale_stub):
+    return bale_stub
+
+
+def _kinds(stub):
+    return ["upload" if isinstance(c["params"]["document"], dict) else "file_id" for c in stub.calls("sendDocument")]
+
+
+def test_pdf_is_uploaded_once_then_sent_by_file_id(stub, tmp_path):
+    pdf = tmp_path / "payslip.pdf"
+    pdf.write_bytes(b"%PDF-1.4 v1")
+    for chat_id in (1, 2, 3):
+        assert uploads.send_document(chat_id, str(pdf), caption="c").status_code == 200
+    assert _kinds(stub) == ["upload", "file_id", "file_id"]
+    assert UploadedFile.select().count() == 1
+
+    # New content means a new hash, so the old file_id is not reused.
+    pdf.write_bytes(b"%PDF-1.4 v2 (reissued)")
+    uploads.send_document(1, str(pdf))
+    uploads.send_document(2, str(pdf))
+    assert _kinds(stub)[3:] == ["upload", "file_id"]
+
+
+def test_rejected_file_id_falls_back_to_upload(stub, tmp_path):
+    pdf = tmp_path / "payslip.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    UploadedFile.create(sha256=uploads.content_hash(str(pdf)), file_id="expired")
+
+    response = uploads.send_document(1, str(pdf))
+    assert response.json()["ok"]
+    assert _kinds(stub) == ["upload"]
+    assert UploadedFile.get().file_id != "expired"
+
+
+def test_throttled_file_id_send_is_not_retried_as_upload(stub, tmp_path):
+    pdf = tmp_path / "payslip.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    uploads.send_document(1, str(pdf))
+    stub.fail_next("sendDocument", 429, retry_after=1)
+    assert uploads.send_document(2, str(pdf)).status_code == 429
+    assert _kinds(stub) == ["upload"]
+    assert UploadedFile.select().count() == 1
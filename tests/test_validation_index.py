@@ -0,0 +1,82 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import pandas as pd
+import pytest
+
+from app.validation_index import (
+    NATIONAL_CODE_COLUMN,
+    PERSONNEL_NUMBER_COLUMN,
+    ValidationIndex,
+    normalize_national_code,
+)
+
+
+def _write_list(path, rows):
+    pd.DataFrame(rows, columns=[NATIONAL_CODE_COLUMN, PERSONNEL_NUMBER_COLUMN]).to_excel(path, index=False)
+
+
+def test_normalize_national_code():
+    assert normalize_national_code("۰۰۵۴۰۴۲۷۹۸") == "0054042798"
+    assert normalize_national_code("54042798") == "0054042798"
+    assert normalize_national_code(54042798.0) == "0054042798"
+    assert normalize_national_code(" 005-404-2798 ") == "0054042798"
+    assert normalize_national_code("12345678901") is None
+    assert normalize_national_code("abc") is None
+
+
+def test_index_is_lazy_persisted_and_hot_reloaded(tmp_path, monkeypatch):
+    source = str(tmp_path / "list.xlsx")
+    index_path = str(tmp_path / "index.pickle")
+    _write_list(source, [["0054042798", 10658], ["0079682820", "10643"]])
+
+    index = ValidationIndex(source, index_path, check_interval=0)
+    assert not os.path.exists(index_path)
+    assert index.get("۰۰۵۴۰۴۲۷۹۸") == "10658"
+    assert index.get("79682820") == "10643"
+    assert "0000000000" not in index
+    assert os.path.exists(index_path)
+
+    # A fresh process loads the compiled index without parsing the spreadsheet.
+    def no_parse(self):
+        raise AssertionError("spreadsheet parsed again")
+
+    monkeypatch.setattr(ValidationIndex, "_read_spreadsheet", no_parse)
+    assert ValidationIndex(source, index_path).get("0054042798") == "10658"
+
+    # Touching the file without editing it still avoids a parse.
+    os.utime(source, ns=(1, 1))
+    assert ValidationIndex(source, index_path).get("0054042798") == "10658"
+
+    # An edit is picked up by the running index on the next lookup.
+    monkeypatch.undo()
+    _write_list(source, [["0054042798", 99999]])
+    assert index.get("0054042798") == "99999"
+    assert index.get("0079682820") is None
+
+
+def test_a_broken_source_keeps_the_previous_map(tmp_path, caplog):
+    source = tmp_path / "list.xlsx"
+    _write_list(str(source), [["0054042798", 10658]])
+    index = ValidationIndex(str(source), str(tmp_path / "index.pickle"), check_interval=0)
+    assert index.get("0054042798") == "10658"
+
+    # Half-written by whoever is editing the sheet, then briefly gone.
+    source.write_bytes(b"PK\x03\x04 not a workbook")
+    assert index.get("0054042798") == "10658"
+    assert "keeping the previous map" in caplog.text
+    source.unlink()
+    assert index.get("0054042798") == "10658"
+
+    _write_list(str(source), [["0054042798", 99999]])
+    assert index.get("0054042798") == "99999"
+
+    # With nothing loaded yet there is no map to fall back on.
+    source.write_bytes(b"PK\x03\x04 not a workbook")
+    with pytest.raises(Exception):
+        ValidationIndex(str(source), str(tmp_path / "other.pickle")).get("0054042798")
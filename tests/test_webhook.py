@@ -0,0 +1,96 @@
+import sys
+import os
+
+# Add the project's root directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, project_root)
+
+import threading
+
+import pytest
+
+from app import bot, handlers
+from app.bot import UpdatePool
+from app.db_export import Payslip, ProcessedUpdate
+from app.state_store import MemoryStateStore
+
+
+@pytest.fixture
+def stub(db, bale_stub, monkeypatch):
+    monkeypatch.setattr(handlers, "validation_index", {"0012345678": "12345"})
+    monkeypatch.setattr(handlers, "user_states", MemoryStateStore())
+    monkeypatch.setattr(handlers, "dispatcher", None)
+    return bale_stub
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = UpdatePool(workers=4).start()
+    monkeypatch.setattr(bot, "update_pool", lambda: pool)
+    yield pool
+    pool.stop()
+
+
+def _update(update_id, text, chat_id=7):
+    return {"update_id": update_id, "message": {"chat": {"id": chat_id}, "text": text}}
+
+
+def test_webhook_runs_the_shared_handlers_once_per_update(stub, pool, tmp_path):
+    pdf = tmp_path / "payslip.pdf"
+    pdf.write_bytes(b"%PDF-1.4 payslip")
+    Payslip.create(national_code="0012345678", year=1403, month=11, pdf_path=str(pdf))
+
+    client = bot.app.test_client()
+    conversation = ["/start", "0012345678", "12345", "/getpayslip"]
+    for update_id, text in enumerate(conversation, start=1):
+        assert client.post("/webhook", json=_update(update_id, text)).get_json() == {"ok": True}
+        # Bale redelivers when it thinks the first delivery timed out.
+        assert client.post("/webhook", json=_update(update_id, text)).status_code == 200
+        pool.join()
+
+    assert Payslip.get().chat_id == "7"
+    assert len(stub.calls("sendMessage")) == 4
+    assert len(stub.calls("sendDocument")) == 1
+    assert (pool.handled, pool.failed, pool.duplicates) == (4, 0, 4)
+
+    assert client.post("/webhook", data="not json").status_code == 400
+    assert client.post("/webhook", json={"message": {}}).status_code == 400
+
+
+def test_webhook_acknowledges_before_the_handler_finishes(db, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def handle(update):
+        started.set()
+        release.wait(5)
+
+    pool = UpdatePool(handle_update=handle, workers=1, queue_size=1).start()
+    monkeypatch.setattr(bot, "update_pool", lambda: pool)
+    client = bot.app.test_client()
+    try:
+        assert client.post("/webhook", json=_update(1, "/start")).status_code == 200
+        assert started.wait(5)
+        assert client.post("/webhook", json=_update(2, "/start")).status_code == 200
+        # The worker is busy and its queue is full: Bale is told to retry later.
+        assert client.post("/webhook", json=_update(3, "/start")).status_code == 503
+        assert pool.handled == 0
+    finally:
+        release.set()
+        pool.join()
+        pool.stop()
+    assert pool.handled == 2
+
+
+def test_redeliveries_to_another_process_are_dropped(db):
+    seen = []
+    first, second = (UpdatePool(handle_update=seen.append, workers=2).start() for _ in range(2))
+    for pool in (first, second):
+        pool.submit(_update(10, "/start"))
+        pool.join()
+        pool.stop()
+
+    assert [update["update_id"] for update in seen] == [10]
+    assert second.duplicates == 1
+    assert ProcessedUpdate.select().count() == 1
+    assert first.prune() == 0